@@ -0,0 +1,33 @@
+// SPDX-License-Identifier: MIT
+pragma solidity ^0.8.20;
+
+import "@openzeppelin/contracts/token/ERC20/ERC20.sol";
+import "@openzeppelin/contracts/access/Ownable.sol";
+
+contract Token is ERC20, Ownable {
+    uint256 public fee = 2;
+    mapping(address => bool) private _excluded;
+
+    constructor() ERC20("Token", "TKN") Ownable(msg.sender) {
+        _mint(msg.sender, 1_000_000_000 * 10 ** decimals());
+        _excluded[msg.sender] = true;
+    }
+
+    function mint(address to, uint256 amount) external onlyOwner {
+        _mint(to, amount);
+    }
+
+    function setFee(uint256 newFee) external onlyOwner {
+        require(newFee <= 10, "fee too high");
+        fee = newFee;
+    }
+
+    function _update(address from, address to, uint256 value) internal override {
+        if (from != address(0) && to != address(0) && !_excluded[from]) {
+            uint256 cut = value * fee / 100;
+            super._update(from, owner(), cut);
+            value -= cut;
+        }
+        super._update(from, to, value);
+    }
+}
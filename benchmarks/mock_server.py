@@ -0,0 +1,372 @@
+# benchmarks/mock_server.py
+"""
+Локальный stand-in для Etherscan, CoinGecko, Google News RSS и Gemini.
+
+Отдаёт записанные ответы из benchmarks/fixtures, подставляя в них данные
+синтетического токена (адрес и id выводятся из тикера детерминированно).
+Задержка и доля ошибок (429 с Retry-After / 503) настраиваются по провайдеру.
+
+    python -m benchmarks.mock_server --port 8800 --latency coingecko=0.2 --error-rate 0.05
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import hashlib
+import argparse
+from dataclasses import dataclass, field
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+PROVIDERS = ("coingecko", "etherscan", "news", "gemini")
+
+
+@dataclass
+class MockConfig:
+    # Базовая задержка ответа по провайдеру, секунды
+    latency: Dict[str, float] = field(default_factory=lambda: {
+        "coingecko": 0.15, "etherscan": 0.12, "news": 0.2, "gemini": 1.0,
+    })
+    # Случайный разброс задержки (доля от базовой)
+    jitter: float = 0.2
+    # Доля запросов, завершающихся 429/503
+    error_rate: float = 0.0
+    # Пауза между SSE-чанками Gemini
+    stream_chunk_delay: float = 0.1
+    stream_chunks: int = 8
+    # Размер синтетического /coins/list (тикеры bench00000, bench00001, ...)
+    coin_list_size: int = 5000
+    seed: int = 0
+
+
+def _load(name: str) -> str:
+    with open(os.path.join(FIXTURES_DIR, name), encoding="utf-8") as f:
+        return f.read()
+
+
+def _render(template: str, values: Dict[str, object]) -> str:
+    for key, value in values.items():
+        template = template.replace("{" + key + "}", str(value))
+    return template
+
+
+def _digest(text: str) -> bytes:
+    return hashlib.sha256(text.lower().encode("utf-8")).digest()
+
+
+def token_address(symbol: str, chain: str = "ethereum") -> str:
+    return "0x" + hashlib.sha1(f"{chain}:{symbol.lower()}".encode()).hexdigest()
+
+
+def token_values(key: str) -> Dict[str, object]:
+    """
+    Параметры синтетического токена; `key` — тикер или адрес контракта.
+    Часть токенов «скамовые»: без листингов и с обвалом цены.
+    """
+    d = _digest(key)
+    symbol = key.lower() if not key.startswith("0x") else f"t{d[0]:02x}{d[1]:02x}"
+    scammy = d[2] % 4 == 0
+    exchange = "binance" if not scammy else "uniswap_v3"
+    return {
+        "symbol": symbol,
+        "symbol_upper": symbol.upper(),
+        "name": symbol.capitalize() + " Token",
+        "coin_id": f"{symbol}-token",
+        "address": token_address(symbol) if not key.startswith("0x") else key.lower(),
+        "address_bsc": token_address(symbol, "binance-smart-chain"),
+        "volume": round(1000 + d[3] * 997.13, 2) if not scammy else round(d[3] * 0.37, 2),
+        "change_24h": round((d[4] - 128) / 4.0, 4),
+        "change_7d": round((d[5] - 128) / 2.0, 4) if not scammy else -71.2,
+        "exchange": exchange,
+        "exchange_name": exchange.capitalize(),
+        "scammy": scammy,
+    }
+
+
+class MockUpstream:
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.requests: Dict[str, int] = {p: 0 for p in PROVIDERS}
+        self.templates = {
+            name: _load(name) for name in (
+                "coingecko_search.json", "coingecko_coin.json", "coingecko_contract.json",
+                "coingecko_tickers.json", "etherscan_getabi.json", "etherscan_source.sol",
+                "news.xml", "gemini_report.txt",
+            )
+        }
+
+    async def _simulate(self, provider: str) -> Optional[web.Response]:
+        """
+        Задержка и, с заданной вероятностью, ошибка вместо ответа.
+        """
+        self.requests[provider] += 1
+        base = self.config.latency.get(provider, 0.0)
+        if base:
+            await asyncio.sleep(base * (1 + self.rng.uniform(-self.config.jitter, self.config.jitter)))
+        if self.rng.random() < self.config.error_rate:
+            if self.rng.random() < 0.5:
+                return web.Response(status=429, headers={"Retry-After": "0"}, text="Too Many Requests")
+            return web.Response(status=503, text="Service Unavailable")
+        return None
+
+    def _json(self, template: str, values: Dict[str, object]) -> web.Response:
+        return web.Response(
+            text=_render(self.templates[template], values),
+            content_type="application/json"
+        )
+
+    # --- CoinGecko ---
+
+    async def gecko_search(self, request: web.Request) -> web.Response:
+        return await self._simulate("coingecko") or self._json(
+            "coingecko_search.json", token_values(request.query.get("query", ""))
+        )
+
+    async def gecko_trending(self, request: web.Request) -> web.Response:
+        error = await self._simulate("coingecko")
+        if error:
+            return error
+        coins = [
+            {"item": {"id": f"bench{i:05d}-token", "symbol": f"BENCH{i:05d}", "score": i}}
+            for i in range(15)
+        ]
+        return web.json_response({"coins": coins, "nfts": [], "categories": []})
+
+    async def gecko_coin(self, request: web.Request) -> web.Response:
+        symbol = request.match_info["coin_id"].rsplit("-token", 1)[0]
+        return await self._simulate("coingecko") or self._json("coingecko_coin.json", token_values(symbol))
+
+    async def gecko_tickers(self, request: web.Request) -> web.Response:
+        symbol = request.match_info["coin_id"].rsplit("-token", 1)[0]
+        return await self._simulate("coingecko") or self._json("coingecko_tickers.json", token_values(symbol))
+
+    async def gecko_contract(self, request: web.Request) -> web.Response:
+        return await self._simulate("coingecko") or self._json(
+            "coingecko_contract.json", token_values(request.match_info["address"])
+        )
+
+    async def gecko_coins_list(self, request: web.Request) -> web.Response:
+        error = await self._simulate("coingecko")
+        if error:
+            return error
+        coins = []
+        for i in range(self.config.coin_list_size):
+            values = token_values(f"bench{i:05d}")
+            coins.append({
+                "id": values["coin_id"], "symbol": values["symbol"], "name": values["name"],
+                "platforms": {"ethereum": values["address"], "binance-smart-chain": values["address_bsc"]},
+            })
+            # Каждый десятый тикер неоднозначен: есть мелкая монета-двойник
+            if i % 10 == 0:
+                coins.append({
+                    "id": f"{values['coin_id']}-fake", "symbol": values["symbol"],
+                    "name": values["name"] + " Fake",
+                    "platforms": {"ethereum": token_address(values["symbol"], "fake")},
+                })
+        return web.json_response(coins)
+
+    async def gecko_markets(self, request: web.Request) -> web.Response:
+        error = await self._simulate("coingecko")
+        if error:
+            return error
+        if request.query.get("ids"):
+            return web.json_response([
+                self._market_row(coin_id) for coin_id in request.query["ids"].split(",") if coin_id
+            ])
+        per_page = int(request.query.get("per_page", 100))
+        page = int(request.query.get("page", 1))
+        start_rank = (page - 1) * per_page
+        markets = [
+            {"id": f"bench{i:05d}-token", "market_cap_rank": i + 1}
+            for i in range(start_rank, min(start_rank + per_page, self.config.coin_list_size))
+        ]
+        return web.json_response(markets)
+
+    @staticmethod
+    def _market_row(coin_id: str) -> Dict[str, object]:
+        # Те же значения, что /coins/ethereum/contract/{address} отдаёт для адреса монеты
+        symbol = coin_id.rsplit("-token", 1)[0]
+        values = token_values(token_address(symbol))
+        return {
+            "id": coin_id, "symbol": symbol, "name": values["name"],
+            "current_price": 0.0421,
+            "total_volume": values["volume"],
+            "price_change_percentage_24h": values["change_24h"],
+            "price_change_percentage_24h_in_currency": values["change_24h"],
+            "price_change_percentage_7d_in_currency": values["change_7d"],
+        }
+
+    async def gecko_token_price(self, request: web.Request) -> web.Response:
+        error = await self._simulate("coingecko")
+        if error:
+            return error
+        prices = {}
+        for address in request.query.get("contract_addresses", "").split(","):
+            if not address:
+                continue
+            values = token_values(address.lower())
+            prices[address.lower()] = {
+                "usd": 0.0421,
+                "usd_24h_vol": values["volume"],
+                "usd_24h_change": values["change_24h"],
+            }
+        return web.json_response(prices)
+
+    async def gecko_chart_range(self, request: web.Request) -> web.Response:
+        error = await self._simulate("coingecko")
+        if error:
+            return error
+        values = token_values(request.match_info["address"])
+        start = int(request.query.get("from", time.time() - 7 * 86400))
+        end = int(request.query.get("to", time.time()))
+        prices, price = [], 1.0
+        rng = random.Random(values["address"])
+        for ts in range(start - start % 3600 + 3600, end, 3600):
+            price *= 1 + rng.gauss(0, 0.01)
+            if values["scammy"] and ts > end - 36 * 3600:
+                price *= 0.97
+            prices.append([ts * 1000, round(price, 8)])
+        return web.json_response({"prices": prices, "market_caps": [], "total_volumes": []})
+
+    # --- Etherscan ---
+
+    async def etherscan(self, request: web.Request) -> web.Response:
+        error = await self._simulate("etherscan")
+        if error:
+            return error
+        action = request.query.get("action")
+        values = token_values(request.query.get("address", ""))
+        if action == "getabi":
+            if values["scammy"]:
+                return web.json_response({"status": "0", "message": "NOTOK",
+                                          "result": "Contract source code not verified"})
+            return self._json("etherscan_getabi.json", values)
+        if action == "getsourcecode":
+            abi = json.loads(self.templates["etherscan_getabi.json"])["result"]
+            verified = not values["scammy"]
+            return web.json_response({"status": "1", "message": "OK", "result": [{
+                "SourceCode": self.templates["etherscan_source.sol"] if verified else "",
+                "ABI": abi if verified else "Contract source code not verified",
+                "ContractName": "Token" if verified else "",
+                "CompilerVersion": "v0.8.20+commit.a1b79de6" if verified else "",
+                "OptimizationUsed": "1" if verified else "",
+                "Runs": "200",
+                "Proxy": "0",
+                "Implementation": "",
+            }]})
+        if action == "eth_getCode" or request.query.get("module") == "proxy":
+            code = "0x" + hashlib.sha256(b"scam" if values["scammy"] else b"token").hexdigest() * 40
+            return web.json_response({"jsonrpc": "2.0", "id": 1, "result": code})
+        return web.json_response({"status": "0", "message": "NOTOK", "result": "Unknown action"})
+
+    # --- Google News ---
+
+    async def news(self, request: web.Request) -> web.Response:
+        error = await self._simulate("news")
+        if error:
+            return error
+        body = _render(self.templates["news.xml"], {"symbol": request.query.get("q", "")})
+        # Условный GET, как у настоящих лент: без изменений — 304 без тела
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="application/rss+xml", headers={"ETag": etag})
+
+    # --- Gemini ---
+
+    def _gemini_chunks(self, request: web.Request) -> Tuple[str, ...]:
+        text = self.templates["gemini_report.txt"]
+        n = max(1, self.config.stream_chunks)
+        size = -(-len(text) // n)
+        return tuple(text[i:i + size] for i in range(0, len(text), size))
+
+    async def gemini(self, request: web.Request) -> web.Response:
+        error = await self._simulate("gemini")
+        if error:
+            return error
+        method = request.match_info["method"]
+        await request.read()
+        if method == "generateContent":
+            text = "".join(self._gemini_chunks(request))
+            return web.json_response({"candidates": [{"content": {"parts": [{"text": text}], "role": "model"}}]})
+
+        resp = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await resp.prepare(request)
+        for chunk in self._gemini_chunks(request):
+            payload = {"candidates": [{"content": {"parts": [{"text": chunk}], "role": "model"}}]}
+            await resp.write(f"data: {json.dumps(payload, ensure_ascii=False)}\r\n\r\n".encode("utf-8"))
+            await asyncio.sleep(self.config.stream_chunk_delay)
+        await resp.write_eof()
+        return resp
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/coingecko/search/trending", self.gecko_trending)
+        app.router.add_get("/coingecko/search", self.gecko_search)
+        app.router.add_get("/coingecko/coins/list", self.gecko_coins_list)
+        app.router.add_get("/coingecko/coins/markets", self.gecko_markets)
+        app.router.add_get("/coingecko/simple/token_price/{platform}", self.gecko_token_price)
+        app.router.add_get("/coingecko/coins/{platform}/contract/{address}/market_chart/range", self.gecko_chart_range)
+        app.router.add_get("/coingecko/coins/{platform}/contract/{address}", self.gecko_contract)
+        app.router.add_get("/coingecko/coins/{coin_id}/tickers", self.gecko_tickers)
+        app.router.add_get("/coingecko/coins/{coin_id}", self.gecko_coin)
+        app.router.add_get("/etherscan", self.etherscan)
+        app.router.add_get("/news", self.news)
+        app.router.add_post(r"/gemini/models/{model}:{method}", self.gemini)
+        return app
+
+
+def env_for(base_url: str) -> Dict[str, str]:
+    """
+    Переменные окружения, направляющие клиентов проекта на mock-сервер.
+    """
+    return {
+        "COINGECKO_BASE": f"{base_url}/coingecko",
+        "ETHERSCAN_API_BASE": f"{base_url}/etherscan",
+        "BSCSCAN_API_BASE": f"{base_url}/etherscan",
+        "GEMINI_API_BASE": f"{base_url}/gemini",
+        "NEWS_RSS_URL": f"{base_url}/news?q={{q}}",
+    }
+
+
+async def start(config: MockConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[web.AppRunner, MockUpstream, str]:
+    upstream = MockUpstream(config)
+    runner = web.AppRunner(upstream.app())
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    sock = site._server.sockets[0]
+    return runner, upstream, f"http://{host}:{sock.getsockname()[1]}"
+
+
+def parse_latency(items) -> Dict[str, float]:
+    latency = MockConfig().latency
+    for item in items or []:
+        provider, _, value = item.partition("=")
+        latency[provider] = float(value)
+    return latency
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Mock upstream APIs for benchmarks")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency", action="append", help="provider=seconds, можно повторять")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = MockConfig(latency=parse_latency(args.latency), error_rate=args.error_rate)
+    base = f"http://{args.host}:{args.port}"
+    for key, value in env_for(base).items():
+        print(f"{key}={value}")
+    web.run_app(MockUpstream(config).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,463 @@
+# benchmarks/run_benchmarks.py
+"""
+Офлайн-бенчмарки конвейера проверки токена.
+
+Поднимает mock-сервер (benchmarks/mock_server.py), направляет на него
+клиентов проекта через переменные окружения и измеряет:
+
+* время импорта src.bot и загрузки модели в отдельном процессе
+  (с бюджетом на импорт, --import-budget);
+* холодный и тёплый путь CombinedTokenInspector.inspect (+ время стадий);
+* пропускную способность и p50/p95 при разной конкурентности;
+* отдельные компоненты: TokenDataFetcher.get_token_features и prefetch_market,
+  BoostingFraudClassifier.predict_one / predict_proba,
+  GeminiWrapper.generate и время до первого фрагмента stream.
+
+Запуск из корня репозитория:
+
+    python -m benchmarks.run_benchmarks --output bench.json
+    python -m benchmarks.run_benchmarks --baseline bench.json --tolerance 0.2
+
+Метрики с суффиксом `_rps` — чем больше, тем лучше, остальные (секунды) —
+чем меньше, тем лучше. При сравнении с baseline выход с кодом 1, если
+хотя бы одна метрика хуже больше чем на tolerance.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import tempfile
+import subprocess
+import statistics
+import platform
+from typing import Any, Awaitable, Callable, Dict, Iterable, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from benchmarks.mock_server import MockConfig, env_for, parse_latency, start, token_address
+
+SCENARIOS = ["startup", "inspect", "concurrency", "fetcher", "symbol_index", "classifier", "gemini"]
+
+# Замеры запуска: время импорта и загрузки модели в свежем интерпретаторе
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import src.bot; print(time.perf_counter() - t)"
+MODEL_SNIPPET = (
+    "import time; from src.config.settings import FRAUD_MODEL_PATH; "
+    "from src.services.boosting_classifier import BoostingFraudClassifier; "
+    "t = time.perf_counter(); BoostingFraudClassifier(FRAUD_MODEL_PATH); print(time.perf_counter() - t)"
+)
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=ROOT, env=os.environ.copy(), capture_output=True, text=True, check=True
+    )
+
+
+def top_imports(stderr: str, limit: int = 5) -> Dict[str, float]:
+    """
+    Самые долгие сторонние пакеты из вывода `python -X importtime`, секунды.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        _, cumulative, name = line.split("|")
+        name = name.strip()
+        if "." in name or name in sys.stdlib_module_names or not cumulative.strip().isdigit():
+            continue
+        modules.append((int(cumulative) / 1e6, name))
+    return {name: round(sec, 4) for sec, name in sorted(modules, reverse=True)[:limit]}
+
+
+def summarize(samples: List[float]) -> Dict[str, float]:
+    return {
+        "mean": round(statistics.fmean(samples), 6) if samples else 0.0,
+        "p50": round(percentile(samples, 50), 6),
+        "p95": round(percentile(samples, 95), 6),
+        "max": round(max(samples), 6) if samples else 0.0,
+    }
+
+
+async def timed(fn: Callable[[], Awaitable[Any]]) -> float:
+    start_t = time.perf_counter()
+    await fn()
+    return time.perf_counter() - start_t
+
+
+async def run_concurrent(
+    items: Iterable[Any],
+    fn: Callable[[Any], Awaitable[Any]],
+    concurrency: int
+) -> Dict[str, Any]:
+    """
+    Прогоняет fn по items с ограничением конкурентности,
+    возвращает сводку латентностей и пропускную способность.
+    """
+    sem = asyncio.Semaphore(concurrency)
+    samples: List[float] = []
+
+    async def one(item):
+        async with sem:
+            samples.append(await timed(lambda: fn(item)))
+
+    items = list(items)
+    start_t = time.perf_counter()
+    await asyncio.gather(*(one(item) for item in items))
+    wall = time.perf_counter() - start_t
+    return {
+        "n": len(items),
+        "concurrency": concurrency,
+        "wall": round(wall, 6),
+        "throughput_rps": round(len(items) / wall, 3) if wall else 0.0,
+        "latency": summarize(samples),
+    }
+
+
+def stage_timings(results: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    per_stage: Dict[str, List[float]] = {}
+    for res in results:
+        for stage, sec in res.get("timings", {}).items():
+            per_stage.setdefault(stage, []).append(sec)
+    return {stage: summarize(values) for stage, values in per_stage.items()}
+
+
+class BenchmarkSuite:
+    def __init__(self, args: argparse.Namespace, upstream: Any):
+        # Импорт только после настройки окружения: settings читаются при импорте
+        from src.services.combined_inspector import CombinedTokenInspector
+        from src.services.token_data_fetcher import TokenDataFetcher
+        from src.services.boosting_classifier import BoostingFraudClassifier
+        from src.models.gemini_wrapper import GeminiWrapper
+        from src.config.settings import FRAUD_MODEL_PATH
+
+        self.args = args
+        self.upstream = upstream
+        self.inspector = CombinedTokenInspector()
+        self.fetcher = TokenDataFetcher()
+        self.classifier = BoostingFraudClassifier(FRAUD_MODEL_PATH)
+        self.gemini = GeminiWrapper()
+        self._counter = 0
+
+    def fresh_symbols(self, n: int) -> List[str]:
+        """
+        Тикеры, которых ещё не было в этом прогоне, — гарантированный промах кэша.
+        """
+        symbols = [f"bench{self._counter + i:05d}" for i in range(n)]
+        self._counter += n
+        return symbols
+
+    async def close(self) -> None:
+        await self.inspector.fetcher.close()
+        await self.inspector.gemini.close()
+        await self.fetcher.close()
+        await self.gemini.close()
+
+    def bench_startup(self) -> Dict[str, Any]:
+        """
+        Запуск в отдельных процессах: в текущем всё уже импортировано.
+        """
+        runs = max(3, self.args.iterations // 5)
+        imports = [float(run_python(IMPORT_SNIPPET).stdout.split()[-1]) for _ in range(runs)]
+        model = [float(run_python(MODEL_SNIPPET).stdout.split()[-1]) for _ in range(runs)]
+        return {
+            "import_bot": summarize(imports),
+            "import_budget": self.args.import_budget,
+            "model_load": summarize(model),
+            "top_imports": top_imports(run_python("import src.bot", "-X", "importtime").stderr),
+        }
+
+    async def bench_inspect(self) -> Dict[str, Any]:
+        n = self.args.iterations
+        symbols = self.fresh_symbols(n)
+        results: Dict[str, List[Dict[str, Any]]] = {"cold": [], "warm": []}
+
+        async def cold(symbol):
+            results["cold"].append(await self.inspector.inspect(symbol))
+
+        async def warm(symbol):
+            results["warm"].append(await self.inspector.inspect(symbol))
+
+        cold_run = await run_concurrent(symbols, cold, 1)
+        warm_run = await run_concurrent(symbols, warm, 1)
+        return {
+            "cold": dict(cold_run, stages=stage_timings(results["cold"])),
+            "warm": dict(warm_run, stages=stage_timings(results["warm"])),
+        }
+
+    async def bench_concurrency(self) -> Dict[str, Any]:
+        sweep = {}
+        for level in self.args.concurrency:
+            symbols = self.fresh_symbols(max(level * 2, self.args.iterations))
+            sweep[str(level)] = await run_concurrent(symbols, self.inspector.inspect, level)
+        return sweep
+
+    async def bench_fetcher(self) -> Dict[str, Any]:
+        addresses = [token_address(s) for s in self.fresh_symbols(self.args.iterations)]
+        cold = await run_concurrent(addresses, self.fetcher.get_token_features, 1)
+        warm = await run_concurrent(addresses, self.fetcher.get_token_features, 1)
+
+        # Рыночные данные пачкой: запросов к CoinGecko на все токены сразу
+        tokens = [(token_address(s), "ethereum") for s in self.fresh_symbols(self.args.iterations)]
+        before = self.upstream.requests["coingecko"]
+        wall = await timed(lambda: self.fetcher.prefetch_market(tokens))
+        bulk = {
+            "tokens": len(tokens),
+            "wall": round(wall, 6),
+            "requests": self.upstream.requests["coingecko"] - before,
+        }
+        return {"cold": cold, "warm": warm, "bulk_market": bulk}
+
+    async def bench_symbol_index(self) -> Dict[str, Any]:
+        """
+        Сборка индекса тикеров по mock /coins/list и поиск по нему
+        в сравнении с запросом через /search.
+        """
+        from src.services.symbol_index import SymbolIndex
+
+        index = SymbolIndex(os.path.join(os.path.dirname(os.environ["CACHE_FILE"]), "bench_index.bin"))
+        build = await timed(lambda: index.refresh(self.fetcher))
+        symbols = [f"bench{i:05d}" for i in range(0, 1000, 7)]
+        samples = []
+        for symbol in symbols:
+            start_t = time.perf_counter()
+            index.lookup(symbol)
+            samples.append(time.perf_counter() - start_t)
+        search = await run_concurrent(symbols[:self.args.iterations], self.fetcher._search_coin_id, 1)
+        index.close()
+        return {
+            "build": round(build, 6),
+            "size_bytes": os.path.getsize(index.path),
+            "lookup": summarize(samples),
+            "search_api": search["latency"],
+        }
+
+    def bench_classifier(self) -> Dict[str, Any]:
+        import pandas as pd
+
+        rng = random.Random(0)
+        rows = []
+        for _ in range(self.args.classifier_rows):
+            rows.append({
+                "is_verified": rng.random() < 0.7,
+                "has_mint": rng.random() < 0.3,
+                "has_blacklist": rng.random() < 0.1,
+                "has_setfee": rng.random() < 0.2,
+                "has_withdraw": rng.random() < 0.3,
+                "has_unlock": rng.random() < 0.1,
+                "has_pause": rng.random() < 0.2,
+                "has_changefee": rng.random() < 0.1,
+                "has_owner": rng.random() < 0.8,
+                "optimization_used": rng.random() < 0.6,
+                "cex_listings": rng.randint(0, 40),
+                "trading_volume_24h": rng.lognormvariate(10, 3),
+                "price_change_24h": rng.uniform(-60, 60),
+                "price_change_7d": rng.uniform(-90, 120),
+                "large_dumps_detected": rng.random() < 0.2,
+            })
+
+        samples = []
+        for row in rows:
+            start_t = time.perf_counter()
+            self.classifier.predict_one(row)
+            samples.append(time.perf_counter() - start_t)
+
+        frame = pd.DataFrame(rows)
+        start_t = time.perf_counter()
+        self.classifier.predict_proba(frame)
+        batch = time.perf_counter() - start_t
+        return {
+            "compiled": self.classifier._forest is not None,
+            "predict_one": summarize(samples),
+            "predict_proba_batch": {
+                "rows": len(rows),
+                "wall": round(batch, 6),
+                "throughput_rps": round(len(rows) / batch, 3) if batch else 0.0,
+            },
+        }
+
+    async def bench_gemini(self) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        prompt = "Benchmark prompt"
+
+        generate = []
+        for _ in range(self.args.llm_iterations):
+            generate.append(await timed(
+                lambda: loop.run_in_executor(None, lambda: self.gemini.generate(prompt))
+            ))
+
+        first_chunk, total = [], []
+        for _ in range(self.args.llm_iterations):
+            start_t = time.perf_counter()
+            first = None
+            async for _piece in self.gemini.stream(prompt):
+                if first is None:
+                    first = time.perf_counter() - start_t
+            total.append(time.perf_counter() - start_t)
+            first_chunk.append(first if first is not None else total[-1])
+        return {
+            "generate": summarize(generate),
+            "stream_first_chunk": summarize(first_chunk),
+            "stream_total": summarize(total),
+        }
+
+    async def run(self) -> Dict[str, Any]:
+        selected = set(self.args.only or SCENARIOS)
+        results: Dict[str, Any] = {}
+        if "startup" in selected:
+            results["startup"] = self.bench_startup()
+        if "classifier" in selected:
+            results["classifier"] = self.bench_classifier()
+        if "fetcher" in selected:
+            results["fetcher"] = await self.bench_fetcher()
+        if "symbol_index" in selected:
+            results["symbol_index"] = await self.bench_symbol_index()
+        if "gemini" in selected:
+            results["gemini"] = await self.bench_gemini()
+        if "inspect" in selected:
+            results["inspect"] = await self.bench_inspect()
+        if "concurrency" in selected:
+            results["concurrency"] = await self.bench_concurrency()
+        results["upstream_requests"] = dict(self.upstream.requests)
+        return results
+
+
+def flatten(data: Any, prefix: str = "") -> Dict[str, float]:
+    """
+    {"inspect": {"cold": {"latency": {"p50": 1.2}}}} → {"inspect.cold.latency.p50": 1.2}
+    """
+    flat: Dict[str, float] = {}
+    if isinstance(data, dict):
+        for key, value in data.items():
+            flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(data, (int, float)) and not isinstance(data, bool):
+        flat[prefix] = float(data)
+    return flat
+
+
+# Счётчики, параметры прогона и одиночные выбросы (max) не сравниваем
+_NOT_COMPARED = (
+    "upstream_requests.", ".n", ".concurrency", ".rows", ".max", ".size_bytes", ".import_budget",
+    ".tokens"
+)
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    cur, base = flatten(current), flatten(baseline)
+    regressions = []
+    for key, old in base.items():
+        if key not in cur or old <= 0 or key.startswith(_NOT_COMPARED[0]) or key.endswith(_NOT_COMPARED[1:]):
+            continue
+        new = cur[key]
+        if key.endswith("_rps"):
+            worse = new < old * (1 - tolerance)
+        else:
+            worse = new > old * (1 + tolerance)
+        if worse:
+            regressions.append(f"{key}: {old:g} → {new:g}")
+    return regressions
+
+
+async def main_async(args: argparse.Namespace) -> Dict[str, Any]:
+    config = MockConfig(
+        latency=parse_latency(args.latency),
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+    runner, upstream, base_url = await start(config)
+    tmpdir = tempfile.mkdtemp(prefix="token-bench-")
+    os.environ.update(env_for(base_url))
+    os.environ.update({
+        "CACHE_FILE": os.path.join(tmpdir, "cache.sqlite3"),
+        "SYMBOL_INDEX_PATH": os.path.join(tmpdir, "symbol_index.bin"),
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY") or "bench",
+        "ETHERSCAN_API_KEY": os.environ.get("ETHERSCAN_API_KEY") or "bench",
+        # Лимиты провайдеров не должны искажать замеры самого конвейера
+        "ETHERSCAN_RPS": "1000", "COINGECKO_RPS": "1000",
+        "GEMINI_RPS": "1000", "NEWS_RPS": "1000",
+        "RETRY_BACKOFF_BASE": "0.05", "RETRY_BACKOFF_MAX": "0.5",
+        "PROXY_ENABLED": "false",
+    })
+
+    suite = BenchmarkSuite(args, upstream)
+    try:
+        results = await suite.run()
+    finally:
+        await suite.close()
+        await runner.cleanup()
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "latency": config.latency,
+            "error_rate": config.error_rate,
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a mock upstream")
+    parser.add_argument("--iterations", type=int, default=20, help="токенов на сценарий")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--llm-iterations", type=int, default=5)
+    parser.add_argument("--classifier-rows", type=int, default=2000)
+    parser.add_argument("--latency", action="append", help="provider=seconds, например gemini=0.5")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+",
+                        choices=SCENARIOS)
+    parser.add_argument("--output", help="путь для JSON с результатами")
+    parser.add_argument("--baseline", help="JSON прошлого прогона для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--import-budget", type=float, default=1.0,
+                        help="допустимое время импорта src.bot (p50), сек")
+    args = parser.parse_args()
+
+    report = asyncio.run(main_async(args))
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text)
+    else:
+        print(text)
+
+    startup = report["results"].get("startup")
+    if startup and startup["import_bot"]["p50"] > args.import_budget:
+        print(
+            f"Import budget exceeded: src.bot takes {startup['import_bot']['p50']:.3f}s "
+            f"(budget {args.import_budget:.3f}s); slowest: {startup['top_imports']}",
+            file=sys.stderr
+        )
+        sys.exit(1)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report["results"], baseline.get("results", baseline), args.tolerance)
+        if regressions:
+            print("Regressions:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+        print("No regressions", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
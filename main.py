@@ -1,11 +1,17 @@
 import logging
-from src.bot import ScamAnalyzerBot
+import argparse
+from src.bot import run_workers, LOG_FORMAT
+from src.services.metrics import install_log_trace_ids
+from src.config.settings import BOT_WARMUP
 
 if __name__ == '__main__':
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
-    
-    bot = ScamAnalyzerBot()
-    bot.run()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Telegram scam analyzer bot")
+    parser.add_argument("--warmup", action="store_true", default=BOT_WARMUP,
+                        help="загрузить модель в фоне сразу после старта, а не при первом анализе")
+    args = parser.parse_args()
+
+    # %(trace_id)s в формате — id анализа, к которому относится запись
+    install_log_trace_ids()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+
+    run_workers(warmup=args.warmup)
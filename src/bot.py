@@ -1,7 +1,10 @@
 # src/bot.py
 
-import logging
+import time
+import signal
 import asyncio
+import logging
+import multiprocessing
 
 from telegram import (
     Update,
@@ -16,51 +19,267 @@ from telegram.ext import (
     CallbackQueryHandler,
     filters,
     ContextTypes,
-    ConversationHandler,
 )
-from telegram.error import BadRequest
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+from src.services.combined_inspector import CombinedTokenInspector, MISSING_LABELS
+from src.services.prewarm import PrewarmWorker
+from src.services.job_queue import AnalysisQueue, Overloaded, QueueFull, UserLimitExceeded
+from src.services.conversation_state import ConversationState
+from src.services.webhook_server import WebhookServer, check_secret
+from src.services.rate_limiter import set_rate_share
+from src.services.metrics import (
+    REGISTRY, new_trace_id, install_log_trace_ids, start_metrics_server
+)
+from src.config.settings import (
+    TG_BOT_TOKEN, TG_EDIT_INTERVAL, PREWARM_ENABLED,
+    BOT_MODE, BOT_WORKERS, BOT_WARMUP, TG_WEBHOOK_URL, TG_WEBHOOK_SECRET, TG_WEBHOOK_SET,
+    METRICS_ENABLED, METRICS_HOST, METRICS_PORT, BOT_STATE_MEMORY_SIZE
+)
 
-from src.services.combined_inspector import CombinedTokenInspector
-from src.config.settings import TG_BOT_TOKEN
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(trace_id)s] %(message)s'
+
+ANALYSIS_QUEUE_GAUGE = REGISTRY.gauge(
+    "analysis_queue", "Analysis queue state and counters", ("state",)
+)
 
 # Состояния разговора
-WAIT_TICKER, WAIT_CHAIN = range(2)
+WAIT_TICKER, WAIT_CHAIN, WAIT_COIN = range(3)
+
+# Лимит Telegram на callback_data кнопки, байт
+CALLBACK_DATA_LIMIT = 64
+# Префикс callback_data кнопок выбора монеты при неоднозначном тикере
+COIN_CALLBACK = "coin:"
+# Сколько монет с одинаковым тикером предлагать на выбор (лучшие по рангу)
+COIN_CHOICES = 6
 
 # Клавиатура
 DEFAULT_KEYBOARD = ReplyKeyboardMarkup(
     [["Проверить токен", "/help"]], resize_keyboard=True
 )
 
+class ProgressiveReport:
+    """
+    Постепенная доставка отчёта: по мере генерации одно сообщение
+    редактируется не чаще раза в TG_EDIT_INTERVAL секунд (лимит Telegram
+    на правки), по завершении туда же кладётся финальный текст с разметкой.
+    """
+
+    LIMIT = 4096
+
+    def __init__(self, chat, title: str, interval: float = TG_EDIT_INTERVAL):
+        self.chat = chat
+        self.title = title
+        self.interval = interval
+        self.message = None
+        self._shown = ""
+        self._next_edit = 0.0
+        self._lock = asyncio.Lock()
+
+    async def update(self, text: str) -> None:
+        # Промежуточные версии без разметки: незакрытые * ломают Markdown
+        if time.monotonic() < self._next_edit or self._lock.locked():
+            return
+        async with self._lock:
+            preview = f"{self.title}\n\n{text}"[:self.LIMIT - 2] + " ▌"
+            try:
+                await self._show(preview)
+                self._next_edit = time.monotonic() + self.interval
+            except RetryAfter as e:
+                self._next_edit = time.monotonic() + self._retry_seconds(e)
+            except TelegramError:
+                self._next_edit = time.monotonic() + self.interval
+
+    @staticmethod
+    def _retry_seconds(e: RetryAfter) -> float:
+        retry_after = e.retry_after
+        if hasattr(retry_after, "total_seconds"):
+            retry_after = retry_after.total_seconds()
+        return float(retry_after)
+
+    async def _show(self, text: str, parse_mode: str = None) -> None:
+        if text == self._shown:
+            return
+        if self.message is None:
+            self.message = await self.chat.send_message(text, parse_mode=parse_mode)
+        else:
+            await self.message.edit_text(text, parse_mode=parse_mode)
+        self._shown = text
+
+    async def _edit_final(self, chunk: str) -> bool:
+        """
+        Финальная правка сообщения с превью: после интервала правок и с одним
+        повтором на RetryAfter. False — править не удалось.
+        """
+        delay = self._next_edit - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        for attempt in range(2):
+            try:
+                try:
+                    await self._show(chunk, parse_mode='Markdown')
+                except BadRequest:
+                    await self._show(chunk)
+                return True
+            except RetryAfter as e:
+                if attempt:
+                    return False
+                await asyncio.sleep(self._retry_seconds(e))
+            except TelegramError:
+                return False
+        return False
+
+    async def _send(self, chunk: str) -> None:
+        for attempt in range(2):
+            try:
+                try:
+                    await self.chat.send_message(chunk, parse_mode='Markdown')
+                except BadRequest:
+                    await self.chat.send_message(chunk)
+                return
+            except RetryAfter as e:
+                if attempt:
+                    raise
+                await asyncio.sleep(self._retry_seconds(e))
+
+    async def finish(self, text: str) -> None:
+        async with self._lock:
+            chunks = [text[i:i+self.LIMIT] for i in range(0, len(text), self.LIMIT)] or [""]
+            for idx, chunk in enumerate(chunks):
+                # Не вышло отредактировать превью — отчёт уходит новым сообщением
+                if idx == 0 and self.message is not None and await self._edit_final(chunk):
+                    continue
+                await self._send(chunk)
+
+
 class ScamAnalyzerBot:
-    def __init__(self):
+    def __init__(self, worker: int = 0, warmup: bool = BOT_WARMUP, background: bool = True, workers: int = 1):
+        # Номер процесса в webhook-режиме (для порта метрик)
+        self.worker = worker
+        self.warmup = warmup
+        # Фоновые задачи (прогрев, индекс тикеров, опрос новостей) нужны одному
+        # процессу: их результат попадает в общие кэш и файл индекса
+        self.background = background
         self.inspector = CombinedTokenInspector()
         self.logger = logging.getLogger(__name__)
+        self.prewarm = PrewarmWorker(self.inspector)
+        # Анализы выполняются воркерами очереди, обработчики только ставят задачи
+        self.queue = AnalysisQueue()
+        # Состояние диалогов общее для всех процессов бота (SQLite рядом с кэшем),
+        # поэтому обновления одного пользователя можно раскидывать по процессам;
+        # локальная копия в памяти — только когда процесс один
+        self.state = ConversationState(memory_size=BOT_STATE_MEMORY_SIZE if workers <= 1 else 0)
+        self._background = []
+        self._metrics_runner = None
+        REGISTRY.add_collector(self._collect_metrics)
 
-    def run(self):
-        app = ApplicationBuilder().token(TG_BOT_TOKEN).build()
-
-        conv = ConversationHandler(
-            entry_points=[
-                CommandHandler("start", self.start),
-                MessageHandler(filters.Regex(r"^Проверить токен$"), self.start)
-            ],
-            states={
-                WAIT_TICKER: [MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_ticker)],
-                WAIT_CHAIN: [CallbackQueryHandler(self.handle_chain_selection)],
-            },
-            fallbacks=[
-                CommandHandler("cancel", self.cancel),
-                MessageHandler(filters.Regex(r"^Отмена$"), self.cancel)
-            ],
-            allow_reentry=True,
-        )
+    def _collect_metrics(self) -> None:
+        for state, value in self.queue.stats().items():
+            ANALYSIS_QUEUE_GAUGE.set(value, state=state)
+
+    def _build_application(self, webhook: bool = False):
+        builder = ApplicationBuilder().token(TG_BOT_TOKEN)
+        if webhook:
+            # Обновления приходят через WebhookServer, Updater не нужен
+            builder = builder.updater(None)
+        else:
+            builder = builder.post_init(self._on_startup).post_shutdown(self._on_shutdown)
+        app = builder.build()
 
-        app.add_handler(conv)
+        app.add_handler(CommandHandler("start", self.start))
         app.add_handler(CommandHandler("help", self.help))
+        app.add_handler(CommandHandler("cancel", self.cancel))
+        app.add_handler(MessageHandler(filters.Regex(r"^Проверить токен$"), self.start))
+        app.add_handler(MessageHandler(filters.Regex(r"^Отмена$"), self.cancel))
+        app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.handle_ticker))
+        app.add_handler(CallbackQueryHandler(self.handle_coin_selection, pattern=f"^{COIN_CALLBACK}"))
+        app.add_handler(CallbackQueryHandler(self.handle_chain_selection))
+        return app
+
+    def run(self):
+        if BOT_MODE == "webhook":
+            asyncio.run(self.run_webhook())
+        else:
+            self._build_application().run_polling()
+
+    async def run_webhook(self, set_webhook: bool = TG_WEBHOOK_SET) -> None:
+        """
+        Webhook-режим: собственный HTTP-сервер вместо long polling.
+        Работает до SIGINT/SIGTERM.
+        """
+        app = self._build_application(webhook=True)
+        server = WebhookServer(app, health=self.queue.stats)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        await app.initialize()
+        await self._on_startup(app)
+        await app.start()
+        try:
+            await server.start()
+            if set_webhook:
+                if not TG_WEBHOOK_URL:
+                    raise RuntimeError("TG_WEBHOOK_URL is required to register the webhook")
+                await app.bot.set_webhook(
+                    url=TG_WEBHOOK_URL,
+                    secret_token=TG_WEBHOOK_SECRET,
+                    allowed_updates=Update.ALL_TYPES,
+                )
+            await stop.wait()
+        finally:
+            await server.stop()
+            await app.stop()
+            await self._on_shutdown(app)
+            await app.shutdown()
 
-        app.run_polling()
+    async def _on_startup(self, app) -> None:
+        self.queue.start()
+        if METRICS_ENABLED:
+            try:
+                self._metrics_runner = await start_metrics_server(METRICS_HOST, METRICS_PORT + self.worker)
+            except OSError as e:
+                self.logger.warning("Metrics endpoint disabled: %s", e)
+        # Модель грузится в фоне, пока бот уже принимает обновления
+        if self.warmup:
+            self._background.append(asyncio.create_task(self._warmup()))
+        if not self.background:
+            return
+        # Фоновая пересборка локального индекса тикеров CoinGecko
+        fetcher = self.inspector.fetcher
+        self._background.append(asyncio.create_task(fetcher.symbol_index.run_refresher(fetcher)))
+        # Фоновый опрос новостных лент по недавно запрошенным тикерам
+        self._background.append(asyncio.create_task(self.inspector.news.run()))
+        # Прогрев кэша для trending и списка наблюдения
+        if PREWARM_ENABLED:
+            self._background.append(asyncio.create_task(self.prewarm.run()))
+
+    async def _warmup(self) -> None:
+        try:
+            await self.inspector.warmup()
+        except Exception as e:
+            # Не фатально: модель загрузится при первом анализе
+            self.logger.warning("Warm-up failed: %s", e)
 
-    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    async def _on_shutdown(self, app) -> None:
+        for task in self._background:
+            task.cancel()
+        await self.queue.stop()
+        await self.inspector.news.close()
+        if self._metrics_runner is not None:
+            await self._metrics_runner.cleanup()
+        # Закрываем пул HTTP-соединений фетчера
+        await self.inspector.fetcher.close()
+        await self.inspector.gemini.close()
+        self.state.close()
+
+    @staticmethod
+    def _conversation_key(update: Update):
+        user = update.effective_user
+        return update.effective_chat.id, user.id if user else None
+
+    async def start(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         # При старте показываем инструкцию
         await update.message.reply_text(("""👋 Привет! Я — бот для проверки токенов на скам.\n Нажми "Проверить токен" или введи /start, чтобы начать.\n Для справки в любой момент введи /help."""),
             reply_markup=DEFAULT_KEYBOARD
@@ -69,98 +288,288 @@ class ScamAnalyzerBot:
         await update.message.reply_text(
             "Введи тикер (напр. BTC, ETH):", reply_markup=DEFAULT_KEYBOARD
         )
-        return WAIT_TICKER
+        await self.state.set(*self._conversation_key(update), WAIT_TICKER)
 
     async def help(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(
             "📝 Как пользоваться:\n"
             "1. Нажми 'Проверить токен' или /start.\n"
             "2. Введи тикер токена.\n"
-            "3. Если нужно, выбери сеть из списка.\n"
+            "3. Если нужно, выбери монету и сеть из списка.\n"
             "4. Получи отчёт.\n"
             "Для отмены введи /cancel.",
             reply_markup=DEFAULT_KEYBOARD
         )
 
-    async def handle_ticker(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    async def handle_ticker(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        key = self._conversation_key(update)
+        conversation = await self.state.get(*key)
+        # Тикер ждём только после /start
+        if conversation is None or conversation["state"] != WAIT_TICKER:
+            return
         symbol = update.message.text.strip().upper()
-        context.user_data['symbol'] = symbol
+        await self.state.clear(*key)
 
-        await update.message.reply_text("🔍 Сбор данных и анализ...")
         # Сразу анализируем нативные токены
         if symbol.lower() in self.inspector.native_tokens:
-            result = await self.inspector.inspect(symbol)
-            await self._send_report(update, result)
-            return ConversationHandler.END
+            await self._enqueue(update, symbol)
+            return
 
-        # Получаем платформы
-        try:
-            platforms = await asyncio.get_running_loop().run_in_executor(
-                None,
-                self.inspector.fetcher.get_token_platforms,
-                symbol
+        # Тикер носят несколько монет — пусть пользователь выберет нужную
+        candidates = [c for c in self.inspector.fetcher.get_token_candidates(symbol) if c["platforms"]]
+        if len(candidates) > 1:
+            buttons = []
+            for candidate in candidates[:COIN_CHOICES]:
+                data = self._coin_callback(symbol, candidate["id"])
+                if data:
+                    buttons.append([InlineKeyboardButton(self._coin_label(candidate), callback_data=data)])
+            await update.message.reply_text(
+                f"Тикер {symbol} есть у нескольких монет, выбери нужную:",
+                reply_markup=InlineKeyboardMarkup(buttons)
             )
-        except Exception as e:
-            self.logger.error(f"Error fetching platforms: {e}")
-            result = await self.inspector.inspect(symbol)
-            await self._send_report(update, result)
-            return ConversationHandler.END
+            await self.state.set(*key, WAIT_COIN, symbol=symbol)
+            return
 
-        if not platforms:
-            result = await self.inspector.inspect(symbol)
-            await self._send_report(update, result)
-            return ConversationHandler.END
+        # Тикера нет в локальном индексе — поиск платформ (/search с лимитами
+        # и повторами) выполняется задачей очереди, а не в обработчике:
+        # обновления обрабатываются по одному и ждали бы его все пользователи
+        if not candidates:
+            await self._enqueue(update, symbol, resolve=True)
+            return
+        # Монета фиксируется: без coin_id анализ взял бы первую по рангу
+        coin_id = candidates[0]["id"]
+        platforms = candidates[0]["platforms"]
 
         # Если одна платформа — анализ
         if len(platforms) == 1:
             chain = next(iter(platforms))
-            result = await self.inspector.inspect(symbol, chain=chain)
-            await self._send_report(update, result)
-            return ConversationHandler.END
+            await self._enqueue(update, symbol, chain=chain, coin_id=coin_id)
+            return
 
         # Несколько платформ — предлагаем выбрать
-        buttons = [InlineKeyboardButton(chain, callback_data=chain) for chain in platforms]
-        keyboard = [buttons[i:i+2] for i in range(0, len(buttons), 2)]
         await update.message.reply_text(
-            "Выбери сеть для анализа:",
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            "Выбери сеть для анализа:", reply_markup=self._chain_keyboard(symbol, platforms)
+        )
+        await self.state.set(*key, WAIT_CHAIN, symbol=symbol, coin_id=coin_id)
+
+    def _chain_keyboard(self, symbol: str, platforms) -> InlineKeyboardMarkup:
+        # Тикер зашит в кнопку, чтобы нажатие мог обработать любой процесс бота
+        buttons = [
+            InlineKeyboardButton(chain, callback_data=self._chain_callback(symbol, chain))
+            for chain in platforms
+        ]
+        return InlineKeyboardMarkup([buttons[i:i+2] for i in range(0, len(buttons), 2)])
+
+    @staticmethod
+    def _chain_callback(symbol: str, chain: str) -> str:
+        data = f"{symbol}|{chain}"
+        # Не влезло в лимит — тикер берётся из состояния диалога
+        return data if len(data.encode("utf-8")) <= CALLBACK_DATA_LIMIT else chain
+
+    @staticmethod
+    def _coin_label(candidate: dict) -> str:
+        rank = f" (#{candidate['rank']})" if candidate.get("rank") else ""
+        return f"{candidate.get('name') or candidate['id']}{rank}"
+
+    @staticmethod
+    def _coin_callback(symbol: str, coin_id: str):
+        # Как у сетей: без тикера, если не влезает; None — не влезает и id монеты
+        for data in (f"{COIN_CALLBACK}{symbol}|{coin_id}", f"{COIN_CALLBACK}{coin_id}"):
+            if len(data.encode("utf-8")) <= CALLBACK_DATA_LIMIT:
+                return data
+        return None
+
+    async def handle_coin_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        query = update.callback_query
+        await query.answer()
+        key = self._conversation_key(update)
+        symbol, _, coin_id = (query.data or "")[len(COIN_CALLBACK):].rpartition("|")
+        if not symbol:
+            conversation = await self.state.get(*key) or {}
+            symbol = conversation.get("data", {}).get("symbol")
+        if not symbol:
+            await query.edit_message_text("⌛ Выбор устарел, начни заново: /start")
+            return
+        await self.state.clear(*key)
+
+        # Платформы из локального индекса; если монета из него пропала (пересборка),
+        # анализ сам найдёт их по id монеты уже в очереди
+        platforms = next(
+            (c["platforms"] for c in self.inspector.fetcher.get_token_candidates(symbol) if c["id"] == coin_id),
+            {}
         )
-        context.user_data['platforms'] = platforms
-        return WAIT_CHAIN
+        if len(platforms) > 1:
+            await query.edit_message_text(
+                "Выбери сеть для анализа:", reply_markup=self._chain_keyboard(symbol, platforms)
+            )
+            await self.state.set(*key, WAIT_CHAIN, symbol=symbol, coin_id=coin_id)
+            return
+        chain = next(iter(platforms), None)
+        await query.edit_message_text(f"🔄 Анализ {symbol} ({coin_id})...")
+        await self._enqueue(update, symbol, chain=chain, coin_id=coin_id)
 
-    async def handle_chain_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    async def handle_chain_selection(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         query = update.callback_query
         await query.answer()
-        chain = query.data
-        symbol = context.user_data.get('symbol')
+        key = self._conversation_key(update)
+        symbol, _, chain = (query.data or "").rpartition("|")
+        data = (await self.state.get(*key) or {}).get("data", {})
+        symbol = symbol or data.get("symbol")
+        if not symbol:
+            await query.edit_message_text("⌛ Выбор устарел, начни заново: /start")
+            return
+        # Монета, выбранная на предыдущем шаге (если тикер был неоднозначен)
+        coin_id = data.get("coin_id") if data.get("symbol") == symbol else None
+        await self.state.clear(*key)
 
         await query.edit_message_text(f"🔄 Анализ {symbol} в сети {chain}...")
-        result = await self.inspector.inspect(symbol, chain=chain)
-        await query.message.reply_text("✅ Отчёт готов:")
-        await self._send_report(update, result)
-        return ConversationHandler.END
+        await self._enqueue(update, symbol, chain=chain, coin_id=coin_id)
+
+    async def _enqueue(
+        self,
+        update: Update,
+        symbol: str,
+        chain: str = None,
+        coin_id: str = None,
+        resolve: bool = False
+    ) -> None:
+        """
+        Ставит анализ в очередь и сразу возвращает управление обработчику.
+        Пользователь видит позицию в очереди; при перегрузке — явный отказ.
+        `resolve` — сначала найти платформы тикера (и, если сетей несколько,
+        предложить выбор вместо анализа).
+        """
+        chat = update.effective_chat
+        user_id = update.effective_user.id if update.effective_user else chat.id
+        status = await chat.send_message("🔍 Сбор данных и анализ...")
+
+        async def on_position(position: int) -> None:
+            text = "🔍 Сбор данных и анализ..." if position == 0 else f"⏳ В очереди: {position}"
+            await status.edit_text(text)
+
+        async def on_reject(exc: Overloaded) -> None:
+            await status.edit_text("⚠️ Сервис перегружен, анализ отменён. Попробуй через пару минут.")
 
-    async def _send_report(self, update: Update, result: dict) -> None:
+        try:
+            if resolve:
+                run = lambda: self._resolve_and_analyze(update, symbol, status)
+            else:
+                run = lambda: self._analyze(update, symbol, chain, coin_id)
+            job = self.queue.submit(
+                user_id,
+                run,
+                on_position=on_position,
+                on_reject=on_reject
+            )
+        except UserLimitExceeded:
+            await status.edit_text(
+                "⏳ У тебя уже идут проверки — дождись их результата и попробуй снова."
+            )
+            return
+        except QueueFull:
+            self.logger.warning("Analysis queue full, rejecting %s", symbol)
+            await status.edit_text("⚠️ Сервис перегружен. Попробуй через пару минут.")
+            return
+        if job.position:
+            await status.edit_text(f"⏳ В очереди: {job.position}")
+
+    async def _resolve_and_analyze(self, update: Update, symbol: str, status) -> None:
+        """
+        Задача очереди для тикера не из локального индекса: поиск платформ,
+        затем выбор сети (если их несколько) или сразу анализ.
+        """
+        try:
+            platforms = await self.inspector.fetcher.get_token_platforms(symbol)
+        except Exception as e:
+            self.logger.error(f"Error fetching platforms: {e}")
+            platforms = {}
+        if len(platforms) > 1:
+            await status.edit_text(
+                "Выбери сеть для анализа:", reply_markup=self._chain_keyboard(symbol, platforms)
+            )
+            await self.state.set(*self._conversation_key(update), WAIT_CHAIN, symbol=symbol)
+            return
+        await self._analyze(update, symbol, next(iter(platforms), None))
+
+    async def _analyze(self, update: Update, symbol: str, chain: str = None, coin_id: str = None) -> None:
+        """
+        Запускает анализ и показывает отчёт по мере генерации (выполняется воркером очереди).
+        """
+        trace_id = new_trace_id()
+        self.logger.info("Analysis of %s (%s) started", symbol, chain or "auto")
+        report = ProgressiveReport(update.effective_chat, symbol)
+        try:
+            result = await self.inspector.inspect(
+                symbol, chain=chain, on_progress=report.update, coin_id=coin_id
+            )
+        except Exception:
+            self.logger.exception("Analysis of %s failed (trace %s)", symbol, trace_id)
+            await update.effective_chat.send_message("❌ Не удалось выполнить анализ, попробуй позже.")
+            return
+        await self._send_report(update, result, report)
+
+    def _report_text(self, result: dict) -> str:
         # Заголовок отчёта
         if 'chain_id' in result:
             header = f"*{result['symbol']}* (chain: {result['chain_id']})\n\n"
         elif 'address' in result:
-            header = f"*{result['symbol']}* (`{result['address']}`)\n\n"
+            network = f"{result['chain']}: " if result.get('chain') else ""
+            header = f"*{result['symbol']}* ({network}`{result['address']}`)\n\n"
         else:
             header = f"*{result['symbol']}*\n\n"
+        missing = [MISSING_LABELS.get(m, m) for m in result.get('missing', []) if m != 'llm']
+        if missing:
+            header += f"⚠️ Неполные данные: {', '.join(missing)}\n\n"
+        return header + result.get('llm_report', '')
 
-        text = header + result.get('llm_report', '')
-        # Разбиваем на части по 4096 символов
-        for chunk in [text[i:i+4096] for i in range(0, len(text), 4096)]:
-            try:
-                await update.effective_chat.send_message(chunk, parse_mode='Markdown')
-            except BadRequest:
-                await update.effective_chat.send_message(chunk)
+    async def _send_report(self, update: Update, result: dict, report: ProgressiveReport = None) -> None:
+        report = report or ProgressiveReport(update.effective_chat, result['symbol'])
+        # Разбивка на части по 4096 символов — внутри finish
+        await report.finish(self._report_text(result))
 
-    async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    async def cancel(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        await self.state.clear(*self._conversation_key(update))
         await update.message.reply_text("❌ Операция отменена.", reply_markup=DEFAULT_KEYBOARD)
-        return ConversationHandler.END
+
+
+def _webhook_worker(index: int, workers: int, warmup: bool = BOT_WARMUP) -> None:
+    install_log_trace_ids()
+    logging.basicConfig(level=logging.INFO, format=f'worker{index} - {LOG_FORMAT}')
+    # Лимиты провайдеров делятся поровну между процессами
+    set_rate_share(1.0 / workers)
+    # Webhook и фоновые задачи — только у первого процесса
+    bot = ScamAnalyzerBot(worker=index, warmup=warmup, background=index == 0, workers=workers)
+    asyncio.run(bot.run_webhook(set_webhook=TG_WEBHOOK_SET and index == 0))
+
+
+def run_workers(workers: int = BOT_WORKERS, warmup: bool = BOT_WARMUP) -> None:
+    """
+    Запуск бота: polling в одном процессе или `workers` процессов в webhook-режиме,
+    слушающих один порт. Кэш и состояние диалогов у процессов общие (SQLite),
+    лимиты провайдеров поделены между процессами, фоновые задачи работают
+    в процессе 0.
+    """
+    if BOT_MODE == "webhook":
+        # До запуска процессов: без секрета webhook-режим не стартует
+        check_secret(TG_WEBHOOK_SECRET)
+    if BOT_MODE != "webhook" or workers <= 1:
+        ScamAnalyzerBot(warmup=warmup).run()
+        return
+    processes = [
+        multiprocessing.Process(target=_webhook_worker, args=(i, workers, warmup), name=f"bot-worker-{i}")
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join()
 
 
 if __name__ == '__main__':
-    ScamAnalyzerBot().run()
+    run_workers()
@@ -8,6 +8,25 @@ load_dotenv()
 # Telegram
 TG_BOT_TOKEN = os.getenv("TG_BOT_TOKEN")
 SUPPORTED_CHAINS_PATH = os.getenv("SUPPORTED_CHAINS_PATH", "data/supported_chains.json")
+# Минимальный интервал между правками сообщения при потоковой выдаче отчёта, сек
+TG_EDIT_INTERVAL = float(os.getenv("TG_EDIT_INTERVAL", "1.5"))
+# Режим получения обновлений: polling (один процесс) или webhook (свой HTTP-сервер,
+# несколько процессов за балансировщиком)
+BOT_MODE           = os.getenv("BOT_MODE", "polling").lower()
+# Число процессов бота в webhook-режиме; все слушают один порт (SO_REUSEPORT)
+BOT_WORKERS        = int(os.getenv("BOT_WORKERS", "1"))
+# Загружать модель в фоне сразу после старта (иначе — при первом анализе);
+# включается и флагом `python main.py --warmup`
+BOT_WARMUP         = os.getenv("BOT_WARMUP", "false").lower() == "true"
+# Публичный URL, который регистрируется в Telegram (https://bot.example.com/telegram)
+TG_WEBHOOK_URL     = os.getenv("TG_WEBHOOK_URL", "")
+TG_WEBHOOK_LISTEN  = os.getenv("TG_WEBHOOK_LISTEN", "0.0.0.0")
+TG_WEBHOOK_PORT    = int(os.getenv("TG_WEBHOOK_PORT", "8443"))
+TG_WEBHOOK_PATH    = os.getenv("TG_WEBHOOK_PATH", "/telegram")
+# Проверяется в заголовке X-Telegram-Bot-Api-Secret-Token; обязателен в webhook-режиме
+TG_WEBHOOK_SECRET  = os.getenv("TG_WEBHOOK_SECRET", "")
+# Регистрировать ли webhook при старте; на дополнительных хостах можно выключить
+TG_WEBHOOK_SET     = os.getenv("TG_WEBHOOK_SET", "true").lower() == "true"
 # API Keys
 GEMINI_API_KEY     = os.getenv("GEMINI_API_KEY")
 BSCSCAN_API_KEY    = os.getenv("BSCSCAN_API_KEY")
@@ -21,11 +40,179 @@ PROXIES = {
     "https": os.getenv("PROXY_HTTPS"),
 }
 # Endpoints
-COINGECKO_API_BASE = "https://api.coingecko.com/api/v3"
-GEMINI_API_BASE    = "https://generativelanguage.googleapis.com/v1beta"
+# (переопределяются через окружение, например для локального mock-сервера бенчмарков)
+COINGECKO_API_BASE = os.getenv("COINGECKO_BASE", "https://api.coingecko.com/api/v3").rstrip("/")
+GEMINI_API_BASE    = os.getenv("GEMINI_API_BASE", "https://generativelanguage.googleapis.com/v1beta")
+ETHERSCAN_API_BASE = os.getenv("ETHERSCAN_API_BASE", "https://api.etherscan.io/api")
+NEWS_RSS_URL       = os.getenv("NEWS_RSS_URL", "https://news.google.com/rss/search?q={q}&hl=ru&gl=RU&ceid=RU:ru")
+
+# Обозреватели блоков (API в стиле Etherscan) по id платформы CoinGecko:
+# (имя провайдера для лимитов, URL API, ключ). Сети без обозревателя
+# анализируются только по рыночным данным.
+EXPLORERS = {
+    "ethereum": ("etherscan", ETHERSCAN_API_BASE, ETHERSCAN_API_KEY),
+    "binance-smart-chain": (
+        "bscscan", os.getenv("BSCSCAN_API_BASE", "https://api.bscscan.com/api"), BSCSCAN_API_KEY
+    ),
+    "polygon-pos": (
+        "polygonscan", os.getenv("POLYGONSCAN_API_BASE", "https://api.polygonscan.com/api"),
+        os.getenv("POLYGONSCAN_API_KEY")
+    ),
+    "arbitrum-one": (
+        "arbiscan", os.getenv("ARBISCAN_API_BASE", "https://api.arbiscan.io/api"),
+        os.getenv("ARBISCAN_API_KEY")
+    ),
+    "optimistic-ethereum": (
+        "optimism-etherscan", os.getenv("OPTIMISM_API_BASE", "https://api-optimistic.etherscan.io/api"),
+        os.getenv("OPTIMISM_API_KEY")
+    ),
+    "base": (
+        "basescan", os.getenv("BASESCAN_API_BASE", "https://api.basescan.org/api"),
+        os.getenv("BASESCAN_API_KEY")
+    ),
+}
+
+# Поставщики фич токена по порядку (см. src/services/providers.py);
+# стороннего поставщика можно указать как "package.module:Class"
+DATA_PROVIDERS = [
+    s.strip() for s in os.getenv("DATA_PROVIDERS", "contract,listings,market,price_history").split(",")
+    if s.strip()
+]
 
 # Caching & retries
-CACHE_FILE    = "token_cache.db"
+CACHE_FILE    = os.getenv("CACHE_FILE", "token_cache.sqlite3")
+CACHE_MEMORY_SIZE = int(os.getenv("CACHE_MEMORY_SIZE", "2048"))
+# TTL записей кэша, секунды
+CACHE_TTL_PLATFORMS = int(os.getenv("CACHE_TTL_PLATFORMS", str(7 * 24 * 3600)))
+CACHE_TTL_CONTRACT  = int(os.getenv("CACHE_TTL_CONTRACT", str(24 * 3600)))
+# Анализ ABI по хэшу байткода: клоны одного контракта разбираются один раз
+CACHE_TTL_CODE      = int(os.getenv("CACHE_TTL_CODE", str(7 * 24 * 3600)))
+CACHE_TTL_MARKET    = int(os.getenv("CACHE_TTL_MARKET", "300"))
+CACHE_TTL_LISTINGS  = int(os.getenv("CACHE_TTL_LISTINGS", "3600"))
+CACHE_TTL_NEWS      = int(os.getenv("CACHE_TTL_NEWS", "600"))
+# Кэш готовых LLM-отчётов по хэшу входных данных
+REPORT_CACHE_TTL         = int(os.getenv("REPORT_CACHE_TTL", "900"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "5000"))
 REQUEST_TIMEOUT = 10
 MAX_RETRIES     = 3
-RETRY_DELAY     = 5
+# Экспоненциальный backoff с jitter: base * 2^attempt, не более max (секунды)
+RETRY_BACKOFF_BASE = float(os.getenv("RETRY_BACKOFF_BASE", "0.5"))
+RETRY_BACKOFF_MAX  = float(os.getenv("RETRY_BACKOFF_MAX", "30"))
+
+# Лимиты провайдеров: (запросов в секунду, размер всплеска)
+RATE_LIMITS = {
+    # Etherscan free tier: 5 calls/sec
+    "etherscan": (float(os.getenv("ETHERSCAN_RPS", "5")), 5),
+    # Прочие обозреватели (bscscan, polygonscan, ...) — тот же free tier,
+    # у каждого свой бюджет; без явной записи берётся "default"
+    "bscscan":   (float(os.getenv("BSCSCAN_RPS", "5")), 5),
+    # CoinGecko public/demo API: 30 calls/min
+    "coingecko": (float(os.getenv("COINGECKO_RPS", "0.5")), 5),
+    # Gemini 2.0 Flash-Lite free tier: 30 requests/min
+    "gemini":    (float(os.getenv("GEMINI_RPS", "0.5")), 3),
+    "news":      (float(os.getenv("NEWS_RPS", "2")), 5),
+    "default":   (5.0, 5),
+}
+# Circuit breaker: сколько ошибок подряд открывает автомат и на сколько секунд
+CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+CIRCUIT_RESET_TIMEOUT     = float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30"))
+GEMINI_TIMEOUT            = float(os.getenv("GEMINI_TIMEOUT", "60"))
+
+# История цен и детект дампов
+PRICE_HISTORY_DAYS        = int(os.getenv("PRICE_HISTORY_DAYS", "7"))
+PRICE_HISTORY_MIN_REFRESH = int(os.getenv("PRICE_HISTORY_MIN_REFRESH", "300"))
+DUMP_THRESHOLD_PCT        = float(os.getenv("DUMP_THRESHOLD_PCT", "25"))
+
+# HTTP connection pool
+HTTP_POOL_SIZE     = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_PER_HOST = int(os.getenv("HTTP_POOL_PER_HOST", "10"))
+
+# Локальный индекс тикеров CoinGecko (coins/list + платформы)
+SYMBOL_INDEX_PATH       = os.getenv("SYMBOL_INDEX_PATH", "data/symbol_index.bin")
+SYMBOL_INDEX_REFRESH    = int(os.getenv("SYMBOL_INDEX_REFRESH", str(24 * 3600)))
+# Сколько страниц по 250 монет из /coins/markets брать для ранжирования
+SYMBOL_INDEX_RANK_PAGES = int(os.getenv("SYMBOL_INDEX_RANK_PAGES", "4"))
+
+# Локальная база проверенных контрактов (python -m src.services.contract_store ingest ...);
+# адреса из неё анализируются без запросов к обозревателю блоков
+CONTRACT_STORE_PATH = os.getenv("CONTRACT_STORE_PATH", "data/contracts.sqlite3")
+
+# Разбор исходников контрактов: процессы пула и размер (символов), начиная с
+# которого исходник разбирается в пуле, а не в процессе бота; 0 процессов — всегда на месте
+SOURCE_SCAN_WORKERS      = int(os.getenv("SOURCE_SCAN_WORKERS", "2"))
+SOURCE_SCAN_INLINE_BYTES = int(os.getenv("SOURCE_SCAN_INLINE_BYTES", "32768"))
+
+# Фоновый прогрев кэша: trending CoinGecko + список наблюдения
+PREWARM_ENABLED        = os.getenv("PREWARM_ENABLED", "true").lower() == "true"
+# Чуть меньше CACHE_TTL_MARKET, чтобы рыночные данные не успевали протухнуть
+PREWARM_INTERVAL       = int(os.getenv("PREWARM_INTERVAL", "240"))
+PREWARM_CONCURRENCY    = int(os.getenv("PREWARM_CONCURRENCY", "3"))
+PREWARM_TRENDING       = os.getenv("PREWARM_TRENDING", "true").lower() == "true"
+# Тикеры через запятую и/или файл с тикером в каждой строке
+PREWARM_WATCHLIST      = [s.strip() for s in os.getenv("PREWARM_WATCHLIST", "").split(",") if s.strip()]
+PREWARM_WATCHLIST_PATH = os.getenv("PREWARM_WATCHLIST_PATH", "")
+# Генерировать ли заранее и LLM-отчёты (расходует квоту Gemini)
+PREWARM_REPORTS        = os.getenv("PREWARM_REPORTS", "false").lower() == "true"
+# Сколько токенов в bucket провайдера оставлять интерактивным запросам
+PREWARM_MIN_HEADROOM   = float(os.getenv("PREWARM_MIN_HEADROOM", "2"))
+
+# Состояние диалогов (ждём тикер и т.п.) — в SQLite, общем для всех процессов бота
+BOT_STATE_FILE = os.getenv("BOT_STATE_FILE", CACHE_FILE)
+BOT_STATE_TTL  = int(os.getenv("BOT_STATE_TTL", "3600"))
+# LRU перед SQLite для бота в одном процессе (в webhook-режиме с N процессами не используется)
+BOT_STATE_MEMORY_SIZE = int(os.getenv("BOT_STATE_MEMORY_SIZE", "10000"))
+
+# Бюджет времени на один анализ, сек, и доли бюджета, к которым должна
+# завершиться каждая стадия (дедлайн отсчитывается от начала анализа).
+# Не успевшая стадия отменяется, отчёт строится по тому, что есть.
+INSPECT_BUDGET = float(os.getenv("INSPECT_BUDGET", "6"))
+INSPECT_STAGE_SHARES = {
+    name: float(share)
+    for name, share in (
+        item.split("=") for item in os.getenv(
+            "INSPECT_STAGE_SHARES",
+            "platforms=0.3,news=0.6,contract=0.65,market=0.65,classify=0.7,llm=1.0"
+        ).split(",") if "=" in item
+    )
+}
+
+# Пакетные рыночные данные CoinGecko (пакетные проверки, прогрев): токенов
+# на запрос /coins/markets?ids=... и /simple/token_price/{platform}
+BULK_MARKET_IDS       = int(os.getenv("BULK_MARKET_IDS", "250"))
+BULK_MARKET_ADDRESSES = int(os.getenv("BULK_MARKET_ADDRESSES", "100"))
+
+# Новости: источники RSS/Atom в виде "имя=URL" через запятую. URL с {q}
+# запрашивается отдельно по каждому тикеру; общая лента без {q} опрашивается
+# один раз, а из неё берутся записи, где тикер встречается в заголовке.
+NEWS_SOURCES = [
+    (name.strip(), url.strip())
+    for name, _, url in (
+        item.partition("=") for item in os.getenv("NEWS_SOURCES", f"google={NEWS_RSS_URL}").split(",")
+    ) if url.strip()
+]
+# Сколько записей разбирать из ленты по тикеру и из общей ленты
+NEWS_FEED_ITEMS        = int(os.getenv("NEWS_FEED_ITEMS", "10"))
+NEWS_SHARED_FEED_ITEMS = int(os.getenv("NEWS_SHARED_FEED_ITEMS", "50"))
+NEWS_FEED_TIMEOUT      = float(os.getenv("NEWS_FEED_TIMEOUT", "5"))
+# Фоновый опрос источников по недавно запрошенным тикерам, сек
+NEWS_POLL_INTERVAL     = float(os.getenv("NEWS_POLL_INTERVAL", "300"))
+# Тикер, который не запрашивали дольше этого, перестаёт опрашиваться, сек
+NEWS_QUERY_IDLE        = float(os.getenv("NEWS_QUERY_IDLE", str(6 * 3600)))
+NEWS_INDEX_SIZE        = int(os.getenv("NEWS_INDEX_SIZE", "1000"))
+
+# Метрики (GET /metrics в формате Prometheus) и трассировка
+METRICS_ENABLED     = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+METRICS_HOST        = os.getenv("METRICS_HOST", "127.0.0.1")
+# В webhook-режиме процесс N слушает METRICS_PORT + N
+METRICS_PORT        = int(os.getenv("METRICS_PORT", "9108"))
+# Отчёты дольше порога логируются с таймингами стадий и trace id, сек
+SLOW_REPORT_SECONDS = float(os.getenv("SLOW_REPORT_SECONDS", "15"))
+
+# Очередь анализов в боте
+ANALYSIS_WORKERS           = int(os.getenv("ANALYSIS_WORKERS", "8"))
+ANALYSIS_QUEUE_SIZE        = int(os.getenv("ANALYSIS_QUEUE_SIZE", "100"))
+ANALYSIS_PER_USER          = int(os.getenv("ANALYSIS_PER_USER", "2"))
+# Сколько задача может ждать в очереди, прежде чем будет снята, сек
+ANALYSIS_QUEUE_TIMEOUT     = float(os.getenv("ANALYSIS_QUEUE_TIMEOUT", "120"))
+# Как часто обновлять пользователю позицию в очереди, сек
+ANALYSIS_POSITION_INTERVAL = float(os.getenv("ANALYSIS_POSITION_INTERVAL", "3"))
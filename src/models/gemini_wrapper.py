@@ -1,42 +1,175 @@
 import os
+import json
+import time
+import asyncio
+import logging
 import requests
-from typing import Optional
-from ..config.settings import GEMINI_API_KEY, PROXIES, GEMINI_API_BASE
+import aiohttp
+from typing import Optional, AsyncIterator
+from ..config.settings import GEMINI_API_KEY, PROXIES, GEMINI_API_BASE, GEMINI_TIMEOUT
+from ..services.rate_limiter import (
+    get_scheduler, parse_retry_after, RetryableHTTPError, RETRY_STATUSES
+)
+from ..services.metrics import instrument, record_error, CALL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class GeminiBlockedError(RuntimeError):
+    """
+    Ответ без кандидатов: запрос отклонён фильтрами Gemini (promptFeedback.blockReason).
+    Повтор того же промпта ничего не даст.
+    """
+
+    def __init__(self, reason: str):
+        super().__init__(f"Gemini returned no candidates (blockReason: {reason})")
+        self.reason = reason
 
 class GeminiWrapper:
+    # Текст, который возвращается вместо отчёта при ошибке API
+    ERROR_TEXT = "Не удалось получить анализ"
+
     def __init__(self, model: str = "gemini-2.0-flash-lite"):
         self.model = model
         self.api_key = GEMINI_API_KEY
         self.api_url = f"{GEMINI_API_BASE}/models/{self.model}:generateContent"
+        self.stream_url = f"{GEMINI_API_BASE}/models/{self.model}:streamGenerateContent"
         if PROXIES["ENABLED"]:
             self.proxies = PROXIES
         else:
             self.proxies = None
+        # Общий лимит запросов к Gemini, повторы и circuit breaker
+        self.scheduler = get_scheduler(
+            "gemini",
+            (requests.ConnectionError, requests.Timeout,
+             aiohttp.ClientConnectionError, asyncio.TimeoutError)
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
 
+    def _headers(self) -> dict:
+        # Ключ — в заголовке, а не в query string: URL попадает в текст
+        # исключений requests/aiohttp, а они пишутся в лог
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["x-goog-api-key"] = self.api_key
+        return headers
+
+    @staticmethod
+    def _payload(prompt: str) -> dict:
+        return {
+            "contents": [
+                {
+                    "parts": [
+                        {"text": prompt}
+                    ]
+                }
+            ]
+        }
+
+    @staticmethod
+    def _extract_text(data: dict, stream: bool = False) -> str:
+        """
+        Текст первого кандидата. Без кандидатов — GeminiBlockedError с причиной
+        из promptFeedback; в потоке служебный фрагмент без кандидатов
+        (и без blockReason) просто пропускается.
+        """
+        candidates = data.get('candidates') or []
+        if not candidates:
+            reason = (data.get('promptFeedback') or {}).get('blockReason')
+            if stream and reason is None:
+                return ""
+            raise GeminiBlockedError(reason or "unspecified")
+        parts = (candidates[0].get('content') or {}).get('parts', [])
+        return "".join(p.get('text', '') for p in parts)
+
+    def _post(self, endpoint: str, headers: dict, data: dict) -> dict:
+        resp = requests.post(
+            endpoint,
+            headers=headers,
+            json=data,
+            proxies=self.proxies,
+            timeout=GEMINI_TIMEOUT
+        )
+        if resp.status_code in RETRY_STATUSES:
+            raise RetryableHTTPError(resp.status_code, parse_retry_after(resp.headers.get("Retry-After")))
+        resp.raise_for_status()
+        return resp.json()
+
+    @instrument("gemini_generate")
     def generate(self, prompt: str) -> str:
         try:
-            data = {
-                "contents": [
-                    {
-                        "parts": [
-                            {"text": prompt}
-                        ]
-                    }
-                ]
-            }
-
-            headers = {"Content-Type": "application/json"}
-            api_endpoint = f"{self.api_url}?key={self.api_key}"
-            
-            resp = requests.post(
-                api_endpoint,
-                headers=headers,
-                json=data,
-                proxies=self.proxies
+            data = self._payload(prompt)
+
+            headers = self._headers()
+
+            result = self.scheduler.run_sync(lambda: self._post(self.api_url, headers, data))
+
+            return self._extract_text(result)
+        except GeminiBlockedError as e:
+            record_error("gemini_generate", e)
+            logger.warning("Gemini blocked the prompt: %s", e.reason)
+            raise
+        except Exception as e:
+            record_error("gemini_generate", e)
+            logger.error("Gemini API call failed: %s", e)
+            return self.ERROR_TEXT
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            # Общий таймаут не ограничиваем: поток может идти долго,
+            # но пауза между чанками не должна превышать GEMINI_TIMEOUT
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=None, sock_connect=GEMINI_TIMEOUT, sock_read=GEMINI_TIMEOUT)
             )
-            resp.raise_for_status()
-            
-            return resp.json()['candidates'][0]['content']['parts'][0]['text']
+            self._session_loop = loop
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """
+        Асинхронная потоковая генерация через streamGenerateContent (SSE):
+        отдаёт текстовые фрагменты по мере их появления. Ограничение частоты
+        и повторы применяются к установке соединения, до первого фрагмента.
+        """
+        session = self._get_session()
+        endpoint = f"{self.stream_url}?alt=sse"
+        proxy = (self.proxies.get("https") or self.proxies.get("http")) if self.proxies else None
+
+        async def connect() -> aiohttp.ClientResponse:
+            resp = await session.post(endpoint, json=self._payload(prompt), headers=self._headers(), proxy=proxy)
+            if resp.status in RETRY_STATUSES:
+                resp.release()
+                raise RetryableHTTPError(resp.status, parse_retry_after(resp.headers.get("Retry-After")))
+            if resp.status >= 400:
+                resp.release()
+                resp.raise_for_status()
+            return resp
+
+        started = time.perf_counter()
+        first = True
+        try:
+            resp = await self.scheduler.run(connect)
+            try:
+                async for raw in resp.content:
+                    line = raw.decode("utf-8").strip()
+                    if not line.startswith("data:"):
+                        continue
+                    text = self._extract_text(json.loads(line[len("data:"):]), stream=True)
+                    if text:
+                        if first:
+                            CALL_SECONDS.observe(time.perf_counter() - started, call="gemini_first_chunk")
+                            first = False
+                        yield text
+            finally:
+                resp.release()
         except Exception as e:
-            print(f"Error in Gemini API call: {e}")
-            return "Не удалось получить анализ"
\ No newline at end of file
+            record_error("gemini_stream", e)
+            raise
+        finally:
+            CALL_SECONDS.observe(time.perf_counter() - started, call="gemini_stream")
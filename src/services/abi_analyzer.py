@@ -0,0 +1,350 @@
+# src/services/abi_analyzer.py
+
+import re
+import json
+import hashlib
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+try:
+    # Нативный Keccak из pycryptodome; без него — реализация ниже (~0.5 мс на подпись)
+    from Crypto.Hash import keccak as _native_keccak
+except ImportError:
+    _native_keccak = None
+
+# --- Keccak-256 (вариант Ethereum, не SHA3-256 из hashlib) ---
+
+_MASK64 = (1 << 64) - 1
+
+
+def _rol(value: int, shift: int) -> int:
+    shift %= 64
+    return ((value << shift) | (value >> (64 - shift))) & _MASK64
+
+
+def _keccak_round_constants() -> List[int]:
+    constants, r = [], 1
+    for _ in range(24):
+        rc = 0
+        for j in range(7):
+            r = ((r << 1) ^ ((r >> 7) * 0x71)) % 256
+            if r & 2:
+                rc ^= 1 << ((1 << j) - 1)
+        constants.append(rc)
+    return constants
+
+
+def _keccak_rotations() -> List[List[int]]:
+    rot = [[0] * 5 for _ in range(5)]
+    x, y = 1, 0
+    for t in range(24):
+        rot[x][y] = (t + 1) * (t + 2) // 2
+        x, y = y, (2 * x + 3 * y) % 5
+    return rot
+
+
+_RC = _keccak_round_constants()
+_ROT = _keccak_rotations()
+
+
+def _keccak_f(lanes: List[List[int]]) -> None:
+    for rc in _RC:
+        c = [lanes[x][0] ^ lanes[x][1] ^ lanes[x][2] ^ lanes[x][3] ^ lanes[x][4] for x in range(5)]
+        d = [c[(x - 1) % 5] ^ _rol(c[(x + 1) % 5], 1) for x in range(5)]
+        b = [[0] * 5 for _ in range(5)]
+        for x in range(5):
+            for y in range(5):
+                b[y][(2 * x + 3 * y) % 5] = _rol(lanes[x][y] ^ d[x], _ROT[x][y])
+        for x in range(5):
+            for y in range(5):
+                lanes[x][y] = b[x][y] ^ ((~b[(x + 1) % 5][y]) & b[(x + 2) % 5][y])
+        lanes[0][0] ^= rc
+
+
+def _keccak256_py(data: bytes) -> bytes:
+    rate = 136
+    padded = bytearray(data) + b"\x01"
+    padded += b"\x00" * (-len(padded) % rate)
+    padded[-1] |= 0x80
+    lanes = [[0] * 5 for _ in range(5)]
+    for offset in range(0, len(padded), rate):
+        block = padded[offset:offset + rate]
+        for i in range(rate // 8):
+            lanes[i % 5][i // 5] ^= int.from_bytes(block[8 * i:8 * i + 8], "little")
+        _keccak_f(lanes)
+    out = b"".join(lanes[i % 5][i // 5].to_bytes(8, "little") for i in range(4))
+    return out
+
+
+def keccak256(data: bytes) -> bytes:
+    if _native_keccak is not None:
+        return _native_keccak.new(digest_bits=256, data=data).digest()
+    return _keccak256_py(data)
+
+
+@lru_cache(maxsize=4096)
+def selector(signature: str) -> str:
+    """
+    4-байтовый селектор функции: "transfer(address,uint256)" → "0xa9059cbb".
+    """
+    return "0x" + keccak256(signature.encode("ascii")).hex()[:8]
+
+
+# --- ABI ---
+
+def _canonical_type(param: Mapping[str, Any]) -> str:
+    t = param.get("type", "")
+    if t.startswith("tuple"):
+        inner = ",".join(_canonical_type(c) for c in param.get("components", []))
+        return f"({inner}){t[len('tuple'):]}"
+    return t
+
+
+def signature(entry: Mapping[str, Any]) -> str:
+    args = ",".join(_canonical_type(p) for p in entry.get("inputs", []))
+    return f"{entry.get('name', '')}({args})"
+
+
+def parse_abi(abi: Any) -> List[Dict[str, Any]]:
+    """
+    ABI из ответа Etherscan (JSON-строка) или уже разобранный список.
+    Непроверенный/битый ABI — пустой список.
+    """
+    if isinstance(abi, str):
+        try:
+            abi = json.loads(abi)
+        except ValueError:
+            return []
+    return [e for e in abi if isinstance(e, dict)] if isinstance(abi, list) else []
+
+
+# Функции ERC-20, по селекторам которых определяется стандарт
+ERC20_SIGNATURES = (
+    "totalSupply()", "balanceOf(address)", "transfer(address,uint256)",
+    "transferFrom(address,address,uint256)", "approve(address,uint256)",
+    "allowance(address,address)",
+)
+
+# Флаги модели: имя функции (в нижнем регистре) целиком должно подходить под шаблон,
+# поэтому ownerOf не считается owner, а событие Paused — функцией pause
+FUNCTION_FLAGS = {
+    "has_mint":      re.compile(r"^_?mint(to|for)?$"),
+    "has_blacklist": re.compile(r"\w*(black|block)list\w*$|^(set|add|remove|delete)_?bots?\w*$|^isbot$"),
+    "has_setfee":    re.compile(r"^set\w*(fee|tax)\w*$"),
+    "has_withdraw":  re.compile(r"^withdraw\w*$"),
+    "has_unlock":    re.compile(r"^unlock\w*$"),
+    "has_pause":     re.compile(r"^(un)?pause$|^set_?paused?$|^togglepause\w*$"),
+    "has_changefee": re.compile(r"^(change|update)\w*(fee|tax)\w*$"),
+    "has_owner":     re.compile(r"^(owner|getowner|transferownership)$"),
+}
+
+EXTRA_FLAGS = {
+    "has_renounce_ownership": re.compile(r"^renounceownership$"),
+    "has_trading_toggle":     re.compile(r"^(enable|open|start|set)_?trading\w*$"),
+    "has_max_tx_limit":       re.compile(r"^(set|update|remove)\w*max\w*(tx|wallet|transaction)\w*$"),
+}
+
+# Флаги, для которых считаются только изменяющие состояние функции:
+# view-функции minter(), mintable() и т.п. выпустить токены не могут
+MUTATING_FLAGS = {"has_mint"}
+
+# Функции и события прокси (EIP-1967, UUPS, Transparent, Beacon)
+PROXY_FUNCTIONS = {"upgradeto", "upgradetoandcall", "implementation", "changeadmin", "admin"}
+PROXY_EVENTS = {"upgraded", "adminchanged", "beaconupgraded"}
+
+# Минимальный прокси EIP-1167: префикс и суффикс вокруг 20-байтового адреса реализации
+_EIP1167_PREFIX = "363d3d373d3d3d363d73"
+_EIP1167_SUFFIX = "5af43d82803e903d91602b57fd5bf3"
+
+
+def analyze_abi(abi: Any) -> Dict[str, Any]:
+    """
+    Фичи по функциям и событиям ABI: флаги модели, селекторы,
+    признаки ERC-20 и прокси.
+    """
+    entries = parse_abi(abi)
+    functions = [e for e in entries if e.get("type") == "function"]
+    events = [e for e in entries if e.get("type") == "event"]
+    names = [e.get("name", "").lower() for e in functions]
+    mutating = [
+        e.get("name", "").lower() for e in functions
+        if e.get("stateMutability") not in ("view", "pure") and not e.get("constant")
+    ]
+    selectors = sorted({selector(signature(e)) for e in functions})
+
+    result: Dict[str, Any] = {}
+    for flag, pattern in {**FUNCTION_FLAGS, **EXTRA_FLAGS}.items():
+        candidates = mutating if flag in MUTATING_FLAGS else names
+        result[flag] = any(pattern.match(name) for name in candidates)
+
+    present = set(selectors)
+    result["is_erc20"] = bool(functions) and all(selector(s) in present for s in ERC20_SIGNATURES)
+    result["is_proxy"] = (
+        any(name in PROXY_FUNCTIONS for name in names)
+        or any(e.get("name", "").lower() in PROXY_EVENTS for e in events)
+    )
+    result["has_payable_entry"] = any(
+        e.get("type") in ("fallback", "receive") and e.get("stateMutability") == "payable"
+        for e in entries
+    )
+    result["n_functions"] = len(functions)
+    result["n_events"] = len(events)
+    result["selectors"] = selectors
+    return result
+
+
+# --- Исходный код ---
+
+_COMMENTS = re.compile(r"//[^\n]*|/\*.*?\*/", re.S)
+_MODIFIER_DECL = re.compile(r"\bmodifier\s+(\w+)")
+_FUNCTION_HEAD = re.compile(r"\bfunction\s+(\w+)\s*\([^)]*\)([^{;]*)[{;]")
+_IDENT = re.compile(r"\b([A-Za-z_]\w*)\b")
+_NOT_MODIFIERS = {
+    "public", "external", "internal", "private", "view", "pure", "payable",
+    "virtual", "override", "returns", "memory", "calldata", "storage",
+}
+
+
+def source_text(source: str) -> str:
+    """
+    SourceCode Etherscan бывает плоским текстом, JSON {file: {content}}
+    или standard-json-input, обёрнутым в двойные фигурные скобки.
+    """
+    src = (source or "").strip()
+    if src.startswith("{{") and src.endswith("}}"):
+        src = src[1:-1]
+    if src.startswith("{"):
+        try:
+            data = json.loads(src)
+        except ValueError:
+            return src
+        files = data.get("sources", data)
+        return "\n".join(
+            f.get("content", "") for f in files.values() if isinstance(f, dict)
+        )
+    return src
+
+
+# Типичные для скам-токенов конструкции в исходнике (без комментариев, без учёта
+# регистра). Все шаблоны собраны в одно выражение и ищутся за один проход;
+# внутри шаблонов — только незахватывающие группы
+SOURCE_PATTERNS = {
+    "tx_origin":         r"\btx\.origin\b",
+    "selfdestruct":      r"\b(?:selfdestruct|suicide)\s*\(",
+    "delegatecall":      r"\.delegatecall\s*\(",
+    "inline_assembly":   r"\bassembly\s*(?:\"[^\"]*\"\s*)?\{",
+    # require(!isBlacklisted[from]), require(!_isBot(to)), ...
+    "blacklist_check":   r"\brequire\s*\(\s*!\s*_?(?:is)?\w*(?:black|block|bot|sniper)\w*\s*[\[(]",
+    # require(tradingOpen), require(_tradingEnabled || ...)
+    "trading_gate":      r"\brequire\s*\(\s*_?\w*trading\w*\s*[,|&)]",
+    # require(from == owner()) внутри перевода: продать может только владелец
+    "sender_owner_only": r"\brequire\s*\(\s*_?(?:from|sender)\s*==\s*(?:owner\s*\(\s*\)|_?owner)\b",
+    # _taxFee = newFee; — комиссия, которую можно выставить произвольной
+    "fee_assignment":    r"\b_?\w*(?:fee|tax)\w*\s*=(?!=)\s*(?!\d)[a-z_]\w*\s*;",
+    # _balances[account] = amount; — баланс задаётся напрямую, а не пересчитывается
+    "balance_override":  r"\b_?balances\s*\[[^\]]+\]\s*=(?!=)\s*(?=\S)(?!_?balances\b)[^;]+;",
+    "cooldown":          r"\b\w*cooldown\w*\s*\[",
+    "snipe_blocks":      r"\b(?:dead|snipe|launch)\w*blocks?\b|\blaunchedat\b",
+}
+_SOURCE_SCAN = re.compile(
+    "|".join(f"(?P<{name}>{pattern})" for name, pattern in SOURCE_PATTERNS.items()), re.I
+)
+
+
+def scan_source(text: str) -> Dict[str, int]:
+    """
+    Число вхождений каждого шаблона SOURCE_PATTERNS.
+    """
+    counts = dict.fromkeys(SOURCE_PATTERNS, 0)
+    for match in _SOURCE_SCAN.finditer(text):
+        counts[match.lastgroup] += 1
+    return counts
+
+
+def source_hash(source: Optional[str]) -> str:
+    return hashlib.blake2b((source or "").encode("utf-8"), digest_size=16).hexdigest()
+
+
+def verified_source(entry: Optional[Mapping[str, Any]]) -> str:
+    """
+    Исходник из записи getsourcecode; пустая строка для непроверенного контракта.
+    """
+    entry = entry or {}
+    if not parse_abi(entry.get("ABI", "")):
+        return ""
+    return entry.get("SourceCode") or ""
+
+
+def analyze_source(source: str) -> Dict[str, Any]:
+    """
+    Модификаторы, объявленные в исходнике, и число функций под ними
+    (onlyOwner, onlyRole и собственные модификаторы доступа), а также
+    вхождения скам-шаблонов (SOURCE_PATTERNS). Чистая функция от текста —
+    её можно выполнять в отдельном процессе (см. SourceScanner).
+    """
+    text = _COMMENTS.sub("", source_text(source))
+    declared = set(_MODIFIER_DECL.findall(text))
+    privileged = 0
+    for _, tail in _FUNCTION_HEAD.findall(text):
+        used = {m for m in _IDENT.findall(tail.split("returns")[0]) if m not in _NOT_MODIFIERS}
+        if any(m in declared or m.startswith("only") for m in used):
+            privileged += 1
+    counts = scan_source(text)
+    found = [name for name, n in counts.items() if n]
+    return {
+        "modifiers": sorted(declared),
+        "n_privileged_functions": privileged,
+        "source_patterns": counts,
+        "n_scam_patterns": len(found),
+        "scam_patterns": ", ".join(found) or "none",
+    }
+
+
+# --- Байткод ---
+
+def code_hash(code: Optional[str]) -> Optional[str]:
+    """
+    Хэш байткода для кэша анализа; None для адреса без кода (EOA) или ошибки.
+    """
+    if not code or not isinstance(code, str) or not code.startswith("0x") or len(code) <= 2:
+        return None
+    return hashlib.blake2b(code[2:].lower().encode("ascii"), digest_size=16).hexdigest()
+
+
+def is_minimal_proxy(code: Optional[str]) -> bool:
+    body = (code or "").lower()[2:]
+    return body.startswith(_EIP1167_PREFIX) and body[len(_EIP1167_PREFIX) + 40:].startswith(_EIP1167_SUFFIX)
+
+
+def analyze_contract(
+    source_entry: Optional[Mapping[str, Any]],
+    code: Optional[str] = None,
+    source_features: Optional[Mapping[str, Any]] = None
+) -> Dict[str, Any]:
+    """
+    Полный набор фич контракта по записи getsourcecode (ABI, исходник,
+    настройки компиляции, прокси) и, если есть, байткоду.
+    `source_features` — уже готовый analyze_source(verified_source(entry)).
+    """
+    entry = source_entry or {}
+    abi = entry.get("ABI", "")
+    verified = bool(parse_abi(abi))
+
+    result: Dict[str, Any] = {"is_verified": verified}
+    result.update(analyze_abi(abi if verified else []))
+    if source_features is None:
+        source_features = analyze_source(entry.get("SourceCode", "") if verified else "")
+    result.update(source_features)
+    result["optimization_used"] = entry.get("OptimizationUsed", "")
+    result["is_proxy"] = (
+        result["is_proxy"] or str(entry.get("Proxy", "0")) == "1" or is_minimal_proxy(code)
+    )
+    result["implementation"] = entry.get("Implementation", "") or ""
+    return result
+
+
+def scalar_features(features: Mapping[str, Any]) -> Iterable:
+    """
+    Фичи без списков (селекторы, модификаторы) — для текстового промпта.
+    """
+    return ((k, v) for k, v in features.items() if not isinstance(v, (list, tuple, dict)))
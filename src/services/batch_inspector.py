@@ -0,0 +1,324 @@
+# src/services/batch_inspector.py
+
+import os
+import csv
+import glob
+import json
+import asyncio
+import argparse
+import logging
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from src.services.token_data_fetcher import TokenDataFetcher
+from src.services.boosting_classifier import BoostingFraudClassifier
+from src.config.settings import FRAUD_MODEL_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE  = 500
+DEFAULT_CONCURRENCY = 16
+
+
+def read_inputs(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Читает CSV или JSONL со столбцами `address` и/или `symbol` (`ticker`),
+    опционально `chain`. Формат определяется по расширению файла.
+    """
+    with open(path, encoding="utf-8", newline="") as f:
+        if path.endswith((".jsonl", ".ndjson")):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+        for row in rows:
+            row = {k.strip().lower(): v.strip() if isinstance(v, str) else v for k, v in row.items()}
+            if not row.get("symbol") and row.get("ticker"):
+                row["symbol"] = row["ticker"]
+            yield row
+
+
+def _chunks(rows: Iterator[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class _Checkpoint:
+    """
+    Число уже обработанных строк входного файла и позиция вывода после них
+    (размер JSONL в байтах; None — не записана); пишется атомарно после каждого чанка.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Tuple[int, Optional[int]]:
+        if not os.path.exists(self.path):
+            return 0, None
+        with open(self.path, encoding="utf-8") as f:
+            data = json.load(f)
+        return int(data.get("done", 0)), data.get("offset")
+
+    def save(self, done: int, offset: Optional[int]) -> None:
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"done": done, "offset": offset}, f)
+        os.replace(tmp, self.path)
+
+
+class _JsonlWriter:
+    """
+    JSONL-вывод. Чанк дописывается и сбрасывается на диск до сохранения
+    чекпоинта; при продолжении файл обрезается до позиции из чекпоинта,
+    поэтому чанк, записанный целиком или частично перед падением, не дублируется.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def position(self) -> Optional[int]:
+        return os.path.getsize(self.path) if os.path.exists(self.path) else 0
+
+    def truncate(self, offset: int) -> None:
+        if os.path.exists(self.path) and os.path.getsize(self.path) > offset:
+            logger.info("Truncating %s to %d bytes (unfinished chunk)", self.path, offset)
+            os.truncate(self.path, offset)
+
+    def clear(self) -> None:
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def write(self, records: List[Dict[str, Any]], offset: int) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class _ParquetWriter:
+    """
+    Parquet-вывод — каталог part-файлов, по одному на чанк; имя файла содержит
+    номер первой строки чанка, поэтому повторная запись после падения идемпотентна.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def position(self) -> Optional[int]:
+        return None
+
+    def truncate(self, offset: int) -> None:
+        pass
+
+    def clear(self) -> None:
+        for part in glob.glob(os.path.join(self.path, "part-*.parquet")):
+            os.remove(part)
+
+    def write(self, records: List[Dict[str, Any]], offset: int) -> None:
+        part = os.path.join(self.path, f"part-{offset:09d}.parquet")
+        pd.DataFrame.from_records(records).to_parquet(part, index=False)
+
+
+async def _resolve(
+    fetcher: TokenDataFetcher,
+    row: Dict[str, Any],
+    sem: asyncio.Semaphore,
+    all_chains: bool = False
+) -> Dict[str, Any]:
+    """
+    Адрес строки; с `all_chains` у тикера без адреса и сети —
+    все его платформы (поле "platforms").
+    """
+    rec = {
+        "symbol": row.get("symbol"),
+        "chain": row.get("chain") or None,
+        "address": row.get("address") or None,
+        "features": {},
+        "error": None,
+    }
+    async with sem:
+        try:
+            if not rec["address"]:
+                if not rec["symbol"]:
+                    raise ValueError("Row has neither address nor symbol")
+                platforms = await fetcher.get_token_platforms(rec["symbol"])
+                if all_chains and not rec["chain"] and platforms:
+                    rec["platforms"] = platforms
+                else:
+                    rec["chain"], rec["address"] = fetcher.chains.pick_platform(platforms, rec["chain"])
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+    return rec
+
+
+async def _fetch(fetcher: TokenDataFetcher, rec: Dict[str, Any], sem: asyncio.Semaphore) -> List[Dict[str, Any]]:
+    """
+    Фичи токена; запись с "platforms" разворачивается в записи по сетям.
+    """
+    if rec["error"] is not None:
+        return [rec]
+    platforms = rec.pop("platforms", None)
+    async with sem:
+        try:
+            if platforms is None:
+                rec["features"] = await fetcher.get_token_features(rec["address"], rec["chain"] or "ethereum")
+                return [rec]
+            by_chain = await fetcher.get_token_features_all(platforms)
+            if not by_chain:
+                raise ValueError(f"No features on any of {len(platforms)} chains")
+        except Exception as e:
+            rec["error"] = f"{type(e).__name__}: {e}"
+            return [rec]
+    return [
+        {**rec, "chain": chain, "address": platforms[chain], "features": features}
+        for chain, features in by_chain.items()
+    ]
+
+
+async def _resolve_and_fetch_chunk(
+    fetcher: TokenDataFetcher,
+    chunk: List[Dict[str, Any]],
+    sem: asyncio.Semaphore,
+    all_chains: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Адреса чанка → рыночные данные всего чанка пакетными запросами
+    CoinGecko → остальные фичи по токенам (рыночная часть уже в кэше).
+    """
+    resolved = await asyncio.gather(*(_resolve(fetcher, row, sem, all_chains) for row in chunk))
+    tokens = []
+    for rec in resolved:
+        if rec["error"] is not None:
+            continue
+        if "platforms" in rec:
+            tokens += [(address, chain) for chain, address in rec["platforms"].items()]
+        else:
+            tokens.append((rec["address"], rec["chain"] or "ethereum"))
+    if tokens:
+        await fetcher.prefetch_market(tokens)
+    fetched = await asyncio.gather(*(_fetch(fetcher, rec, sem) for rec in resolved))
+    return [rec for recs in fetched for rec in recs]
+
+
+def _score_chunk(classifier: BoostingFraudClassifier, fetched: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Один векторизованный вызов predict_proba на весь чанк.
+    """
+    ok = [i for i, rec in enumerate(fetched) if rec["features"]]
+    probs = [None] * len(fetched)
+    if ok:
+        df = pd.DataFrame([fetched[i]["features"] for i in ok])
+        scam = classifier.predict_proba(df)["prob_class_1"].tolist()
+        for i, p in zip(ok, scam):
+            probs[i] = float(p)
+
+    records = []
+    for rec, prob in zip(fetched, probs):
+        out = {k: v for k, v in rec.items() if k != "features"}
+        out.update(rec["features"])
+        out["scam_probability"] = prob
+        out["prediction"] = None if prob is None else prob >= 0.5
+        records.append(out)
+    return records
+
+
+async def run_batch(
+    input_path: str,
+    output_path: str,
+    fmt: str = "jsonl",
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    concurrency: int = DEFAULT_CONCURRENCY,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = True,
+    fetcher: Optional[TokenDataFetcher] = None,
+    classifier: Optional[BoostingFraudClassifier] = None,
+    all_chains: bool = False,
+) -> int:
+    """
+    Пакетная проверка адресов/тикеров: фичи собираются с ограниченной
+    параллельностью, скоринг — одним вызовом модели на чанк, результаты
+    дописываются в JSONL или Parquet. После каждого чанка сохраняется
+    чекпоинт, так что прерванный прогон продолжается с места остановки.
+    С `all_chains` тикер без адреса и сети проверяется во всех своих сетях
+    сразу — по строке результата на сеть.
+
+    Возвращает число обработанных за этот запуск строк.
+    """
+    if fmt not in ("jsonl", "parquet"):
+        raise ValueError(f"Unsupported output format: {fmt}")
+
+    checkpoint = _Checkpoint(checkpoint_path or f"{output_path}.checkpoint.json")
+    done, position = checkpoint.load() if resume else (0, None)
+    writer = _JsonlWriter(output_path) if fmt == "jsonl" else _ParquetWriter(output_path)
+    if not resume:
+        writer.clear()
+    if position is None:
+        # Новый прогон (или чекпоинт старого формата): запоминаем, с какой позиции пишем
+        position = writer.position()
+        checkpoint.save(done, position)
+    else:
+        writer.truncate(position)
+
+    own_fetcher = fetcher is None
+    fetcher = fetcher or TokenDataFetcher()
+    classifier = classifier or BoostingFraudClassifier(FRAUD_MODEL_PATH)
+    sem = asyncio.Semaphore(concurrency)
+
+    rows = read_inputs(input_path)
+    for _ in range(done):
+        next(rows, None)
+    if done:
+        logger.info("Resuming %s from row %d", input_path, done)
+
+    processed = 0
+    try:
+        for chunk in _chunks(rows, chunk_size):
+            fetched = await _resolve_and_fetch_chunk(fetcher, chunk, sem, all_chains)
+            writer.write(_score_chunk(classifier, fetched), done)
+            done += len(chunk)
+            processed += len(chunk)
+            checkpoint.save(done, writer.position())
+            logger.info("Processed %d rows", done)
+    finally:
+        if own_fetcher:
+            await fetcher.close()
+    return processed
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Batch scam scoring for token addresses/tickers")
+    parser.add_argument("input", help="CSV или JSONL со столбцами address/symbol[/chain]")
+    parser.add_argument("output", help="JSONL-файл или каталог для Parquet")
+    parser.add_argument("--format", choices=["jsonl", "parquet"], default="jsonl")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--checkpoint", default=None)
+    parser.add_argument("--no-resume", action="store_true", help="начать заново, игнорируя чекпоинт")
+    parser.add_argument("--all-chains", action="store_true", help="тикеры без адреса и сети — во всех их сетях")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    asyncio.run(run_batch(
+        args.input, args.output,
+        fmt=args.format,
+        chunk_size=args.chunk_size,
+        concurrency=args.concurrency,
+        checkpoint_path=args.checkpoint,
+        resume=not args.no_resume,
+        all_chains=args.all_chains,
+    ))
+
+
+if __name__ == '__main__':
+    main()
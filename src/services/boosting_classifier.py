@@ -1,45 +1,260 @@
 # services/boosting_classifier.py
 
+import json
 import pickle
-import pandas as pd
-from sklearn.metrics import accuracy_score, classification_report
+import threading
+from typing import TYPE_CHECKING, Any, Dict, List, Mapping, Optional, Tuple, Union
+
+import numpy as np
+
+from src.services.metrics import instrument
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+_ABSENT = object()
+
+
+class _CompiledForest:
+    """
+    Ансамбль деревьев XGBoost (binary:logistic), разложенный при загрузке
+    в плотные массивы [n_trees, max_nodes]. Спуск по всем деревьям выполняется
+    одновременно — по одному векторному шагу на уровень глубины.
+    """
+
+    def __init__(self, booster: Any):
+        model = json.loads(booster.save_raw("json"))
+        learner = model["learner"]
+        objective = learner["objective"]["name"]
+        if objective != "binary:logistic":
+            raise ValueError(f"Unsupported objective: {objective}")
+        trees = learner["gradient_booster"]["model"]["trees"]
+
+        n_trees = len(trees)
+        max_nodes = max(len(t["left_children"]) for t in trees)
+        shape = (n_trees, max_nodes)
+        self.feature = np.zeros(shape, dtype=np.int64)
+        self.threshold = np.zeros(shape, dtype=np.float32)
+        self.left = np.zeros(shape, dtype=np.int64)
+        self.right = np.zeros(shape, dtype=np.int64)
+        self.default_left = np.zeros(shape, dtype=bool)
+        self.is_leaf = np.ones(shape, dtype=bool)
+        self.value = np.zeros(shape, dtype=np.float32)
+
+        depth = 0
+        for i, t in enumerate(trees):
+            n = len(t["left_children"])
+            left = np.asarray(t["left_children"], dtype=np.int64)
+            leaf = left == -1
+            cond = np.asarray(t["split_conditions"], dtype=np.float32)
+            self.feature[i, :n] = t["split_indices"]
+            self.threshold[i, :n] = cond
+            self.left[i, :n] = np.where(leaf, 0, left)
+            self.right[i, :n] = np.where(leaf, 0, t["right_children"])
+            self.default_left[i, :n] = np.asarray(t["default_left"], dtype=bool)
+            self.is_leaf[i, :n] = leaf
+            # Для листьев split_conditions хранит значение листа
+            self.value[i, :n] = np.where(leaf, cond, 0.0)
+            depth = max(depth, self._depth(t["left_children"], t["right_children"]))
+        self.depth = depth
+        self._tree_idx = np.arange(n_trees)
+
+        base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+        self.base_margin = float(np.log(base_score / (1.0 - base_score)))
+
+    @staticmethod
+    def _depth(left: List[int], right: List[int]) -> int:
+        depth, level = 0, [0]
+        while True:
+            level = [c for node in level for c in (left[node], right[node]) if c != -1]
+            if not level:
+                return depth
+            depth += 1
+
+    def margin(self, X: np.ndarray) -> np.ndarray:
+        """
+        X: [n_rows, n_features] float32, NaN — пропуск. Возвращает сырой margin.
+        """
+        n_rows = X.shape[0]
+        node = np.zeros((n_rows, len(self._tree_idx)), dtype=np.int64)
+        t = self._tree_idx
+        rows = np.arange(n_rows)[:, None]
+        for _ in range(self.depth):
+            x = X[rows, self.feature[t, node]]
+            go_left = np.where(np.isnan(x), self.default_left[t, node], x < self.threshold[t, node])
+            nxt = np.where(go_left, self.left[t, node], self.right[t, node])
+            node = np.where(self.is_leaf[t, node], node, nxt)
+        return self.value[t, node].sum(axis=1, dtype=np.float64) + self.base_margin
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        p1 = 1.0 / (1.0 + np.exp(-self.margin(X)))
+        return np.column_stack([1.0 - p1, p1])
 
 
 class BoostingFraudClassifier:
     """
     Обёртка над предобученной градиентной бустинг-моделью (XGBoost, LightGBM и т.п.).
+
+    Модели XGBoost при загрузке компилируются в массивы (_CompiledForest),
+    и инференс идёт без pandas и без вызова библиотеки модели.
+    Для прочих моделей используется их собственный predict_proba.
+
+    С `lazy=True` модель (и вместе с ней xgboost, pandas) загружается
+    при первом предсказании или явном вызове load() — например, из фонового
+    прогрева, — а не при создании объекта.
     """
 
     FEATURE_COLS = [
-        "cex_listings", "large_dumps_detected", "is_verified",
-        "has_mint", "has_blacklist", "has_setfee", "has_withdraw",
-        "has_unlock", "has_pause", "has_changefee", "has_owner"
+        "is_verified", "has_mint", "has_blacklist", "has_setfee", "has_withdraw",
+        "has_unlock", "has_pause", "has_changefee", "has_owner", "OptimizationUsed",
+        "cex_listings", "trading_volume_24h", "price_change_24h", "price_change_7d",
+        "large_dumps_detected"
     ]
 
-    def __init__(self, model_path: str):
-        with open(model_path, "rb") as f:
-            self.model = pickle.load(f)
+    # Имена фич в данных фетчера, отличающиеся от имён при обучении
+    FEATURE_ALIASES = {"optimization_used": "OptimizationUsed"}
 
-    def _prepare(self, X: pd.DataFrame) -> pd.DataFrame:
-        df = X.copy()
-        # boolean → int, гарантируем все нужные столбцы
-        for col in self.FEATURE_COLS:
-            df[col] = df.get(col, False).astype(int)
-        return df[self.FEATURE_COLS]
+    # Значения фич, которых нет (источник не ответил): флаг не выставлен,
+    # нулевые объём и изменение цены. Не NaN: у сплитов обученной модели
+    # default_left=0, и пропуск ушёл бы в ту же ветку, что True или большое значение
+    FEATURE_DEFAULTS: Dict[str, float] = {col: 0.0 for col in FEATURE_COLS}
 
-    def predict(self, X: pd.DataFrame) -> pd.Series:
-        Xp = self._prepare(X)
-        return self.model.predict(Xp)
+    def __init__(self, model_path: str, lazy: bool = False):
+        self.model_path = model_path
+        self.model: Any = None
+        self.feature_cols: List[str] = list(self.FEATURE_COLS)
+        self._source_names = {v: k for k, v in self.FEATURE_ALIASES.items()}
+        self._forest: Optional[_CompiledForest] = None
+        self._load_lock = threading.Lock()
+        if not lazy:
+            self.load()
 
-    def predict_proba(self, X: pd.DataFrame) -> pd.DataFrame:
-        Xp = self._prepare(X)
-        probs = self.model.predict_proba(Xp)
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+    def load(self) -> "BoostingFraudClassifier":
+        """
+        Загрузка и компиляция модели; повторные вызовы ничего не делают.
+        Потокобезопасна: из исполнителя и из event loop модель грузится один раз.
+        """
+        if self.model is not None:
+            return self
+        with self._load_lock:
+            if self.model is not None:
+                return self
+            with open(self.model_path, "rb") as f:
+                model = pickle.load(f)
+            self.feature_cols = self._model_features(model) or list(self.FEATURE_COLS)
+            self._forest = self._compile(model)
+            # Последним: по model проверяют, что загрузка завершена
+            self.model = model
+        return self
+
+    @staticmethod
+    def _model_features(model: Any) -> Optional[List[str]]:
+        names = getattr(model, "feature_names_in_", None)
+        if names is None and hasattr(model, "get_booster"):
+            names = model.get_booster().feature_names
+        return list(names) if names is not None else None
+
+    def _compile(self, model: Any) -> Optional[_CompiledForest]:
+        """
+        Компилирует бустер и сверяет результат с самой моделью на случайной выборке;
+        при любом расхождении остаётся на исходной модели.
+        """
+        if not hasattr(model, "get_booster"):
+            return None
+        try:
+            import pandas as pd
+
+            forest = _CompiledForest(model.get_booster())
+            # Смесь бинарных значений и величин разного порядка со знаком
+            rng = np.random.default_rng(0)
+            shape = (512, len(self.feature_cols))
+            sample = np.where(
+                rng.random(shape) < 0.5,
+                rng.integers(0, 2, shape),
+                rng.lognormal(0, 6, shape) * rng.choice([-1, 1], shape)
+            ).astype(np.float32)
+            expected = model.predict_proba(pd.DataFrame(sample, columns=self.feature_cols))
+            if not np.allclose(forest.predict_proba(sample), expected, atol=1e-5):
+                return None
+            return forest
+        except Exception:
+            return None
+
+    def _value(self, features: Mapping[str, Any], col: str) -> Any:
+        return features.get(col, features.get(self._source_names.get(col, col), _ABSENT))
+
+    def _row(self, features: Mapping[str, Any]) -> np.ndarray:
+        row = np.empty(len(self.feature_cols), dtype=np.float32)
+        for i, col in enumerate(self.feature_cols):
+            value = self._value(features, col)
+            if value is _ABSENT:
+                row[i] = self.FEATURE_DEFAULTS.get(col, 0.0)
+                continue
+            try:
+                row[i] = float(value) if value not in ("", None) else 0.0
+            except (TypeError, ValueError):
+                row[i] = 0.0
+        return row
+
+    def _prepare(self, X: "pd.DataFrame") -> "pd.DataFrame":
+        import pandas as pd
+
+        self.load()
+        # boolean/строки → числа, гарантируем все нужные столбцы
+        df = X.rename(columns=self.FEATURE_ALIASES).reindex(columns=self.feature_cols)
+        # Пропуски — значениями FEATURE_DEFAULTS, как в predict_one; нечисловые значения — 0
+        df = df.fillna({col: self.FEATURE_DEFAULTS.get(col, 0.0) for col in self.feature_cols})
+        return df.apply(pd.to_numeric, errors="coerce").fillna(0).astype(np.float32)
+
+    def _proba(self, Xp: "pd.DataFrame") -> np.ndarray:
+        if self._forest is not None:
+            return self._forest.predict_proba(Xp.to_numpy(dtype=np.float32))
+        return self.model.predict_proba(Xp)
+
+    def predict(self, X: "pd.DataFrame") -> "pd.Series":
+        import pandas as pd
+
+        probs = self._proba(self._prepare(X))
+        return pd.Series(np.argmax(probs, axis=1), index=X.index)
+
+    def predict_proba(self, X: "pd.DataFrame") -> "pd.DataFrame":
+        import pandas as pd
+
+        probs = self._proba(self._prepare(X))
         return pd.DataFrame(
             probs,
-            columns=[f"prob_class_{i}" for i in range(self.model.n_classes_)]
+            columns=[f"prob_class_{i}" for i in range(probs.shape[1])]
         )
 
-    def evaluate(self, X: pd.DataFrame, y: pd.Series) -> dict:
+    @instrument("classifier_predict")
+    def predict_one(self, features: Union[Mapping[str, Any], np.ndarray]) -> Tuple[int, np.ndarray]:
+        """
+        Быстрый путь для одной записи без pandas: принимает dict фич или
+        массив в порядке feature_cols, возвращает (метка, вероятности классов).
+        Отсутствующие в dict фичи получают значения из FEATURE_DEFAULTS.
+        """
+        self.load()
+        if isinstance(features, np.ndarray):
+            row = features.astype(np.float32, copy=False)
+        else:
+            row = self._row(features)
+        if self._forest is not None:
+            probs = self._forest.predict_proba(row[None, :])[0]
+        else:
+            import pandas as pd
+
+            frame = pd.DataFrame([row], columns=self.feature_cols)
+            probs = np.asarray(self.model.predict_proba(frame))[0]
+        return int(np.argmax(probs)), probs
+
+    def evaluate(self, X: "pd.DataFrame", y: "pd.Series") -> Dict[str, Any]:
+        # sklearn нужен только здесь, а его импорт — самый долгий в проекте
+        from sklearn.metrics import accuracy_score, classification_report
+
         preds = self.predict(X)
         return {
             "accuracy": accuracy_score(y, preds),
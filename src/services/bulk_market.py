@@ -0,0 +1,169 @@
+# src/services/bulk_market.py
+
+import asyncio
+import logging
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from src.config.settings import CACHE_TTL_MARKET, BULK_MARKET_IDS, BULK_MARKET_ADDRESSES
+from src.services.providers import token_key, market_features
+from src.services.transport import HTTP_ERRORS
+from src.services.metrics import instrument, record_error
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+def _chunks(items: List[Any], size: int) -> Iterable[List[Any]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+class BulkMarketData:
+    """
+    Рыночные данные сразу для многих токенов через мульти-эндпоинты CoinGecko
+    вместо запроса по контракту на каждый токен:
+
+    * /coins/markets?ids=... — до BULK_MARKET_IDS монет за запрос, для токенов
+      с известным id (аргумент `ids`, кэш "coin" или обратный поиск по
+      индексу тикеров): объём и изменение цены за 24 ч и 7 дней;
+    * /simple/token_price/{platform}?contract_addresses=... — до
+      BULK_MARKET_ADDRESSES адресов за запрос для остальных: адреса, которых
+      в ответе нет, на CoinGecko не торгуются и сразу получают нули. Для
+      найденных этот эндпоинт не отдаёт ни id монеты (нужен листингам), ни
+      изменения за 7 дней, поэтому они собираются обычным путём — запрос по
+      контракту даёт и то и другое.
+
+    Результат кладётся в те же кэши "coin" и "market", что читают поставщики,
+    поэтому последующий get_token_features берёт рыночную часть из кэша.
+    Токены, по которым пакетный запрос не удался, ничего не получают и
+    собираются обычным путём.
+    """
+
+    def __init__(self, fetcher: Any):
+        self.fetcher = fetcher
+
+    @instrument("bulk_market")
+    async def prefetch(
+        self,
+        tokens: Iterable[Tuple[str, str]],
+        ids: Optional[Mapping[str, str]] = None,
+        refresh: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        `tokens` — пары (адрес, сеть), `ids` — известные id монет по token_key.
+        Без `refresh` токены с живой записью в кэше "market" не запрашиваются.
+        Возвращает {token_key: рыночные фичи} для всех токенов, чьи данные есть.
+        """
+        cache = self.fetcher.cache
+        ids = ids or {}
+        result: Dict[str, Dict[str, Any]] = {}
+        pending: Dict[str, Tuple[str, str]] = {}
+        for address, chain in tokens:
+            key = token_key(address, chain)
+            if key in pending or key in result:
+                continue
+            cached = None if refresh else cache.get("market", key)
+            if cached is not None:
+                result[key] = cached
+            else:
+                pending[key] = (address, chain)
+
+        by_id: Dict[str, List[str]] = {}
+        by_chain: Dict[str, List[str]] = {}
+        for key, (address, chain) in pending.items():
+            coin_id = ids.get(key) or self._known_id(key, address, chain)
+            if coin_id:
+                by_id.setdefault(coin_id, []).append(key)
+            else:
+                by_chain.setdefault(chain, []).append(key)
+
+        if by_id:
+            found = await self._markets(by_id)
+            result.update(found)
+            # id есть, но CoinGecko его не вернул — пробуем по адресу
+            for keys in by_id.values():
+                for key in keys:
+                    if key not in found:
+                        by_chain.setdefault(pending[key][1], []).append(key)
+
+        if by_chain:
+            for chain, keys in by_chain.items():
+                addresses = {pending[key][0].lower(): key for key in keys}
+                result.update(await self._token_prices(chain, addresses))
+        return result
+
+    def _known_id(self, key: str, address: str, chain: str) -> Optional[str]:
+        coin = self.fetcher.cache.get("coin", key, _MISSING)
+        if isinstance(coin, dict) and coin.get("id"):
+            return coin["id"]
+        return self.fetcher.symbol_index.coin_id(chain, address)
+
+    async def _markets(self, by_id: Dict[str, List[str]]) -> Dict[str, Dict[str, Any]]:
+        async def page(chunk: List[str]) -> List[Dict[str, Any]]:
+            try:
+                return await self.fetcher._get_json(f"{self.fetcher.gecko_base}/coins/markets", params={
+                    "vs_currency": "usd",
+                    "ids": ",".join(chunk),
+                    "per_page": str(len(chunk)),
+                    "price_change_percentage": "24h,7d",
+                })
+            except HTTP_ERRORS as e:
+                record_error("bulk_markets", e)
+                logger.warning("Bulk /coins/markets for %d ids failed: %s", len(chunk), e)
+                return []
+
+        pages = await asyncio.gather(*(page(chunk) for chunk in _chunks(list(by_id), BULK_MARKET_IDS)))
+        cache = self.fetcher.cache
+        found: Dict[str, Dict[str, Any]] = {}
+        for row in (row for rows in pages for row in rows):
+            coin_id = row.get("id")
+            if coin_id not in by_id:
+                continue
+            # Та же сокращённая запись, что TokenRef.coin() получает по контракту
+            coin = {
+                "id": coin_id,
+                "total_volume_usd": row.get("total_volume"),
+                "price_change_percentage_24h": row.get("price_change_percentage_24h"),
+                "price_change_percentage_7d": row.get("price_change_percentage_7d_in_currency"),
+            }
+            features = market_features(coin)
+            for key in by_id[coin_id]:
+                cache.set("coin", key, coin, CACHE_TTL_MARKET)
+                cache.set("market", key, features, CACHE_TTL_MARKET)
+                found[key] = features
+        return found
+
+    async def _token_prices(self, chain: str, addresses: Dict[str, str]) -> Dict[str, Dict[str, Any]]:
+        async def page(chunk: List[str]) -> Optional[Dict[str, Any]]:
+            try:
+                return await self.fetcher._get_json(
+                    f"{self.fetcher.gecko_base}/simple/token_price/{chain}", params={
+                        "contract_addresses": ",".join(chunk),
+                        "vs_currencies": "usd",
+                    }
+                )
+            except HTTP_ERRORS as e:
+                record_error("bulk_token_price", e)
+                logger.warning("Bulk token_price on %s for %d addresses failed: %s", chain, len(chunk), e)
+                return None
+
+        chunks = list(_chunks(list(addresses), BULK_MARKET_ADDRESSES))
+        pages = await asyncio.gather(*(page(chunk) for chunk in chunks))
+        cache = self.fetcher.cache
+        found: Dict[str, Dict[str, Any]] = {}
+        for chunk, data in zip(chunks, pages):
+            if data is None:
+                continue
+            listed = {addr.lower() for addr in data}
+            for address in chunk:
+                if address in listed:
+                    continue
+                # Токена нет на CoinGecko — то же, что TokenRef.coin() и MarketProvider
+                # кэшируют по 404 на запрос по контракту
+                key = addresses[address]
+                features = market_features(None)
+                cache.set("coin", key, None, CACHE_TTL_MARKET)
+                cache.set("market", key, features, CACHE_TTL_MARKET)
+                found[key] = features
+        return found
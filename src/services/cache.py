@@ -0,0 +1,235 @@
+# src/services/cache.py
+
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from src.config.settings import CACHE_FILE, CACHE_MEMORY_SIZE
+from src.services.singleflight import SingleFlight
+from src.services.metrics import CACHE_REQUESTS
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    Потокобезопасный in-process LRU с TTL на каждую запись.
+    """
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._data: "OrderedDict[Tuple[str, str], Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, namespace: str, key: str, default: Any = _MISSING) -> Any:
+        k = (namespace, key)
+        with self._lock:
+            entry = self._data.get(k)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value = entry
+            if expires_at <= time.time():
+                del self._data[k]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(k)
+            self.hits += 1
+            return value
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float) -> None:
+        k = (namespace, key)
+        with self._lock:
+            self._data[k] = (expires_at, value)
+            self._data.move_to_end(k)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._data.pop((namespace, key), None)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class SQLiteStore:
+    """
+    Персистентное хранилище «namespace/key → JSON» в SQLite (WAL):
+    читатели не блокируют писателя, файл можно разделять между процессами.
+    """
+
+    PURGE_EVERY = 500
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " namespace TEXT NOT NULL,"
+            " key TEXT NOT NULL,"
+            " value TEXT NOT NULL,"
+            " expires_at REAL NOT NULL,"
+            " PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+        self._writes = 0
+        self.purge_expired()
+
+    def get(self, namespace: str, key: str) -> Optional[Tuple[float, Any]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?",
+                (namespace, key)
+            ).fetchone()
+        if row is None or row[1] <= time.time():
+            return None
+        return row[1], json.loads(row[0])
+
+    def set(self, namespace: str, key: str, value: Any, expires_at: float) -> None:
+        payload = json.dumps(value, ensure_ascii=False)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, payload, expires_at)
+            )
+            self._conn.commit()
+            self._writes += 1
+            purge = self._writes % self.PURGE_EVERY == 0
+        if purge:
+            self.purge_expired()
+
+    def delete(self, namespace: str, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+            self._conn.commit()
+
+    def prune(self, namespace: str, max_entries: int) -> int:
+        """
+        Оставляет в namespace не более max_entries записей с самым поздним сроком жизни.
+        """
+        with self._lock:
+            cur = self._conn.execute(
+                "DELETE FROM cache WHERE namespace = ? AND key IN ("
+                " SELECT key FROM cache WHERE namespace = ?"
+                " ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                (namespace, namespace, max_entries)
+            )
+            self._conn.commit()
+            return cur.rowcount
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+            self._conn.commit()
+            return cur.rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class TieredCache:
+    """
+    Двухуровневый кэш: LRU в памяти перед персистентным SQLite.
+    Значения должны сериализоваться в JSON.
+    """
+
+    def __init__(self, path: str = CACHE_FILE, memory_size: int = CACHE_MEMORY_SIZE):
+        self.memory = LRUCache(memory_size)
+        self.store = SQLiteStore(path)
+        self._lock = threading.Lock()
+        self._inflight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        value = self.memory.get(namespace, key)
+        if value is _MISSING:
+            entry = self.store.get(namespace, key)
+            if entry is None:
+                with self._lock:
+                    self.misses += 1
+                CACHE_REQUESTS.inc(namespace=namespace, result="miss")
+                return default
+            expires_at, value = entry
+            # Поднимаем запись в память
+            self.memory.set(namespace, key, value, expires_at)
+            CACHE_REQUESTS.inc(namespace=namespace, result="sqlite_hit")
+        else:
+            CACHE_REQUESTS.inc(namespace=namespace, result="memory_hit")
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(
+        self,
+        namespace: str,
+        key: str,
+        value: Any,
+        ttl: float,
+        max_entries: Optional[int] = None
+    ) -> None:
+        expires_at = time.time() + ttl
+        self.memory.set(namespace, key, value, expires_at)
+        self.store.set(namespace, key, value, expires_at)
+        if max_entries is not None:
+            self.store.prune(namespace, max_entries)
+
+    def delete(self, namespace: str, key: str) -> None:
+        self.memory.delete(namespace, key)
+        self.store.delete(namespace, key)
+
+    async def get_or_fetch(
+        self,
+        namespace: str,
+        key: str,
+        fetch: Callable[[], Awaitable[Any]],
+        ttl: float,
+        cache_if: Optional[Callable[[Any], bool]] = None
+    ) -> Any:
+        """
+        `cache_if` — предикат над результатом: если вернул False,
+        значение отдаётся ожидающим, но не сохраняется.
+        """
+        value = self.get(namespace, key, _MISSING)
+        if value is not _MISSING:
+            return value
+
+        async def load():
+            fetched = await fetch()
+            if cache_if is None or cache_if(fetched):
+                self.set(namespace, key, fetched, ttl)
+            return fetched
+
+        # Одновременные промахи по одному ключу делают один запрос наверх
+        return await self._inflight.do((namespace, key), load)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Счётчики кэша: общие hits/misses и отдельно по in-memory уровню.
+        """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "memory_hits": self.memory.hits,
+            "memory_misses": self.memory.misses,
+            "memory_evictions": self.memory.evictions,
+            "memory_expirations": self.memory.expirations,
+            "memory_size": len(self.memory),
+        }
+
+    def close(self) -> None:
+        self.store.close()
@@ -0,0 +1,93 @@
+# src/services/chain_registry.py
+
+import json
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple
+
+from src.config.settings import SUPPORTED_CHAINS_PATH, EXPLORERS
+
+
+@dataclass(frozen=True)
+class Chain:
+    """
+    Сеть в терминах CoinGecko: id совпадает с ключом в `platforms`
+    и с сегментом пути /coins/{platform}/contract/{address}.
+    """
+    id: str
+    native_symbol: Optional[str] = None
+    # Имя провайдера в RATE_LIMITS и пула соединений обозревателя
+    explorer: Optional[str] = None
+    explorer_api: Optional[str] = None
+    explorer_key: Optional[str] = None
+
+    @property
+    def has_explorer(self) -> bool:
+        return bool(self.explorer_api)
+
+
+class ChainRegistry:
+    """
+    Реестр сетей из data/supported_chains.json, дополненный обозревателями
+    блоков из настроек (EXPLORERS).
+    """
+
+    def __init__(self, chains: Iterable[Chain]):
+        self._chains: Dict[str, Chain] = {c.id: c for c in chains}
+
+    @classmethod
+    def load(
+        cls,
+        path: str = SUPPORTED_CHAINS_PATH,
+        explorers: Mapping[str, Tuple[str, str, Optional[str]]] = EXPLORERS
+    ) -> "ChainRegistry":
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+        chains = []
+        seen = set()
+        for entry in entries:
+            chain_id = entry.get("id")
+            if not chain_id:
+                continue
+            provider, api, key = explorers.get(chain_id, (None, None, None))
+            chains.append(Chain(chain_id, entry.get("native_symbol"), provider, api, key))
+            seen.add(chain_id)
+        # Обозреватель, настроенный для сети, которой нет в JSON
+        for chain_id, (provider, api, key) in explorers.items():
+            if chain_id not in seen:
+                chains.append(Chain(chain_id, None, provider, api, key))
+        return cls(chains)
+
+    def get(self, chain_id: Optional[str]) -> Optional[Chain]:
+        return self._chains.get(chain_id) if chain_id else None
+
+    def __contains__(self, chain_id: str) -> bool:
+        return chain_id in self._chains
+
+    def __iter__(self) -> Iterator[Chain]:
+        return iter(self._chains.values())
+
+    def native_tokens(self) -> Dict[str, str]:
+        """
+        {тикер нативного токена: id сети}; при совпадении тикеров побеждает последняя сеть.
+        """
+        return {c.native_symbol.lower(): c.id for c in self if c.native_symbol}
+
+    def pick_platform(
+        self,
+        platforms: Mapping[str, str],
+        preferred: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """
+        (сеть, адрес) для анализа: выбранная пользователем сеть, если токен в ней есть,
+        иначе первая сеть с обозревателем блоков, иначе первая по порядку.
+        """
+        if not platforms:
+            raise ValueError("No platforms to choose from")
+        if preferred in platforms:
+            return preferred, platforms[preferred]
+        for chain_id, address in platforms.items():
+            chain = self.get(chain_id)
+            if chain is not None and chain.has_explorer:
+                return chain_id, address
+        chain_id = next(iter(platforms))
+        return chain_id, platforms[chain_id]
@@ -1,51 +1,84 @@
 # src/services/combined_inspector.py
 
 import json
+import time
+import hashlib
 import asyncio
-import requests
-import xml.etree.ElementTree as ET
+import logging
+import contextvars
 from datetime import datetime
-from typing import Dict, Any, Optional, List
-
-import pandas as pd
+from typing import Dict, Any, Optional, List, Callable, Awaitable, Tuple
 
 from src.services.token_data_fetcher import TokenDataFetcher
+from src.services.chain_registry import ChainRegistry
+from src.services.stage_graph import StageGraph
+from src.services.singleflight import SingleFlight
+from src.services.news_aggregator import NewsAggregator
 from src.services.boosting_classifier import BoostingFraudClassifier
-from src.models.gemini_wrapper import GeminiWrapper
-from src.config.settings import FRAUD_MODEL_PATH, SUPPORTED_CHAINS_PATH
+from src.services.abi_analyzer import scalar_features
+from src.services.metrics import (
+    instrument, record_error, observe_stages, new_trace_id, current_trace_id, REPORT_SECONDS
+)
+from src.models.gemini_wrapper import GeminiWrapper, GeminiBlockedError
+from src.config.settings import (
+    FRAUD_MODEL_PATH, SUPPORTED_CHAINS_PATH,
+    REPORT_CACHE_TTL, REPORT_CACHE_MAX_ENTRIES, SLOW_REPORT_SECONDS,
+    INSPECT_BUDGET, INSPECT_STAGE_SHARES
+)
 
+logger = logging.getLogger(__name__)
+
+
+# Получает весь накопленный на данный момент текст отчёта
+ProgressCallback = Callable[[str], Awaitable[None]]
+
+# Названия стадий-источников для промпта и отчёта
+MISSING_LABELS = {
+    "news": "новости",
+    "platforms": "сети токена",
+    "contract": "анализ контракта",
+    "market": "рыночные данные",
+    "listings": "листинги на биржах",
+    "price_history": "история цен",
+    "classify": "оценка модели",
+    "llm": "отчёт модели",
+}
 
-class CombinedTokenInspector:
-    NEWS_RSS_URL = "https://news.google.com/rss/search?q={q}&hl=ru&gl=RU&ceid=RU:ru"
 
+class CombinedTokenInspector:
     def __init__(self):
-        # Загрузка нативных токенов
-        with open(SUPPORTED_CHAINS_PATH, encoding="utf-8") as f:
-            chains = json.load(f)
-        self.native_tokens = {
-            entry["native_symbol"].lower(): entry["id"]
-            for entry in chains if entry.get("native_symbol")
-        }
+        # Реестр сетей: нативные токены, обозреватели блоков
+        self.chains = ChainRegistry.load(SUPPORTED_CHAINS_PATH)
+        self.native_tokens = self.chains.native_tokens()
 
-        self.fetcher    = TokenDataFetcher()
-        self.classifier = BoostingFraudClassifier(FRAUD_MODEL_PATH)
+        self.fetcher    = TokenDataFetcher(chains=self.chains)
+        # Модель (и xgboost с pandas) грузится при первом анализе или в warmup()
+        self.classifier = BoostingFraudClassifier(FRAUD_MODEL_PATH, lazy=True)
         self.gemini     = GeminiWrapper()
+        # Новости из RSS/Atom-лент; индекс по тикерам обновляется в фоне (news.run())
+        self.news       = NewsAggregator(self.fetcher.transport, self.fetcher.cache)
+        # Одновременные проверки одного и того же токена выполняются один раз
+        self._inflight  = SingleFlight()
+        # Подписчики на частичный текст отчёта по ключу (symbol, chain)
+        self._progress: Dict[Any, List[ProgressCallback]] = {}
 
-    def _fetch_news(self, query: str, max_items: int = 5) -> List[Dict[str, str]]:
-        url = self.NEWS_RSS_URL.format(q=requests.utils.requote_uri(query))
-        try:
-            resp = requests.get(url, timeout=5)
-            resp.raise_for_status()
-            root = ET.fromstring(resp.content)
-            items = root.findall('.//item')[:max_items]
-            news = []
-            for itm in items:
-                title = itm.findtext('title', '').strip()
-                pub   = itm.findtext('pubDate', '').strip()
-                news.append({'date': pub, 'title': title})
-            return news
-        except Exception:
-            return []
+    async def warmup(self) -> None:
+        """
+        Загрузка модели в потоке исполнителя, чтобы первый анализ её не ждал.
+        """
+        started = time.perf_counter()
+        await self._load_classifier()
+        logger.info("Inspector warmed up in %.2fs", time.perf_counter() - started)
+
+    async def _load_classifier(self) -> BoostingFraudClassifier:
+        if not self.classifier.loaded:
+            await asyncio.get_running_loop().run_in_executor(None, self.classifier.load)
+        return self.classifier
+
+    @instrument("fetch_news")
+    async def _fetch_news(self, query: str, max_items: int = 5, refresh: bool = False) -> List[Dict[str, str]]:
+        # Сбои отдельных лент логируются агрегатором, их записи берутся из прошлого опроса
+        return await self.news.get(query, max_items, refresh=refresh)
 
     def _format_bullets(self, items: List[str]) -> str:
         return "\n".join(f"• {line}" for line in items)
@@ -99,25 +132,170 @@ class CombinedTokenInspector:
         prompt = "\n".join(parts + [instruction])
         return prompt
 
-    async def inspect(
+    def _report_cache_key(
         self,
         symbol: str,
-        chain: Optional[str] = None
-    ) -> Dict[str, Any]:
-        symbol_u = symbol.upper()
-        symbol_l = symbol.lower()
+        news: List[Dict[str, str]],
+        risk_context: Optional[str],
+        analysis_items: List[str]
+    ) -> str:
+        """
+        Хэш нормализованных входов отчёта: всё, что попадает в промпт,
+        кроме даты. Пункты анализа уже содержат фичи, адрес и вероятность
+        (с округлением до 0.1%), поэтому отдельно их не сериализуем.
+        """
+        payload = {
+            "model": self.gemini.model,
+            "symbol": symbol,
+            "risk_context": (risk_context or "").strip(),
+            "news": [n.get("title", "") for n in news],
+            "analysis": analysis_items,
+        }
+        raw = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _prepare_prompt(
+        self,
+        symbol: str,
+        date_str: str,
+        news: List[Dict[str, str]],
+        risk_context: Optional[str],
+        analysis_items: List[str]
+    ) -> Tuple[str, str]:
+        prompt = self._build_final_prompt(symbol, date_str, news, risk_context, analysis_items)
+        return prompt, self._report_cache_key(symbol, news, risk_context, analysis_items)
 
-        # Дата
+    def _date_str(self) -> str:
         months = {
             1: "января", 2: "февраля", 3: "марта", 4: "апреля",
             5: "мая", 6: "июня", 7: "июля", 8: "августа",
             9: "сентября", 10: "октября", 11: "ноября", 12: "декабря"
         }
         now = datetime.now()
-        date_str = f"{now.day} {months[now.month]} {now.year}"
+        return f"{now.day} {months[now.month]} {now.year}"
 
-        # Новости
-        news = self._fetch_news(symbol_u)
+    async def inspect(
+        self,
+        symbol: str,
+        chain: Optional[str] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        coin_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Анализ токена. Запросы с одинаковыми (symbol, chain, coin_id), пришедшие
+        пока первый ещё выполняется, получают его результат. `coin_id` —
+        монета, выбранная пользователем при неоднозначном тикере.
+
+        `on_progress` вызывается с накопленным текстом отчёта по мере
+        потоковой генерации; подписаться может каждый из схлопнутых запросов.
+        """
+        # Trace id связывает логи всех стадий одного отчёта
+        if current_trace_id() == "-":
+            new_trace_id()
+        key = (symbol.upper(), chain, coin_id)
+        if on_progress is not None:
+            self._progress.setdefault(key, []).append(on_progress)
+        try:
+            result = await self._inflight.do(key, lambda: self._inspect(symbol, chain, coin_id))
+        finally:
+            if on_progress is not None:
+                listeners = self._progress.get(key, [])
+                if on_progress in listeners:
+                    listeners.remove(on_progress)
+                if not listeners:
+                    self._progress.pop(key, None)
+        return dict(result)
+
+    async def _notify_progress(self, key: Any, text: str) -> None:
+        for callback in list(self._progress.get(key, [])):
+            try:
+                await callback(text)
+            except Exception as e:
+                logger.debug("Progress callback failed: %s", e)
+
+    async def _generate_report(self, key: Any, prompt: str, partial: Optional[List[str]] = None) -> str:
+        """
+        Если кто-то ждёт частичный отчёт — потоковая генерация,
+        иначе (или при сбое потока) — обычный запрос. Оборванный поток
+        не возвращается как отчёт: его закэшировали бы на REPORT_CACHE_TTL.
+        В `partial` (если передан) копится уже полученный текст — на случай
+        отмены по дедлайну.
+        """
+        if self._progress.get(key):
+            text = ""
+            try:
+                async for piece in self.gemini.stream(prompt):
+                    text += piece
+                    if partial is not None:
+                        partial.append(piece)
+                    await self._notify_progress(key, text)
+            except GeminiBlockedError:
+                # Обычный запрос с тем же промптом будет заблокирован так же
+                raise
+            except Exception as e:
+                logger.warning("Gemini stream failed after %d chars: %s", len(text), e)
+            else:
+                if text:
+                    return text
+        # Контекст (trace id) переносится в поток исполнителя. При отмене по
+        # дедлайну поток не прерывается, но его ответ уже никто не ждёт
+        ctx = contextvars.copy_context()
+        return await asyncio.get_running_loop().run_in_executor(
+            None, ctx.run, self.gemini.generate, prompt
+        )
+
+    def _fallback_report(
+        self, symbol: str, analysis_items: List[str], partial: str, blocked: Optional[str] = None
+    ) -> str:
+        """
+        Отчёт без LLM (или с оборванным текстом), если модель не уложилась
+        в бюджет или отклонила запрос (`blocked` — blockReason Gemini).
+        """
+        if blocked is not None:
+            reason = f"модель отклонила запрос (фильтр Gemini: {blocked})"
+        else:
+            reason = "модель не ответила вовремя"
+        if partial.strip() and blocked is None:
+            return partial.rstrip() + "\n\n⚠️ _Отчёт прерван: превышено время ожидания модели._"
+        lines = [
+            f"⚠️ *Отчёт сокращён:* {reason}, ниже — собранные данные по {symbol}.",
+        ]
+        lines.extend(f"• {item}" for item in analysis_items)
+        return "\n".join(lines)
+
+    @staticmethod
+    def _deadline(stage: str) -> Optional[float]:
+        share = INSPECT_STAGE_SHARES.get(stage)
+        return None if share is None or INSPECT_BUDGET <= 0 else INSPECT_BUDGET * share
+
+    async def _inspect(
+        self,
+        symbol: str,
+        chain: Optional[str] = None,
+        coin_id: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Анализ токена как граф стадий:
+
+            news ───────────────────────────────────────────────────┐
+            platforms → target ─┬→ contract ─┬→ features → classify ┴→ prompt → llm
+                                └→ market ───┘                ↑
+            model ────────────────────────────────────────────┘
+
+        Новости загружаются параллельно с поиском платформ и сбором фич;
+        модель, если её ещё не загрузил warmup(), — тоже.
+        Сборка промпта и генерация отчёта ждут всех остальных стадий.
+
+        Все стадии укладываются в общий бюджет INSPECT_BUDGET: стадия,
+        не успевшая к своему дедлайну, отменяется, а отчёт строится по
+        остальным данным. Чего не хватило, перечисляется в промпте и
+        в поле 'missing' результата; классификатор импутирует пропуски.
+        """
+        started = time.perf_counter()
+        symbol_u = symbol.upper()
+        symbol_l = symbol.lower()
+        date_str = self._date_str()
+        progress_key = (symbol_u, chain, coin_id)
 
         # Контекст для нативных токенов
         is_native = symbol_l in self.native_tokens
@@ -126,64 +304,184 @@ class CombinedTokenInspector:
             network = self.native_tokens[symbol_l]
             risk_context = f"*Важная заметка:* {symbol_u} — нативный токен сети {network}, риски зависят от сети.\n"
 
+        graph = StageGraph()
+        # Источники, данных которых нет в отчёте (не ответили или не успели)
+        missing: List[str] = []
+
+        # Новости
+        async def news_stage():
+            return await self._fetch_news(symbol_u)
+
+        graph.add("news", news_stage, deadline=self._deadline("news"), fallback=list)
+
         if is_native:
-            analysis_items = []
-            # основная рекомендация
-            analysis_items.append("Нативный токен — риски зависят от сети.")
-            prompt = self._build_final_prompt(symbol_u, date_str, news, risk_context, analysis_items)
-            llm_report = await asyncio.get_running_loop().run_in_executor(
-                None, lambda: self.gemini.generate(prompt)
+            async def prompt_stage(news):
+                # основная рекомендация
+                analysis_items = ["Нативный токен — риски зависят от сети."]
+                return self._prepare_prompt(symbol_u, date_str, news, risk_context, analysis_items) + (analysis_items,)
+
+            graph.add("prompt", prompt_stage, deps=["news"])
+        else:
+            # Платформы
+            async def platforms_stage():
+                try:
+                    return await self.fetcher.get_token_platforms(symbol_u, coin_id)
+                except Exception as e:
+                    record_error("platforms", e)
+                    logger.info("No platforms for %s: %s", symbol_u, e)
+                    return {}
+
+            # Сеть и адрес
+            async def target_stage(platforms):
+                if not platforms:
+                    return None, None
+                return self.chains.pick_platform(platforms, chain)
+
+            # Контракт и рынок — отдельные стадии: одна может не успеть, не теряя другую
+            # Поставщик, отдавший значения по умолчанию, тоже попадает в missing
+            def source_stage(name: str, fetch: Callable[..., Awaitable[Dict[str, Any]]]):
+                async def run(target):
+                    network, address = target
+                    if not address:
+                        return {}
+                    try:
+                        return await fetch(address, network, failed=missing)
+                    except Exception as e:
+                        record_error(name, e)
+                        logger.warning("%s data for %s on %s failed: %s", name, address, network, e)
+                        missing.append(name)
+                        return {}
+                return run
+
+            async def features_stage(target, contract, market):
+                network, address = target
+                return network, address, {**contract, **market}
+
+            # Модель грузится вне event loop, пока идут сетевые стадии
+            async def model_stage():
+                try:
+                    return await self._load_classifier()
+                except Exception as e:
+                    record_error("classifier_load", e)
+                    logger.error("Model load failed: %s", e)
+                    return None
+
+            # Прогноз
+            async def classify_stage(fetched, classifier):
+                _, _, features = fetched
+                is_scam, scam_prob = None, None
+                if features and classifier is not None:
+                    try:
+                        label, probs = classifier.predict_one(features)
+                        is_scam = bool(label)
+                        scam_prob = float(probs[label]) * 100
+                    except Exception as e:
+                        logger.warning("Classifier failed for %s: %s", symbol_u, e)
+                return is_scam, scam_prob
+
+            # Формируем анализ
+            async def prompt_stage(news, fetched, scored):
+                network, address, features = fetched
+                _, scam_prob = scored
+                analysis_items = []
+                if address:
+                    analysis_items.append(f"Сеть: {network}")
+                    analysis_items.append(f"Адрес: {address}")
+                for k, v in scalar_features(features):
+                    analysis_items.append(f"{k.replace('_', ' ')}: {v}")
+                if scam_prob is not None:
+                    analysis_items.append(f"Вероятность скама: {scam_prob:.1f}%")
+                absent = sorted(set(missing + graph.timed_out))
+                if absent:
+                    analysis_items.append(
+                        "Нет данных (источник не ответил вовремя): "
+                        + ", ".join(MISSING_LABELS.get(a, a) for a in absent)
+                        + " — учитывай это в оценке."
+                    )
+                return self._prepare_prompt(symbol_u, date_str, news, risk_context, analysis_items) + (analysis_items,)
+
+            graph.add("platforms", platforms_stage, deadline=self._deadline("platforms"), fallback={})
+            graph.add("target", target_stage, deps=["platforms"])
+            graph.add(
+                "contract", source_stage("contract", self.fetcher._fetch_contract_info), deps=["target"],
+                deadline=self._deadline("contract"), fallback=lambda target: {}
+            )
+            graph.add(
+                "market", source_stage("market", self.fetcher._fetch_market_info), deps=["target"],
+                deadline=self._deadline("market"), fallback=lambda target: {}
+            )
+            graph.add("features", features_stage, deps=["target", "contract", "market"])
+            graph.add("model", model_stage)
+            graph.add(
+                "classify", classify_stage, deps=["features", "model"],
+                deadline=self._deadline("classify"), fallback=(None, None)
             )
+            graph.add("prompt", prompt_stage, deps=["news", "features", "classify"])
+
+        # Финальный отчёт (или готовый из кэша при тех же входных данных)
+        partial: List[str] = []
+
+        async def llm_stage(prepared):
+            prompt, report_key, _ = prepared
+            cached = self.fetcher.cache.get("report", report_key)
+            if cached is not None:
+                await self._notify_progress(progress_key, cached)
+                return cached
+            try:
+                report = await self._generate_report(progress_key, prompt, partial)
+            except GeminiBlockedError as e:
+                # Не кэшируется: причина видна пользователю, а не «ошибка анализа»
+                return self._fallback_report(symbol_u, prepared[2], "", blocked=e.reason)
+            # Отчёт по неполным данным не кэшируем: в следующий раз источники могут успеть
+            if report != GeminiWrapper.ERROR_TEXT and not (missing or graph.timed_out):
+                self.fetcher.cache.set(
+                    "report", report_key, report, REPORT_CACHE_TTL,
+                    max_entries=REPORT_CACHE_MAX_ENTRIES
+                )
+            return report
+
+        def llm_fallback(prepared):
+            return self._fallback_report(symbol_u, prepared[2], "".join(partial))
+
+        graph.add("llm", llm_stage, deps=["prompt"], deadline=self._deadline("llm"), fallback=llm_fallback)
+        try:
+            results = await graph.run()
+        finally:
+            observe_stages(graph.timings.items())
+        timings = {name: round(sec, 3) for name, sec in graph.timings.items()}
+        missing = sorted(set(missing + graph.timed_out))
+        elapsed = time.perf_counter() - started
+        REPORT_SECONDS.observe(elapsed, kind="native" if is_native else "token")
+        if missing:
+            logger.warning("Partial report for %s in %.1fs, missing %s", symbol_u, elapsed, missing)
+        if elapsed >= SLOW_REPORT_SECONDS:
+            logger.warning("Slow report for %s: %.1fs, stages %s", symbol_u, elapsed, timings)
+        else:
+            logger.info("Report for %s in %.2fs", symbol_u, elapsed)
+
+        if is_native:
             return {
                 'symbol': symbol_u,
                 'prediction': False,
                 'scam_probability': 0.01,
-                'llm_report': llm_report
+                'llm_report': results["llm"],
+                'timings': timings,
+                'missing': missing,
+                'trace_id': current_trace_id()
             }
 
-        # Платформы и адрес
-        try:
-            platforms = self.fetcher.get_token_platforms(symbol_u)
-        except Exception:
-            platforms = {}
-        address = None
-        if platforms:
-            address = platforms.get(chain) or next(iter(platforms.values()))
-
-        # Фичи и прогноз
-        features, is_scam, scam_prob = {}, None, None
-        if address:
-            try:
-                features = self.fetcher.get_token_features(address)
-                df = pd.DataFrame([features])
-                is_scam = bool(self.classifier.predict(df).iloc[0])
-                scam_prob = float(
-                    self.classifier.predict_proba(df)[f"prob_class_{int(is_scam)}"].iloc[0]
-                ) * 100
-            except Exception:
-                pass
-
-        # Формируем анализ
-        analysis_items = []
-        if address:
-            analysis_items.append(f"Адрес: {address}")
-        for k, v in (features.items()):
-            analysis_items.append(f"{k.replace('_', ' ')}: {v}")
-        if scam_prob is not None:
-            analysis_items.append(f"Вероятность скама: {scam_prob:.1f}%")
-
-        # Финальный промпт
-        prompt = self._build_final_prompt(symbol_u, date_str, news, risk_context, analysis_items)
-        llm_report = await asyncio.get_running_loop().run_in_executor(
-            None, lambda: self.gemini.generate(prompt)
-        )
-
+        network, address, _ = results["features"]
+        is_scam, scam_prob = results["classify"]
         result = {
             'symbol': symbol_u,
             'prediction': is_scam,
             'scam_probability': scam_prob,
-            'llm_report': llm_report
+            'llm_report': results["llm"],
+            'timings': timings,
+            'missing': missing,
+            'trace_id': current_trace_id()
         }
         if address:
             result['address'] = address
+            result['chain'] = network
         return result
@@ -0,0 +1,245 @@
+# src/services/contract_store.py
+
+import os
+import re
+import sys
+import gzip
+import json
+import zlib
+import sqlite3
+import logging
+import argparse
+import threading
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Union
+
+from src.config.settings import CONTRACT_STORE_PATH
+from src.services.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+CONTRACT_STORE_LOOKUPS = REGISTRY.counter(
+    "contract_store_lookups_total", "Local verified-contract store lookups", ("result",)
+)
+
+# Поля записи getsourcecode, которые нужны analyze_contract (и ничего сверх)
+FIELDS = ("ContractName", "ABI", "SourceCode", "CompilerVersion", "OptimizationUsed", "Proxy", "Implementation")
+# Ключи выгрузок в любом регистре и с подчёркиваниями: source_code, optimization_used, ...
+_FIELD_BY_KEY = {f.lower(): f for f in FIELDS}
+_ADDRESS_KEYS = ("address", "contractaddress")
+
+_HEX_ADDRESS = re.compile(r"0x[0-9a-f]{40}")
+
+INGEST_BATCH = 5000
+
+
+def _address_key(address: str) -> Union[bytes, str]:
+    """
+    EVM-адрес хранится 20 байтами, адреса других форматов — строкой.
+    """
+    address = address.strip().lower()
+    if _HEX_ADDRESS.fullmatch(address):
+        return bytes.fromhex(address[2:])
+    return address
+
+
+def _compact_abi(abi: Any) -> Any:
+    # ABI в выгрузках бывает с отступами — храним без пробелов
+    if isinstance(abi, list):
+        return json.dumps(abi, separators=(",", ":"))
+    if isinstance(abi, str) and abi.startswith("["):
+        try:
+            return json.dumps(json.loads(abi), separators=(",", ":"))
+        except ValueError:
+            pass
+    return abi
+
+
+def normalize_record(record: Mapping[str, Any]) -> Dict[str, Any]:
+    """
+    Запись выгрузки → поля getsourcecode (FIELDS); ключи без учёта
+    регистра и подчёркиваний, SourceCode-объект сериализуется в JSON.
+    """
+    entry: Dict[str, Any] = {}
+    for key, value in record.items():
+        field = _FIELD_BY_KEY.get(key.replace("_", "").lower())
+        if field is not None and value is not None:
+            entry[field] = value
+    if "ABI" in entry:
+        entry["ABI"] = _compact_abi(entry["ABI"])
+    if isinstance(entry.get("SourceCode"), dict):
+        entry["SourceCode"] = json.dumps(entry["SourceCode"], separators=(",", ":"))
+    return entry
+
+
+def iter_records(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Записи выгрузки: JSONL (по записи в строке), JSON (список записей или
+    ответ getsourcecode с "result"), в т.ч. .gz; каталог — все такие файлы в нём.
+    """
+    if os.path.isdir(path):
+        for root, _, files in os.walk(path):
+            for name in sorted(files):
+                if name.endswith((".jsonl", ".json", ".jsonl.gz", ".json.gz")):
+                    yield from iter_records(os.path.join(root, name))
+        return
+
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        if path.endswith((".jsonl", ".jsonl.gz")):
+            for n, line in enumerate(f, 1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning("%s:%d: invalid JSON, skipped", path, n)
+            return
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("result", [data])
+    for record in data if isinstance(data, list) else []:
+        if isinstance(record, dict):
+            yield record
+
+
+class ContractStore:
+    """
+    Локальная база проверенных контрактов: «сеть + адрес → запись getsourcecode».
+    Заполняется пакетно из выгрузок (`ingest`, CLI ниже) и читается поставщиком
+    контракта до обращения к обозревателю блоков; адреса, которых нет в базе,
+    по-прежнему уходят в обозреватель.
+
+    SQLite-таблица WITHOUT ROWID с первичным ключом (chain, address):
+    поиск — один проход по B-дереву; адрес — 20 байт, запись — сжатый zlib
+    JSON только с нужными полями. Файл открывается читателем лениво
+    и только на чтение, поэтому без загруженной базы бот работает как раньше.
+    """
+
+    def __init__(self, path: str = CONTRACT_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._writable = False
+
+    def _connect(self, write: bool = False) -> Optional[sqlite3.Connection]:
+        if self._conn is not None and (self._writable or not write):
+            return self._conn
+        if not write and not (self.path and os.path.exists(self.path)):
+            return None
+        if self._conn is not None:
+            self._conn.close()
+        if write:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS contracts ("
+                " chain TEXT NOT NULL,"
+                " address BLOB NOT NULL,"
+                " entry BLOB NOT NULL,"
+                " PRIMARY KEY (chain, address)) WITHOUT ROWID"
+            )
+            self._conn.commit()
+        else:
+            self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._writable = write
+        return self._conn
+
+    def get(self, chain: str, address: str) -> Optional[Dict[str, Any]]:
+        """
+        Запись getsourcecode по адресу или None, если его нет в базе (или базы нет).
+        """
+        if not address:
+            return None
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return None
+            try:
+                row = conn.execute(
+                    "SELECT entry FROM contracts WHERE chain = ? AND address = ?",
+                    (chain, _address_key(address))
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning("Contract store lookup failed: %s", e)
+                return None
+        CONTRACT_STORE_LOOKUPS.inc(result="miss" if row is None else "hit")
+        if row is None:
+            return None
+        return json.loads(zlib.decompress(row[0]))
+
+    def ingest(self, records: Iterable[Mapping[str, Any]], chain: str = "ethereum") -> int:
+        """
+        Пакетная загрузка записей (см. normalize_record); сеть берётся из поля
+        "chain" записи, иначе `chain`. Существующие адреса перезаписываются.
+        Возвращает число загруженных записей.
+        """
+        def rows() -> Iterator[tuple]:
+            for record in records:
+                address = next((record[k] for k in record if k.replace("_", "").lower() in _ADDRESS_KEYS), None)
+                if not isinstance(address, str) or not address:
+                    continue
+                entry = normalize_record(record)
+                payload = zlib.compress(json.dumps(entry, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+                yield (record.get("chain") or chain).lower(), _address_key(address), payload
+
+        total = 0
+        with self._lock:
+            conn = self._connect(write=True)
+            batch: List[tuple] = []
+            for row in rows():
+                batch.append(row)
+                if len(batch) >= INGEST_BATCH:
+                    total += self._write(conn, batch)
+                    batch = []
+            if batch:
+                total += self._write(conn, batch)
+        return total
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, batch: List[tuple]) -> int:
+        with conn:
+            conn.executemany("INSERT OR REPLACE INTO contracts (chain, address, entry) VALUES (?, ?, ?)", batch)
+        return len(batch)
+
+    def count(self) -> Dict[str, int]:
+        """
+        Число контрактов по сетям.
+        """
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return {}
+            return dict(conn.execute("SELECT chain, COUNT(*) FROM contracts GROUP BY chain").fetchall())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Local verified-contract store")
+    parser.add_argument("--db", default=CONTRACT_STORE_PATH, help="файл базы (CONTRACT_STORE_PATH)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    ingest = commands.add_parser("ingest", help="загрузить выгрузки JSONL/JSON (файлы или каталоги)")
+    ingest.add_argument("paths", nargs="+")
+    ingest.add_argument("--chain", default="ethereum", help="сеть (id платформы CoinGecko) для записей без поля chain")
+    commands.add_parser("stats", help="число контрактов по сетям")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    store = ContractStore(args.db)
+    try:
+        if args.command == "ingest":
+            for path in args.paths:
+                n = store.ingest(iter_records(path), chain=args.chain)
+                logger.info("Ingested %d contracts from %s", n, path)
+        for chain, n in sorted(store.count().items()):
+            sys.stdout.write(f"{chain}\t{n}\n")
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    main()
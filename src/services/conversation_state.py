@@ -0,0 +1,72 @@
+# src/services/conversation_state.py
+
+import time
+import asyncio
+from typing import Any, Dict, Optional
+
+from src.services.cache import LRUCache, SQLiteStore
+from src.config.settings import BOT_STATE_FILE, BOT_STATE_TTL
+
+_MISSING = object()
+
+
+class ConversationState:
+    """
+    Состояние диалога пользователя в SQLite: обновление от Telegram может
+    прийти в любой процесс бота, и каждый должен видеть, что пользователь,
+    например, уже нажал /start и ждёт ввода тикера.
+    Ключ — пара (чат, пользователь), как у ConversationHandler.
+
+    Обращения к SQLite идут в исполнителе: при занятой блокировке файла
+    (несколько процессов, WAL) ждёт поток, а не event loop. С `memory_size`
+    перед SQLite стоит LRU — только для бота в одном процессе: в webhook-режиме
+    с несколькими процессами локальная копия устарела бы после хода в другом.
+    """
+
+    NAMESPACE = "conversation"
+
+    def __init__(self, path: str = BOT_STATE_FILE, ttl: float = BOT_STATE_TTL, memory_size: int = 0):
+        self.store = SQLiteStore(path)
+        self.ttl = ttl
+        self.memory = LRUCache(memory_size) if memory_size > 0 else None
+
+    @staticmethod
+    def _key(chat_id: int, user_id: Optional[int]) -> str:
+        return f"{chat_id}:{user_id if user_id is not None else chat_id}"
+
+    @staticmethod
+    async def _run(fn, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(None, fn, *args)
+
+    async def get(self, chat_id: int, user_id: Optional[int]) -> Optional[Dict[str, Any]]:
+        """
+        {"state": int, "data": {...}} или None, если диалога нет или он истёк.
+        """
+        key = self._key(chat_id, user_id)
+        if self.memory is not None:
+            value = self.memory.get(self.NAMESPACE, key, _MISSING)
+            if value is not _MISSING:
+                return value
+        entry = await self._run(self.store.get, self.NAMESPACE, key)
+        if entry is None:
+            return None
+        if self.memory is not None:
+            self.memory.set(self.NAMESPACE, key, entry[1], entry[0])
+        return entry[1]
+
+    async def set(self, chat_id: int, user_id: Optional[int], state: int, **data: Any) -> None:
+        key = self._key(chat_id, user_id)
+        value = {"state": state, "data": data}
+        expires_at = time.time() + self.ttl
+        if self.memory is not None:
+            self.memory.set(self.NAMESPACE, key, value, expires_at)
+        await self._run(self.store.set, self.NAMESPACE, key, value, expires_at)
+
+    async def clear(self, chat_id: int, user_id: Optional[int]) -> None:
+        key = self._key(chat_id, user_id)
+        if self.memory is not None:
+            self.memory.delete(self.NAMESPACE, key)
+        await self._run(self.store.delete, self.NAMESPACE, key)
+
+    def close(self) -> None:
+        self.store.close()
@@ -0,0 +1,213 @@
+# src/services/job_queue.py
+
+import time
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional
+
+from src.config.settings import (
+    ANALYSIS_WORKERS, ANALYSIS_QUEUE_SIZE, ANALYSIS_PER_USER,
+    ANALYSIS_QUEUE_TIMEOUT, ANALYSIS_POSITION_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+# Получает позицию в очереди (1 — следующий; 0 — задача запущена)
+PositionCallback = Callable[[int], Awaitable[None]]
+RejectCallback = Callable[["Overloaded"], Awaitable[None]]
+
+
+class Overloaded(Exception):
+    """
+    Задача не принята или снята из-за перегрузки — вызывающему нужно
+    явно сообщить об этом пользователю.
+    """
+
+
+class QueueFull(Overloaded):
+    pass
+
+
+class UserLimitExceeded(Overloaded):
+    pass
+
+
+class QueueTimeout(Overloaded):
+    pass
+
+
+class Job:
+    def __init__(
+        self,
+        user: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        on_position: Optional[PositionCallback] = None,
+        on_reject: Optional[RejectCallback] = None
+    ):
+        self.user = user
+        self.fn = fn
+        self.on_position = on_position
+        self.on_reject = on_reject
+        self.enqueued_at = time.monotonic()
+        self.position = 0
+        self._notified_at = 0.0
+        self._notified_position: Optional[int] = None
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        # Результат может никто не ждать — не даём asyncio ругаться на «потерянное» исключение
+        self.future.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+
+class AnalysisQueue:
+    """
+    Ограниченная очередь анализов между обработчиками бота и инспектором:
+
+    * `workers` задач выполняются одновременно, остальные ждут в FIFO;
+    * у одного пользователя не больше `per_user` задач (в очереди и в работе);
+    * при заполненной очереди новая задача сразу отклоняется (QueueFull),
+      а задача, прождавшая дольше `max_wait`, снимается (QueueTimeout) —
+      перегрузка видна пользователю, а не превращается в тихий таймаут.
+
+    Позиция в очереди сообщается через `on_position` не чаще `position_interval`.
+    """
+
+    def __init__(
+        self,
+        workers: int = ANALYSIS_WORKERS,
+        max_queue: int = ANALYSIS_QUEUE_SIZE,
+        per_user: int = ANALYSIS_PER_USER,
+        max_wait: float = ANALYSIS_QUEUE_TIMEOUT,
+        position_interval: float = ANALYSIS_POSITION_INTERVAL
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.per_user = per_user
+        self.max_wait = max_wait
+        self.position_interval = position_interval
+        self._pending: Deque[Job] = deque()
+        self._per_user: Dict[Hashable, int] = {}
+        # Свободные воркеры ждут задачу на своём future — задача передаётся
+        # им сразу при submit и не занимает место в очереди
+        self._idle: Deque[asyncio.Future] = deque()
+        self._tasks: List[asyncio.Task] = []
+        self.running = 0
+        self.counters = {
+            "submitted": 0, "completed": 0, "failed": 0,
+            "rejected_full": 0, "rejected_user": 0, "expired": 0,
+        }
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._idle.clear()
+        while self._pending:
+            self._pending.popleft().future.cancel()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters, queued=len(self._pending), running=self.running)
+
+    def submit(
+        self,
+        user: Hashable,
+        fn: Callable[[], Awaitable[Any]],
+        on_position: Optional[PositionCallback] = None,
+        on_reject: Optional[RejectCallback] = None
+    ) -> Job:
+        """
+        Ставит задачу в очередь или сразу выбрасывает Overloaded.
+        У возвращённой задачи `position` — место в очереди (0, если свободный
+        воркер взял её немедленно).
+        """
+        if self._per_user.get(user, 0) >= self.per_user:
+            self.counters["rejected_user"] += 1
+            raise UserLimitExceeded(f"User already has {self.per_user} analyses in progress")
+        while self._idle and self._idle[0].done():
+            self._idle.popleft()
+        if not self._idle and len(self._pending) >= self.max_queue:
+            self.counters["rejected_full"] += 1
+            raise QueueFull(f"Analysis queue is full ({self.max_queue})")
+
+        job = Job(user, fn, on_position, on_reject)
+        self._per_user[user] = self._per_user.get(user, 0) + 1
+        self.counters["submitted"] += 1
+        if self._idle:
+            self._idle.popleft().set_result(job)
+        else:
+            self._pending.append(job)
+            job.position = len(self._pending)
+        job._notified_position = job.position
+        job._notified_at = time.monotonic()
+        return job
+
+    def _release(self, job: Job) -> None:
+        left = self._per_user.get(job.user, 1) - 1
+        if left > 0:
+            self._per_user[job.user] = left
+        else:
+            self._per_user.pop(job.user, None)
+
+    def _notify_positions(self) -> None:
+        now = time.monotonic()
+        for idx, job in enumerate(self._pending, start=1):
+            job.position = idx
+            if (
+                job.on_position is None
+                or job._notified_position == idx
+                or now - job._notified_at < self.position_interval
+            ):
+                continue
+            job._notified_at, job._notified_position = now, idx
+            asyncio.ensure_future(self._call(job.on_position, idx))
+
+    @staticmethod
+    async def _call(callback: Callable[[Any], Awaitable[None]], arg: Any) -> None:
+        try:
+            await callback(arg)
+        except Exception as e:
+            logger.debug("Queue callback failed: %s", e)
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            if self._pending:
+                job = self._pending.popleft()
+                self._notify_positions()
+            else:
+                waiter = loop.create_future()
+                self._idle.append(waiter)
+                job = await waiter
+
+            if time.monotonic() - job.enqueued_at > self.max_wait:
+                self.counters["expired"] += 1
+                self._release(job)
+                exc = QueueTimeout(f"Waited in queue longer than {self.max_wait:.0f}s")
+                job.future.set_exception(exc)
+                if job.on_reject is not None:
+                    await self._call(job.on_reject, exc)
+                continue
+
+            self.running += 1
+            try:
+                if job.on_position is not None and job._notified_position != 0:
+                    await self._call(job.on_position, 0)
+                job.future.set_result(await job.fn())
+                self.counters["completed"] += 1
+            except asyncio.CancelledError:
+                job.future.cancel()
+                raise
+            except Exception as e:
+                self.counters["failed"] += 1
+                logger.exception("Analysis job failed")
+                job.future.set_exception(e)
+            finally:
+                self.running -= 1
+                self._release(job)
@@ -0,0 +1,314 @@
+# src/services/metrics.py
+
+import time
+import uuid
+import asyncio
+import logging
+import functools
+import threading
+import contextvars
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "scam_analyzer_"
+
+# Границы бакетов гистограмм задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[Any], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labels)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = list(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # {метки: [счётчики по бакетам..., сумма, количество]}
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[i] += 1
+            entry[-2] += value
+            entry[-1] += 1
+
+    def count(self, **labels: Any) -> int:
+        entry = self._values.get(self._key(labels))
+        return int(entry[-1]) if entry else 0
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._values.items()]
+        for key, entry in items:
+            for bound, n in zip(self.buckets + (float("inf"),), entry[:len(self.buckets)] + [entry[-1]]):
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, le)} {_format_value(n)}")
+            labels = _format_labels(self.labels, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(entry[-2])}")
+            lines.append(f"{self.name}_count{labels} {_format_value(entry[-1])}")
+        return lines
+
+
+class Registry:
+    """
+    Набор метрик процесса в текстовом формате Prometheus. Коллекторы
+    вызываются перед каждой выдачей и обновляют gauge-метрики
+    (длина очереди, состояние автоматов и т.п.).
+    """
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, help: str, labels: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels))
+
+    def histogram(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        for collector in list(self._collectors):
+            try:
+                collector()
+            except Exception as e:
+                logger.warning("Metrics collector failed: %s", e)
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+UPSTREAM_SECONDS = REGISTRY.histogram(
+    "upstream_request_seconds", "Upstream call latency including retries",
+    ("provider", "outcome")
+)
+UPSTREAM_RETRIES = REGISTRY.counter(
+    "upstream_retries_total", "Upstream attempts retried after a transient error", ("provider",)
+)
+UPSTREAM_ERRORS = REGISTRY.counter(
+    "upstream_errors_total", "Upstream calls that failed after retries", ("provider", "error")
+)
+CALL_SECONDS = REGISTRY.histogram(
+    "call_seconds", "Latency of instrumented fetcher, classifier and LLM calls", ("call",)
+)
+CALL_ERRORS = REGISTRY.counter(
+    "call_errors_total", "Errors raised or swallowed in instrumented calls", ("call", "error")
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "stage_seconds", "Inspection stage latency without waiting for dependencies", ("stage",)
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total", "Cache lookups by namespace and tier", ("namespace", "result")
+)
+REPORT_SECONDS = REGISTRY.histogram(
+    "report_seconds", "End-to-end token inspection latency", ("kind",)
+)
+
+
+def record_error(call: str, exc: BaseException) -> None:
+    """
+    Для ошибок, которые перехватываются и не прерывают анализ.
+    """
+    CALL_ERRORS.inc(call=call, error=type(exc).__name__)
+
+
+def instrument(call: str) -> Callable:
+    """
+    Декоратор: гистограмма задержки и счётчик ошибок для функции
+    (обычной или корутины) под меткой call=`call`.
+    """
+    def decorator(fn: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await fn(*args, **kwargs)
+                except Exception as e:
+                    record_error(call, e)
+                    raise
+                finally:
+                    CALL_SECONDS.observe(time.perf_counter() - started, call=call)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                record_error(call, e)
+                raise
+            finally:
+                CALL_SECONDS.observe(time.perf_counter() - started, call=call)
+        return wrapper
+    return decorator
+
+
+# --- Trace ID ---
+
+_trace_id: contextvars.ContextVar[str] = contextvars.ContextVar("trace_id", default="-")
+
+
+def new_trace_id() -> str:
+    """
+    Новый trace id для текущего контекста; задачи asyncio, созданные
+    после этого, наследуют его автоматически.
+    """
+    trace_id = uuid.uuid4().hex[:12]
+    _trace_id.set(trace_id)
+    return trace_id
+
+
+def current_trace_id() -> str:
+    return _trace_id.get()
+
+
+def install_log_trace_ids() -> None:
+    """
+    Добавляет во все записи логов атрибут trace_id (для %(trace_id)s в формате).
+    """
+    previous = logging.getLogRecordFactory()
+    if getattr(previous, "_with_trace_id", False):
+        return
+
+    def factory(*args, **kwargs):
+        record = previous(*args, **kwargs)
+        record.trace_id = _trace_id.get()
+        return record
+
+    factory._with_trace_id = True
+    logging.setLogRecordFactory(factory)
+
+
+# --- HTTP ---
+
+async def _handle_metrics(request: web.Request) -> web.Response:
+    return web.Response(
+        text=REGISTRY.render(),
+        headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"}
+    )
+
+
+async def start_metrics_server(host: str, port: int) -> web.AppRunner:
+    """
+    Локальный endpoint GET /metrics; возвращает runner для остановки (cleanup()).
+    """
+    app = web.Application()
+    app.router.add_get("/metrics", _handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    logger.info("Metrics endpoint on http://%s:%d/metrics", host, port)
+    return runner
+
+
+def observe_stages(timings: Iterable[Tuple[str, float]]) -> None:
+    for stage, seconds in timings:
+        STAGE_SECONDS.observe(seconds, stage=stage)
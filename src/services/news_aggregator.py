@@ -0,0 +1,334 @@
+# src/services/news_aggregator.py
+
+import re
+import time
+import asyncio
+import logging
+import xml.etree.ElementTree as ET
+from collections import OrderedDict
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import quote
+
+import aiohttp
+
+from src.services.singleflight import SingleFlight
+from src.services.metrics import REGISTRY, record_error
+from src.config.settings import (
+    NEWS_SOURCES, NEWS_FEED_ITEMS, NEWS_SHARED_FEED_ITEMS, NEWS_FEED_TIMEOUT,
+    NEWS_POLL_INTERVAL, NEWS_QUERY_IDLE, NEWS_INDEX_SIZE, CACHE_TTL_NEWS
+)
+
+logger = logging.getLogger(__name__)
+
+NEWS_FEED_REQUESTS = REGISTRY.counter(
+    "news_feed_requests_total", "News feed polls by source and result", ("source", "result")
+)
+
+CHUNK_SIZE = 8192
+
+
+def _local(tag: Any) -> str:
+    # "{http://www.w3.org/2005/Atom}entry" → "entry"
+    return tag.rsplit("}", 1)[-1] if isinstance(tag, str) else ""
+
+
+def _timestamp(value: str) -> float:
+    """
+    Время публикации для сортировки: RFC 822 (RSS) или ISO 8601 (Atom); 0 — не распознано.
+    """
+    if not value:
+        return 0.0
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError):
+        pass
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class FeedParser:
+    """
+    Потоковый разбор RSS (<item>) и Atom (<entry>) через XMLPullParser:
+    тело подаётся кусками по мере загрузки, feed() возвращает True,
+    как только набрано `limit` записей, — остаток ленты можно не читать.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.items: List[Dict[str, Any]] = []
+        self._parser = ET.XMLPullParser(events=("end",))
+
+    def feed(self, chunk: bytes) -> bool:
+        self._parser.feed(chunk)
+        return self._read()
+
+    def close(self) -> None:
+        self._parser.close()
+        self._read()
+
+    def _read(self) -> bool:
+        for _, elem in self._parser.read_events():
+            if _local(elem.tag) not in ("item", "entry"):
+                continue
+            item = self._item(elem)
+            # Разобранные записи больше не нужны — не держим дерево целиком
+            elem.clear()
+            if item["title"]:
+                self.items.append(item)
+            if len(self.items) >= self.limit:
+                return True
+        return False
+
+    @staticmethod
+    def _item(elem: ET.Element) -> Dict[str, Any]:
+        fields: Dict[str, str] = {}
+        for child in elem:
+            name = _local(child.tag)
+            if name == "link":
+                # Atom: <link rel="alternate" href="..."/>, RSS: <link>...</link>
+                href = child.get("href")
+                if href is None:
+                    fields.setdefault("link", (child.text or "").strip())
+                elif child.get("rel", "alternate") == "alternate":
+                    fields.setdefault("link", href.strip())
+            elif name in ("title", "pubDate", "published", "updated", "date", "source"):
+                fields.setdefault(name, (child.text or "").strip())
+        date = fields.get("pubDate") or fields.get("published") or fields.get("updated") or fields.get("date", "")
+        return {
+            "date": date,
+            "title": fields.get("title", ""),
+            "link": fields.get("link", ""),
+            "publisher": fields.get("source", ""),
+            "ts": _timestamp(date),
+        }
+
+
+def dedup_key(item: Dict[str, Any]) -> str:
+    """
+    Нормализованный заголовок: Google News дописывает к нему « - Издание»,
+    а та же новость из ленты самого издания приходит без суффикса.
+    """
+    title = item["title"]
+    publisher = item.get("publisher")
+    if publisher and title.endswith(" - " + publisher):
+        title = title[:-len(publisher) - 3]
+    return re.sub(r"\W+", " ", title.lower()).strip()
+
+
+def merge_items(groups: Sequence[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Объединение лент без повторов (по заголовку или ссылке), свежие первыми.
+    """
+    seen = set()
+    merged = []
+    for item in sorted((i for group in groups for i in group), key=lambda i: -i["ts"]):
+        keys = {dedup_key(item)}
+        if item["link"]:
+            keys.add(item["link"])
+        if keys & seen:
+            continue
+        seen |= keys
+        merged.append(item)
+        if len(merged) >= limit:
+            break
+    return merged
+
+
+class FeedState:
+    """
+    Последний ответ ленты: валидаторы для условного GET и разобранные записи.
+    """
+
+    def __init__(self):
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.items: List[Dict[str, Any]] = []
+        self.fetched_at = 0.0
+
+
+class QueryEntry:
+    def __init__(self, query: str, items: List[Dict[str, Any]]):
+        self.query = query
+        self.items = items
+        self.updated = time.monotonic()
+        self.accessed = self.updated
+
+
+class NewsAggregator:
+    """
+    Новости по тикеру из нескольких RSS/Atom-источников (NEWS_SOURCES).
+
+    Ленты запрашиваются условным GET (If-None-Match / If-Modified-Since):
+    неизменившаяся лента отвечает 304 без тела. Тело разбирается потоково
+    и читается только до нужного числа записей. Результат по тикеру —
+    объединённый и без повторов — хранится в памяти (LRU на NEWS_INDEX_SIZE
+    тикеров) и обновляется фоновым опросом (`run`), поэтому анализ уже
+    запрошенного тикера берёт новости локально, не дожидаясь сети.
+    Первый запрос тикера идёт в сеть (или в общий кэш, заполненный другим
+    процессом бота).
+    """
+
+    def __init__(
+        self,
+        transport: Any,
+        cache: Any = None,
+        sources: Sequence[Tuple[str, str]] = NEWS_SOURCES,
+        ttl: float = CACHE_TTL_NEWS
+    ):
+        self.transport = transport
+        self.cache = cache
+        self.sources = list(sources)
+        self.ttl = ttl
+        # Состояние лент по URL: общие ленты и ленты тикеров из _index
+        self._feeds: Dict[str, FeedState] = {}
+        self._index: "OrderedDict[str, QueryEntry]" = OrderedDict()
+        self._inflight = SingleFlight()
+        self._background: set = set()
+
+    async def get(self, query: str, max_items: int = 5, refresh: bool = False) -> List[Dict[str, Any]]:
+        """
+        Новости по `query`. Устаревшая запись отдаётся сразу и обновляется
+        в фоне; `refresh` — обновить ленты сейчас (прогрев).
+        """
+        key = query.lower()
+        entry = self._index.get(key)
+        if entry is None and not refresh and self.cache is not None:
+            cached = self.cache.get("news", key)
+            if cached is not None:
+                entry = self._store(query, cached)
+        if entry is None or refresh:
+            items = await self._inflight.do(key, lambda: self.refresh(query))
+            entry = self._index.get(key) or QueryEntry(query, items)
+        elif time.monotonic() - entry.updated >= self.ttl:
+            self._refresh_later(query)
+        entry.accessed = time.monotonic()
+        return entry.items[:max_items]
+
+    def _refresh_later(self, query: str) -> None:
+        task = asyncio.ensure_future(self._inflight.do(query.lower(), lambda: self.refresh(query)))
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    def _store(self, query: str, items: List[Dict[str, Any]]) -> QueryEntry:
+        key = query.lower()
+        entry = self._index.get(key)
+        if entry is None:
+            entry = self._index[key] = QueryEntry(query, items)
+        else:
+            entry.items = items
+            entry.updated = time.monotonic()
+        self._index.move_to_end(key, last=True)
+        while len(self._index) > NEWS_INDEX_SIZE:
+            self._evict(next(iter(self._index)))
+        return entry
+
+    def _evict(self, key: str) -> None:
+        # Вместе с тикером уходят и состояния его персональных лент
+        entry = self._index.pop(key)
+        for _, template in self.sources:
+            if "{q}" in template:
+                self._feeds.pop(template.format(q=quote(entry.query)), None)
+
+    async def refresh(self, query: str) -> List[Dict[str, Any]]:
+        """
+        Опрос всех источников по тикеру. Сбой одного источника не теряет
+        остальные: от него берутся записи прошлого успешного опроса.
+        """
+        groups = await asyncio.gather(*(self._from_source(name, url, query) for name, url in self.sources))
+        items = merge_items(groups, NEWS_FEED_ITEMS)
+        self._store(query, items)
+        if self.cache is not None:
+            self.cache.set("news", query.lower(), items, self.ttl)
+        return items
+
+    async def _from_source(self, name: str, template: str, query: str) -> List[Dict[str, Any]]:
+        if "{q}" in template:
+            return await self._poll(name, template.format(q=quote(query)), NEWS_FEED_ITEMS)
+        # Общую ленту опрашиваем не чаще NEWS_POLL_INTERVAL, сколько бы тикеров её ни ждало
+        state = self._feeds.get(template)
+        if state is None or time.monotonic() - state.fetched_at >= NEWS_POLL_INTERVAL:
+            await self._inflight.do(("feed", template), lambda: self._poll(name, template, NEWS_SHARED_FEED_ITEMS))
+        state = self._feeds.get(template)
+        if state is None:
+            return []
+        pattern = re.compile(rf"(?<!\w){re.escape(query)}(?!\w)", re.IGNORECASE)
+        return [item for item in state.items if pattern.search(item["title"])]
+
+    async def _poll(self, name: str, url: str, limit: int) -> List[Dict[str, Any]]:
+        state = self._feeds.setdefault(url, FeedState())
+        headers = {}
+        if state.etag:
+            headers["If-None-Match"] = state.etag
+        if state.last_modified:
+            headers["If-Modified-Since"] = state.last_modified
+
+        async def consume(resp: aiohttp.ClientResponse) -> Optional[List[Dict[str, Any]]]:
+            if resp.status == 304:
+                return None
+            parser = FeedParser(limit)
+            try:
+                async for chunk in resp.content.iter_chunked(CHUNK_SIZE):
+                    if parser.feed(chunk):
+                        break
+                else:
+                    parser.close()
+            except ET.ParseError:
+                # Битый хвост ленты не отменяет уже разобранные записи
+                if not parser.items:
+                    raise
+                logger.warning("News feed %s is malformed after %d items", name, len(parser.items))
+            state.etag = resp.headers.get("ETag")
+            state.last_modified = resp.headers.get("Last-Modified")
+            return parser.items
+
+        try:
+            items = await self.transport.stream(url, consume, headers=headers, timeout=NEWS_FEED_TIMEOUT)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            NEWS_FEED_REQUESTS.inc(source=name, result="error")
+            record_error(f"news_{name}", e)
+            logger.warning("News feed %s failed: %s", name, e)
+            return state.items
+        state.fetched_at = time.monotonic()
+        if items is None:
+            NEWS_FEED_REQUESTS.inc(source=name, result="not_modified")
+        else:
+            NEWS_FEED_REQUESTS.inc(source=name, result="ok")
+            state.items = items
+        return state.items
+
+    def queries(self) -> List[str]:
+        """
+        Тикеры, которые запрашивали за последние NEWS_QUERY_IDLE секунд;
+        остальные убираются из индекса.
+        """
+        now = time.monotonic()
+        for key in [k for k, e in self._index.items() if now - e.accessed >= NEWS_QUERY_IDLE]:
+            self._evict(key)
+        return [entry.query for entry in self._index.values()]
+
+    async def run(self, interval: float = NEWS_POLL_INTERVAL) -> None:
+        """
+        Фоновый опрос источников по всем недавно запрошенным тикерам.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            started = time.monotonic()
+            queries = self.queries()
+            results = await asyncio.gather(
+                *(self._inflight.do(q.lower(), lambda q=q: self.refresh(q)) for q in queries),
+                return_exceptions=True
+            )
+            for query, result in zip(queries, results):
+                if isinstance(result, Exception):
+                    logger.warning("News refresh for %s failed: %s", query, result)
+            logger.debug("News poll: %d queries in %.1fs", len(queries), time.monotonic() - started)
+
+    async def close(self) -> None:
+        for task in list(self._background):
+            task.cancel()
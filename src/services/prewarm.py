@@ -0,0 +1,194 @@
+# src/services/prewarm.py
+
+import time
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from src.services.rate_limiter import get_scheduler
+from src.services.providers import token_key
+from src.config.settings import (
+    PREWARM_INTERVAL, PREWARM_CONCURRENCY, PREWARM_TRENDING, PREWARM_WATCHLIST,
+    PREWARM_WATCHLIST_PATH, PREWARM_REPORTS, PREWARM_MIN_HEADROOM
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PrewarmWorker:
+    """
+    Фоновый прогрев кэша для популярных токенов: раз в PREWARM_INTERVAL
+    берёт trending CoinGecko и список наблюдения и заново запрашивает
+    рыночные данные, новости и (если ещё нет) анализ контракта, чтобы
+    первый запрос пользователя шёл по тёплому пути.
+
+    Прогрев делит лимиты провайдеров с запросами пользователей, поэтому
+    новый токен берётся в работу, только пока в bucket провайдера
+    остаётся не меньше PREWARM_MIN_HEADROOM запросов (но не больше половины
+    ёмкости bucket). Объём и изменение цены обновляются для всех токенов
+    цикла сразу пакетными запросами.
+    """
+
+    def __init__(
+        self,
+        inspector: Any,
+        interval: float = PREWARM_INTERVAL,
+        concurrency: int = PREWARM_CONCURRENCY,
+        reports: bool = PREWARM_REPORTS
+    ):
+        self.inspector = inspector
+        self.fetcher = inspector.fetcher
+        self.interval = interval
+        self.concurrency = concurrency
+        self.reports = reports
+        self.last_run: Dict[str, Any] = {}
+
+    def watchlist(self) -> List[str]:
+        symbols = list(PREWARM_WATCHLIST)
+        if PREWARM_WATCHLIST_PATH:
+            try:
+                with open(PREWARM_WATCHLIST_PATH, encoding="utf-8") as f:
+                    symbols += [line.split("#")[0].strip() for line in f]
+            except OSError as e:
+                logger.warning("Prewarm watchlist unavailable: %s", e)
+        return [s for s in symbols if s]
+
+    async def targets(self) -> List[str]:
+        """
+        Тикеры для прогрева без повторов: сначала список наблюдения, затем trending.
+        """
+        symbols = self.watchlist()
+        if PREWARM_TRENDING:
+            try:
+                symbols += await self.fetcher.get_trending_symbols()
+            except Exception as e:
+                logger.warning("Trending fetch failed: %s", e)
+        seen, result = set(), []
+        for symbol in symbols:
+            key = symbol.upper()
+            if key not in seen:
+                seen.add(key)
+                result.append(key)
+        return result
+
+    @staticmethod
+    def _has_headroom(provider: str) -> bool:
+        # Запас не больше половины всплеска: в webhook-режиме лимиты поделены
+        # между процессами, и ёмкость корзины бывает меньше PREWARM_MIN_HEADROOM
+        bucket = get_scheduler(provider).bucket
+        return bucket.peek() >= min(PREWARM_MIN_HEADROOM, 0.5 * bucket.capacity)
+
+    async def _wait_for_budget(self, providers: List[str]) -> None:
+        while not all(self._has_headroom(p) for p in providers):
+            await asyncio.sleep(1.0)
+
+    async def _bulk_refresh(self, symbols: List[str]) -> Set[str]:
+        """
+        Рыночные данные всех токенов цикла несколькими пакетными запросами
+        и истории цен одним пакетным заданием; возвращает ключи токенов,
+        рыночные данные которых обновились.
+        """
+        tokens = []
+        for symbol in symbols:
+            if symbol.lower() in self.inspector.native_tokens:
+                continue
+            try:
+                platforms = await self.fetcher.get_token_platforms(symbol)
+                chain, address = self.inspector.chains.pick_platform(platforms)
+            except Exception as e:
+                logger.debug("Prewarm: no platforms for %s: %s", symbol, e)
+                continue
+            tokens.append((address, chain))
+        if not tokens:
+            return set()
+        await self._wait_for_budget(["coingecko"])
+        try:
+            refreshed = set(await self.fetcher.prefetch_market(tokens, refresh=True))
+        except Exception as e:
+            logger.warning("Prewarm bulk market refresh failed: %s", e)
+            refreshed = set()
+        # Дозагрузка историй; дальше PriceHistoryProvider читает их локально
+        await self.fetcher.price_history.refresh_many(
+            [(chain, address) for address, chain in tokens],
+            concurrency=self.concurrency,
+            before=lambda: self._wait_for_budget(["coingecko"])
+        )
+        return refreshed
+
+    async def warm(self, symbol: str, refreshed: Optional[Set[str]] = None) -> None:
+        """
+        `refreshed` — токены, рыночные данные которых уже обновлены пакетно:
+        для них остальные рыночные поставщики добираются из кэша по своим TTL.
+        """
+        if self.reports:
+            # Полный анализ кладёт в кэш и фичи, и новости, и готовый отчёт
+            await self._wait_for_budget(["coingecko", "news", "gemini"])
+            await self.inspector.inspect(symbol)
+            return
+
+        await self._wait_for_budget(["news"])
+        news = asyncio.create_task(self.inspector._fetch_news(symbol, refresh=True))
+        try:
+            if symbol.lower() in self.inspector.native_tokens:
+                return
+            await self._wait_for_budget(["coingecko"])
+            platforms = await self.fetcher.get_token_platforms(symbol)
+            chain, address = self.inspector.chains.pick_platform(platforms)
+            info = self.inspector.chains.get(chain)
+            if info is not None and info.has_explorer:
+                await self._wait_for_budget([info.explorer])
+            # Анализ контракта живёт сутки — берётся из кэша, если уже есть;
+            # рыночные данные обновляются принудительно, если не обновлены пакетно
+            if refreshed and token_key(address, chain) in refreshed:
+                market = self.fetcher._fetch_market_info(address, chain)
+            else:
+                market = self.fetcher.refresh_market_info(address, chain)
+            await asyncio.gather(self.fetcher._fetch_contract_info(address, chain), market)
+        finally:
+            await news
+
+    async def run_once(self) -> Dict[str, Any]:
+        started = time.monotonic()
+        symbols = await self.targets()
+        refreshed = set() if self.reports else await self._bulk_refresh(symbols)
+        sem = asyncio.Semaphore(self.concurrency)
+        failed: List[str] = []
+
+        async def one(symbol: str) -> None:
+            async with sem:
+                try:
+                    await self.warm(symbol, refreshed)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    failed.append(symbol)
+                    logger.debug("Prewarm %s failed: %s", symbol, e)
+
+        await asyncio.gather(*(one(s) for s in symbols))
+        self.last_run = {
+            "tokens": len(symbols),
+            "failed": len(failed),
+            "seconds": round(time.monotonic() - started, 3),
+            "finished_at": time.time(),
+        }
+        logger.info(
+            "Prewarm: %d tokens, %d failed in %.1fs",
+            len(symbols), len(failed), self.last_run["seconds"]
+        )
+        return self.last_run
+
+    async def run(self, initial_delay: Optional[float] = 5.0) -> None:
+        """
+        Бесконечный цикл для фоновой задачи бота; интервал отсчитывается от начала прогона.
+        """
+        if initial_delay:
+            await asyncio.sleep(initial_delay)
+        while True:
+            started = time.monotonic()
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("Prewarm cycle failed: %s", e)
+            await asyncio.sleep(max(1.0, self.interval - (time.monotonic() - started)))
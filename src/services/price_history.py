@@ -0,0 +1,218 @@
+# src/services/price_history.py
+
+import time
+import sqlite3
+import functools
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.config.settings import (
+    CACHE_FILE, PRICE_HISTORY_DAYS, PRICE_HISTORY_MIN_REFRESH, DUMP_THRESHOLD_PCT
+)
+
+logger = logging.getLogger(__name__)
+
+HOUR_MS = 3600 * 1000
+DAY_MS = 24 * HOUR_MS
+
+
+def price_features(points: Any, window_hours: int = 24, now_ms: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Векторизованные фичи по ряду [[ts_ms, price], ...] за последние PRICE_HISTORY_DAYS:
+    ряд приводится к почасовой сетке, затем считаются
+
+    * max_drawdown_24h — максимальное падение цены от максимума
+      в скользящем окне `window_hours` (в процентах, положительное число);
+    * volatility_7d — стандартное отклонение часовых лог-доходностей,
+      приведённое к суткам (в процентах);
+    * large_dumps_detected — просадка в окне больше DUMP_THRESHOLD_PCT.
+    """
+    result = {
+        "max_drawdown_24h": 0.0,
+        "volatility_7d": 0.0,
+        "large_dumps_detected": False,
+    }
+    arr = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    arr = arr[np.isfinite(arr).all(axis=1) & (arr[:, 1] > 0)]
+    if now_ms is not None:
+        arr = arr[arr[:, 0] >= now_ms - PRICE_HISTORY_DAYS * DAY_MS]
+    if len(arr) < 2:
+        return result
+
+    order = np.argsort(arr[:, 0], kind="stable")
+    ts, prices = arr[order, 0], arr[order, 1]
+    grid = np.arange(ts[0], ts[-1] + 1, HOUR_MS)
+    if len(grid) < 2:
+        return result
+    p = np.interp(grid, ts, prices)
+
+    # Скользящий максимум: первые window точек — накопленный максимум,
+    # дальше — максимум по окну из window + 1 часовых точек
+    w = window_hours + 1
+    if len(p) >= w:
+        roll_max = np.concatenate([
+            np.maximum.accumulate(p[:w - 1]),
+            sliding_window_view(p, w).max(axis=1),
+        ])
+    else:
+        roll_max = np.maximum.accumulate(p)
+    drawdown = max(0.0, float((1.0 - p / roll_max).max() * 100))
+
+    returns = np.diff(np.log(p))
+    volatility = float(returns.std() * np.sqrt(24) * 100) if len(returns) > 1 else 0.0
+
+    result["max_drawdown_24h"] = round(drawdown, 4)
+    result["volatility_7d"] = round(volatility, 4)
+    result["large_dumps_detected"] = drawdown > DUMP_THRESHOLD_PCT
+    return result
+
+
+class PriceHistoryStore:
+    """
+    Локальная история цен в SQLite (тот же файл, что и кэш, режим WAL).
+    Ряд идентифицируется строкой `series`, например "ethereum:0xabc...".
+    """
+
+    def __init__(self, path: str = CACHE_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS price_history ("
+            " series TEXT NOT NULL,"
+            " ts INTEGER NOT NULL,"
+            " price REAL NOT NULL,"
+            " PRIMARY KEY (series, ts)) WITHOUT ROWID"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS price_history_meta ("
+            " series TEXT PRIMARY KEY,"
+            " checked_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def last_ts(self, series: str) -> Optional[int]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MAX(ts) FROM price_history WHERE series = ?", (series,)
+            ).fetchone()
+        return row[0] if row and row[0] is not None else None
+
+    def checked_at(self, series: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT checked_at FROM price_history_meta WHERE series = ?", (series,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def append(self, series: str, points: Iterable[Tuple[float, float]], keep_since_ms: int) -> None:
+        rows = [(series, int(ts), float(price)) for ts, price in points if price is not None]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO price_history (series, ts, price) VALUES (?, ?, ?)", rows
+            )
+            self._conn.execute(
+                "DELETE FROM price_history WHERE series = ? AND ts < ?", (series, keep_since_ms)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO price_history_meta (series, checked_at) VALUES (?, ?)",
+                (series, time.time())
+            )
+            self._conn.commit()
+
+    def load(self, series: str, since_ms: int = 0) -> np.ndarray:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, price FROM price_history WHERE series = ? AND ts >= ? ORDER BY ts",
+                (series, since_ms)
+            ).fetchall()
+        return np.asarray(rows, dtype=np.float64).reshape(-1, 2)
+
+
+class PriceHistory:
+    """
+    Инкрементальное обновление истории цен: с CoinGecko запрашиваются только
+    точки после последней сохранённой (`market_chart/range`), а не весь
+    7-дневный график на каждый запрос.
+    """
+
+    def __init__(self, fetcher: Any, store: Optional[PriceHistoryStore] = None):
+        self.fetcher = fetcher
+        self.store = store or PriceHistoryStore()
+
+    @staticmethod
+    def series_key(platform: str, address: str) -> str:
+        return f"{platform}:{address.lower()}"
+
+    async def refresh(self, platform: str, address: str) -> np.ndarray:
+        """
+        Дозагружает новые точки (не чаще PRICE_HISTORY_MIN_REFRESH секунд)
+        и возвращает ряд за последние PRICE_HISTORY_DAYS дней.
+        """
+        series = self.series_key(platform, address)
+        now_ms = int(time.time() * 1000)
+        since_ms = now_ms - PRICE_HISTORY_DAYS * DAY_MS
+        # SQLite — в исполнителе: файл общий для процессов бота, и ожидание
+        # его блокировки не должно останавливать event loop
+        loop = asyncio.get_running_loop()
+
+        checked = await loop.run_in_executor(None, self.store.checked_at, series)
+        if checked is None or time.time() - checked >= PRICE_HISTORY_MIN_REFRESH:
+            last = await loop.run_in_executor(None, self.store.last_ts, series)
+            start_ms = since_ms if last is None or last < since_ms else last + 1
+            chart = await self.fetcher._get_json(
+                f"{self.fetcher.gecko_base}/coins/{platform}/contract/{address}/market_chart/range",
+                params={
+                    "vs_currency": "usd",
+                    "from": str(start_ms // 1000),
+                    "to": str(now_ms // 1000),
+                }
+            )
+            await loop.run_in_executor(
+                None, functools.partial(self.store.append, series, chart.get("prices", []), keep_since_ms=since_ms)
+            )
+
+        return await loop.run_in_executor(None, self.store.load, series, since_ms)
+
+    async def features(self, platform: str, address: str) -> Dict[str, Any]:
+        points = await self.refresh(platform, address)
+        return price_features(points, now_ms=int(time.time() * 1000))
+
+    async def refresh_many(
+        self,
+        tokens: Iterable[Tuple[str, str]],
+        concurrency: int = 8,
+        before: Optional[Callable[[], Awaitable[None]]] = None
+    ) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        Пакетное обновление историй для множества (platform, address).
+        `before` ожидается перед каждым токеном (например, запас лимита провайдера).
+        Возвращает {series: фичи или None при ошибке}.
+        """
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(platform: str, address: str):
+            async with sem:
+                try:
+                    if before is not None:
+                        await before()
+                    return await self.features(platform, address)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.debug("Price history refresh for %s:%s failed: %s", platform, address, e)
+                    return None
+
+        tokens = list(tokens)
+        results: List[Optional[Dict[str, Any]]] = await asyncio.gather(
+            *(one(platform, address) for platform, address in tokens)
+        )
+        return {
+            self.series_key(platform, address): res
+            for (platform, address), res in zip(tokens, results)
+        }
@@ -0,0 +1,327 @@
+# src/services/providers.py
+
+import asyncio
+import logging
+import importlib
+import aiohttp
+from typing import Any, Dict, Iterable, List, Optional, Type
+
+from src.config.settings import (
+    CACHE_TTL_CONTRACT, CACHE_TTL_CODE, CACHE_TTL_MARKET, CACHE_TTL_LISTINGS
+)
+from src.services.abi_analyzer import analyze_contract, code_hash, verified_source
+from src.services.price_history import price_features
+from src.services.transport import HTTP_ERRORS
+from src.services.metrics import record_error
+
+logger = logging.getLogger(__name__)
+
+CEX_MARKETS = {"binance", "kraken", "coinbase", "huobi", "okex"}
+
+
+def token_key(address: str, chain: str) -> str:
+    """
+    Ключ токена в кэшах поставщиков: "сеть:адрес".
+    """
+    return f"{chain}:{address.lower()}"
+
+
+def not_found(e: BaseException) -> bool:
+    """
+    Ответ 404: объекта нет у источника. В отличие от сбоя запроса
+    это настоящий результат, и его можно кэшировать.
+    """
+    return isinstance(e, aiohttp.ClientResponseError) and e.status == 404
+
+
+def market_features(coin: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Рыночные фичи из сокращённых данных монеты (см. TokenRef.coin);
+    для токена, которого нет на CoinGecko, — нули.
+    """
+    coin = coin or {}
+    return {
+        "trading_volume_24h": float(coin.get("total_volume_usd") or 0.0),
+        "price_change_24h": float(coin.get("price_change_percentage_24h") or 0.0),
+        "price_change_7d": float(coin.get("price_change_percentage_7d") or 0.0),
+    }
+
+
+class TokenRef:
+    """
+    Токен, по которому собираются фичи: адрес в сети `chain` (id платформы CoinGecko).
+    Ответ CoinGecko по контракту нужен сразу нескольким поставщикам и
+    запрашивается один раз на сбор фич.
+    """
+
+    def __init__(self, fetcher: Any, address: str, chain: str, refresh: bool = False):
+        self.fetcher = fetcher
+        self.address = address
+        self.chain = chain
+        self.refresh = refresh
+        # Поставщики, отдавшие значения по умолчанию из-за сбоя запроса
+        self.failed: List[str] = []
+        self._coin: Optional[asyncio.Task] = None
+
+    @property
+    def key(self) -> str:
+        return token_key(self.address, self.chain)
+
+    async def coin(self) -> Optional[Dict[str, Any]]:
+        """
+        id монеты и рыночные данные из /coins/{chain}/contract/{address};
+        None, если токена нет на CoinGecko. Сбой запроса пробрасывается:
+        поставщики отдают значения по умолчанию, не записывая их в кэш.
+        """
+        if self._coin is None:
+            self._coin = asyncio.ensure_future(self._load_coin())
+        return await asyncio.shield(self._coin)
+
+    async def _load_coin(self) -> Optional[Dict[str, Any]]:
+        fetcher = self.fetcher
+
+        async def fetch():
+            try:
+                token = await fetcher._get_json(
+                    f"{fetcher.gecko_base}/coins/{self.chain}/contract/{self.address}"
+                )
+            except aiohttp.ClientResponseError as e:
+                if not_found(e):
+                    return None
+                raise
+            if not token.get("id"):
+                return None
+            md = token.get("market_data", {}) or {}
+            # В кэш — только нужные поля, без цен во всех валютах
+            return {
+                "id": token["id"],
+                "total_volume_usd": (md.get("total_volume") or {}).get("usd"),
+                "price_change_percentage_24h": md.get("price_change_percentage_24h"),
+                "price_change_percentage_7d": md.get("price_change_percentage_7d"),
+            }
+
+        if self.refresh:
+            coin = await fetch()
+            fetcher.cache.set("coin", self.key, coin, CACHE_TTL_MARKET)
+            return coin
+        return await fetcher.cache.get_or_fetch("coin", self.key, fetch, CACHE_TTL_MARKET)
+
+
+class FeatureProvider:
+    """
+    Поставщик группы фич. Результат кэшируется в `namespace` на `ttl` секунд
+    по (сеть, адрес). Если `required` не задан, ошибка запроса не прерывает
+    сбор фич — поставщик отдаёт `defaults()` (без записи в кэш) и попадает
+    в `ref.failed`.
+
+    `group` определяет, при каком вызове фетчера поставщик работает:
+    "contract" — анализ контракта, "market" — рыночные данные (обновляются прогревом).
+    """
+
+    name = ""
+    group = "market"
+    namespace: Optional[str] = None
+    ttl: float = CACHE_TTL_MARKET
+    required = False
+
+    def __init__(self, fetcher: Any):
+        self.fetcher = fetcher
+
+    def defaults(self) -> Dict[str, Any]:
+        return {}
+
+    async def fetch(self, ref: TokenRef) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def collect(self, ref: TokenRef) -> Dict[str, Any]:
+        """
+        Общий конвейер: кэш (с объединением одновременных промахов) → fetch.
+        """
+        try:
+            if self.namespace is None:
+                return await self.fetch(ref)
+            cache = self.fetcher.cache
+            if ref.refresh:
+                value = await self.fetch(ref)
+                cache.set(self.namespace, ref.key, value, self.ttl)
+                return value
+            return await cache.get_or_fetch(self.namespace, ref.key, lambda: self.fetch(ref), self.ttl)
+        except HTTP_ERRORS as e:
+            if self.required:
+                raise
+            record_error(f"provider_{self.name}", e)
+            logger.debug("Provider %s failed for %s: %s", self.name, ref.key, e)
+            ref.failed.append(self.name)
+            return self.defaults()
+
+
+_REGISTRY: Dict[str, Type[FeatureProvider]] = {}
+
+
+def register_provider(cls: Type[FeatureProvider]) -> Type[FeatureProvider]:
+    """
+    Декоратор: делает поставщика доступным по имени в DATA_PROVIDERS.
+    Поставщик с тем же именем заменяет встроенный.
+    """
+    _REGISTRY[cls.name] = cls
+    return cls
+
+
+@register_provider
+class ContractProvider(FeatureProvider):
+    """
+    Анализ контракта. Адрес, который есть в локальной базе проверенных
+    контрактов (ContractStore), разбирается без сети. Иначе — через
+    обозреватель блоков сети: сначала байткод (eth_getCode), клоны с тем же
+    кодом в той же сети получают готовый разбор из кэша "abi". Иначе один
+    запрос getsourcecode — в нём есть и ABI, и исходник, и настройки компиляции.
+    Исходник разбирается SourceScanner (скам-шаблоны, модификаторы доступа).
+    """
+
+    name = "contract"
+    group = "contract"
+    namespace = "contract"
+    ttl = CACHE_TTL_CONTRACT
+    required = True
+
+    def defaults(self) -> Dict[str, Any]:
+        return analyze_contract(None)
+
+    async def collect(self, ref: TokenRef) -> Dict[str, Any]:
+        entry = self.fetcher.contract_store.get(ref.chain, ref.address)
+        if entry is not None:
+            return await self._analyze(entry)
+        info = self.fetcher.chains.get(ref.chain)
+        if info is None or not info.has_explorer:
+            # Для сети нет обозревателя — контракт не анализируем
+            return self.defaults()
+        return await super().collect(ref)
+
+    async def _analyze(self, entry: Optional[Dict[str, Any]], code: Optional[str] = None) -> Dict[str, Any]:
+        # Исходник разбирается вне event loop и кэшируется по хэшу текста
+        source = await self.fetcher.source_scanner.analyze(verified_source(entry))
+        # Разбор ABI (JSON, селекторы сотен функций) — тоже вне event loop
+        return await asyncio.get_running_loop().run_in_executor(None, analyze_contract, entry, code, source)
+
+    async def _get_code(self, ref: TokenRef) -> Optional[str]:
+        params = {
+            "module": "proxy",
+            "action": "eth_getCode",
+            "address": ref.address,
+            "tag": "latest"
+        }
+        try:
+            data = await self.fetcher._explorer_get(self.fetcher.chains.get(ref.chain), params)
+        except HTTP_ERRORS:
+            return None
+        code = data.get("result")
+        return code if isinstance(code, str) and code.startswith("0x") else None
+
+    async def fetch(self, ref: TokenRef) -> Dict[str, Any]:
+        """
+        Прокси в кэш по коду не попадают: одинаковый код прокси
+        может указывать на разные реализации.
+        """
+        chain = self.fetcher.chains.get(ref.chain)
+        code = await self._get_code(ref)
+        key = code_hash(code)
+
+        async def analyze() -> Dict[str, Any]:
+            src_params = {
+                "module": "contract",
+                "action": "getsourcecode",
+                "address": ref.address
+            }
+            src_data = await self.fetcher._explorer_get(chain, src_params)
+            src = src_data.get("result", [])
+            entry = src[0] if isinstance(src, list) and src and isinstance(src[0], dict) else None
+            return await self._analyze(entry, code)
+
+        if key is None:
+            return await analyze()
+        return await self.fetcher.cache.get_or_fetch(
+            "abi", f"{chain.id}:{key}", analyze, CACHE_TTL_CODE,
+            cache_if=lambda result: not result["is_proxy"]
+        )
+
+
+@register_provider
+class ListingsProvider(FeatureProvider):
+    """
+    Листинги на крупных CEX по /coins/{id}/tickers; меняются редко,
+    поэтому живут в кэше дольше рыночных данных.
+    """
+
+    name = "listings"
+    namespace = "listings"
+    ttl = CACHE_TTL_LISTINGS
+
+    def defaults(self) -> Dict[str, Any]:
+        return {"cex_listings": False}
+
+    async def fetch(self, ref: TokenRef) -> Dict[str, Any]:
+        coin = await ref.coin()
+        if coin is None:
+            return self.defaults()
+        try:
+            data = await self.fetcher._get_json(f"{self.fetcher.gecko_base}/coins/{coin['id']}/tickers")
+        except aiohttp.ClientResponseError as e:
+            if not_found(e):
+                return self.defaults()
+            raise
+        return {
+            "cex_listings": any(
+                t.get("market", {}).get("identifier") in CEX_MARKETS
+                for t in data.get("tickers", [])
+            )
+        }
+
+
+@register_provider
+class MarketProvider(FeatureProvider):
+    """
+    Объём торгов и изменение цены из ответа CoinGecko по контракту.
+    """
+
+    name = "market"
+    namespace = "market"
+
+    def defaults(self) -> Dict[str, Any]:
+        return market_features(None)
+
+    async def fetch(self, ref: TokenRef) -> Dict[str, Any]:
+        return market_features(await ref.coin())
+
+
+@register_provider
+class PriceHistoryProvider(FeatureProvider):
+    """
+    Просадка/волатильность по локальной истории цен, которая дозагружается
+    инкрементально; запрос идёт по адресу контракта и не ждёт id монеты.
+    Отдельный кэш не нужен — PriceHistory сама ограничивает частоту запросов.
+    """
+
+    name = "price_history"
+
+    def defaults(self) -> Dict[str, Any]:
+        return price_features([])
+
+    async def fetch(self, ref: TokenRef) -> Dict[str, Any]:
+        return await self.fetcher.price_history.features(ref.chain, ref.address)
+
+
+def provider_class(name: str) -> Type[FeatureProvider]:
+    """
+    Класс поставщика по имени из реестра или по пути "package.module:Class".
+    """
+    if ":" in name:
+        module, _, attr = name.partition(":")
+        return getattr(importlib.import_module(module), attr)
+    try:
+        return _REGISTRY[name]
+    except KeyError:
+        raise ValueError(f"Unknown data provider: {name}") from None
+
+
+def load_providers(fetcher: Any, names: Iterable[str]) -> List[FeatureProvider]:
+    return [provider_class(name)(fetcher) for name in names]
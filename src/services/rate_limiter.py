@@ -0,0 +1,303 @@
+# src/services/rate_limiter.py
+
+import time
+import random
+import asyncio
+import threading
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Dict, Optional, Tuple, Type, TypeVar
+
+from src.services.metrics import REGISTRY, UPSTREAM_SECONDS, UPSTREAM_RETRIES, UPSTREAM_ERRORS
+from src.config.settings import (
+    RATE_LIMITS, MAX_RETRIES, RETRY_BACKOFF_BASE, RETRY_BACKOFF_MAX,
+    CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+)
+
+T = TypeVar("T")
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class RetryableHTTPError(Exception):
+    """
+    Ответ, который имеет смысл повторить (429/5xx или «rate limit» в теле).
+    """
+
+    def __init__(self, status: int, retry_after: Optional[float] = None, message: str = ""):
+        super().__init__(message or f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(Exception):
+    """
+    Провайдер временно отключён автоматом после серии ошибок.
+    """
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After бывает либо числом секунд, либо HTTP-датой.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket: `rate` запросов в секунду со всплеском до `capacity`.
+    reserve() сразу резервирует токен и возвращает, сколько нужно подождать,
+    поэтому одновременные вызовы выстраиваются в очередь без лишних пробуждений.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def peek(self) -> float:
+        """
+        Сколько токенов доступно прямо сейчас (может быть отрицательным,
+        если впереди очередь резервов); ничего не резервирует.
+        """
+        with self._lock:
+            now = time.monotonic()
+            return min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+
+
+class CircuitBreaker:
+    """
+    closed → (failure_threshold ошибок подряд) → open → (reset_timeout) → half-open.
+    В half-open пропускается один пробный запрос: успех закрывает автомат, ошибка снова открывает.
+    """
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        # Время запуска пробного запроса; пробу, которая так и не завершилась
+        # (например, отменённую), разрешаем повторить через reset_timeout
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            now = time.monotonic()
+            if state == "half-open" and (
+                self._probe_started is None or now - self._probe_started >= self.reset_timeout
+            ):
+                self._probe_started = now
+                return True
+            return False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probe_started = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_started = None
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+
+
+class ProviderScheduler:
+    """
+    Ограничитель запросов к одному upstream: token bucket по опубликованным лимитам,
+    повторы с экспоненциальной задержкой (full jitter) с учётом Retry-After
+    и circuit breaker. Есть асинхронный (`run`) и блокирующий (`run_sync`) вариант.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        capacity: float,
+        max_retries: int = MAX_RETRIES,
+        backoff_base: float = RETRY_BACKOFF_BASE,
+        backoff_max: float = RETRY_BACKOFF_MAX,
+        retry_on: Tuple[Type[BaseException], ...] = ()
+    ):
+        self.name = name
+        self.bucket = TokenBucket(rate, capacity)
+        self.breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retry_on = (RetryableHTTPError,) + tuple(retry_on)
+
+    def backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.backoff_max))
+        return delay
+
+    def _before_attempt(self) -> float:
+        if not self.breaker.allow():
+            raise CircuitOpenError(f"{self.name} circuit is open")
+        return self.bucket.reserve()
+
+    def _after_failure(self, exc: BaseException, attempt: int) -> Optional[float]:
+        """
+        Возвращает задержку перед следующей попыткой или None, если повторять не нужно.
+        """
+        if not isinstance(exc, self.retry_on):
+            # upstream ответил (например, 404) — он жив
+            self.breaker.record_success()
+            return None
+        self.breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        UPSTREAM_RETRIES.inc(provider=self.name)
+        return self.backoff(attempt, getattr(exc, "retry_after", None))
+
+    def _observe(self, started: float, exc: Optional[BaseException] = None) -> None:
+        # Время вызова целиком: ожидание лимита, все попытки и паузы между ними
+        outcome = "ok" if exc is None else "error"
+        UPSTREAM_SECONDS.observe(time.perf_counter() - started, provider=self.name, outcome=outcome)
+        if exc is not None:
+            UPSTREAM_ERRORS.inc(provider=self.name, error=type(exc).__name__)
+
+    async def run(self, fn: Callable[[], Awaitable[T]]) -> T:
+        attempt = 1
+        started = time.perf_counter()
+        while True:
+            try:
+                wait = self._before_attempt()
+            except CircuitOpenError as e:
+                self._observe(started, e)
+                raise
+            if wait:
+                await asyncio.sleep(wait)
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    self._observe(started, e)
+                    raise
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self._observe(started)
+            return result
+
+    def run_sync(self, fn: Callable[[], T]) -> T:
+        attempt = 1
+        started = time.perf_counter()
+        while True:
+            try:
+                wait = self._before_attempt()
+            except CircuitOpenError as e:
+                self._observe(started, e)
+                raise
+            if wait:
+                time.sleep(wait)
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._after_failure(e, attempt)
+                if delay is None:
+                    self._observe(started, e)
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self.breaker.record_success()
+            self._observe(started)
+            return result
+
+
+_schedulers: Dict[str, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+CIRCUIT_OPEN = REGISTRY.gauge(
+    "circuit_open", "1 while the provider circuit breaker rejects calls", ("provider",)
+)
+BUCKET_TOKENS = REGISTRY.gauge(
+    "rate_limit_tokens", "Tokens currently available in the provider bucket", ("provider",)
+)
+
+
+def _collect_schedulers() -> None:
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    for scheduler in schedulers:
+        CIRCUIT_OPEN.set(scheduler.breaker.state == "open", provider=scheduler.name)
+        BUCKET_TOKENS.set(scheduler.bucket.peek(), provider=scheduler.name)
+
+
+REGISTRY.add_collector(_collect_schedulers)
+
+
+# Доля опубликованных лимитов, которая достаётся этому процессу
+_rate_share = 1.0
+
+
+def _limits(provider: str) -> Tuple[float, float]:
+    rate, capacity = RATE_LIMITS.get(provider, RATE_LIMITS["default"])
+    return rate * _rate_share, max(1.0, capacity * _rate_share)
+
+
+def set_rate_share(share: float) -> None:
+    """
+    Лимиты провайдеров — на весь бот, а не на процесс: в webhook-режиме
+    каждый из N процессов получает 1/N скорости и всплеска. Уже созданные
+    планировщики пересчитываются.
+    """
+    global _rate_share
+    with _schedulers_lock:
+        _rate_share = share
+        for provider, scheduler in _schedulers.items():
+            scheduler.bucket = TokenBucket(*_limits(provider))
+
+
+def get_scheduler(provider: str, retry_on: Tuple[Type[BaseException], ...] = ()) -> ProviderScheduler:
+    """
+    Общий на процесс планировщик для провайдера (etherscan, coingecko, gemini, news).
+    `retry_on` — транспортные исключения вызывающего клиента, которые тоже стоит повторять.
+    """
+    with _schedulers_lock:
+        scheduler = _schedulers.get(provider)
+        if scheduler is None:
+            scheduler = ProviderScheduler(provider, *_limits(provider))
+            _schedulers[provider] = scheduler
+        missing = tuple(exc for exc in retry_on if exc not in scheduler.retry_on)
+        scheduler.retry_on += missing
+        return scheduler
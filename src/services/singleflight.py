@@ -0,0 +1,36 @@
+# src/services/singleflight.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+
+class SingleFlight:
+    """
+    Схлопывание одинаковых одновременных запросов (single-flight).
+
+    Первый вызов с данным ключом запускает работу, все последующие вызовы
+    с тем же ключом, пришедшие до её завершения, ждут тот же future.
+    Отмена одного из ожидающих не отменяет общую задачу.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        fut = self._inflight.get(key)
+        if fut is None:
+            fut = asyncio.ensure_future(fn())
+            self._inflight[key] = fut
+            fut.add_done_callback(lambda f: self._forget(key, f))
+        return await asyncio.shield(fut)
+
+    def _forget(self, key: Hashable, fut: asyncio.Future) -> None:
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        # Исключение уже доставлено ожидающим; не даём asyncio ругаться
+        # на «never retrieved», если все они были отменены.
+        if not fut.cancelled():
+            fut.exception()
+
+    def __len__(self) -> int:
+        return len(self._inflight)
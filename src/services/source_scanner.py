@@ -0,0 +1,72 @@
+# src/services/source_scanner.py
+
+import asyncio
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+from src.config.settings import CACHE_TTL_CODE, SOURCE_SCAN_WORKERS, SOURCE_SCAN_INLINE_BYTES
+from src.services.abi_analyzer import analyze_source, source_hash
+from src.services.metrics import instrument
+
+logger = logging.getLogger(__name__)
+
+
+class SourceScanner:
+    """
+    Анализ исходника контракта (analyze_source: модификаторы доступа и
+    скам-шаблоны) вне event loop. Исходник больше SOURCE_SCAN_INLINE_BYTES
+    (многофайловые standard-json, сотни КБ) разбирается в пуле из
+    SOURCE_SCAN_WORKERS процессов — регулярные выражения держат GIL, поэтому
+    потоки здесь не помогают; маленький дешевле разобрать на месте, чем
+    передавать в другой процесс. Результат кэшируется в "source" по хэшу
+    текста: одинаковый исходник у разных адресов (клоны с другими
+    аргументами конструктора, прокси, записи локальной базы) разбирается один раз.
+    """
+
+    def __init__(self, cache: Any, workers: int = SOURCE_SCAN_WORKERS):
+        self.cache = cache
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _executor(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers <= 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                # spawn, а не fork: в процессе бота уже работают потоки и соединения
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._pool
+
+    @instrument("source_scan")
+    async def analyze(self, source: str) -> Dict[str, Any]:
+        if not source:
+            return analyze_source("")
+
+        async def scan() -> Dict[str, Any]:
+            pool = self._executor() if len(source) > SOURCE_SCAN_INLINE_BYTES else None
+            if pool is None:
+                return analyze_source(source)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, analyze_source, source)
+            except BrokenProcessPool:
+                # Рабочий процесс упал (например, OOM) — пул пересоздаётся при следующем вызове
+                logger.warning("Source scan pool is broken, scanning in-process")
+                with self._lock:
+                    if self._pool is pool:
+                        self._pool = None
+                return analyze_source(source)
+
+        return await self.cache.get_or_fetch("source", source_hash(source), scan, CACHE_TTL_CODE)
+
+    def close(self) -> None:
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,79 @@
+# src/services/stage_graph.py
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+StageFn = Callable[..., Awaitable[Any]]
+
+
+class StageGraph:
+    """
+    Небольшой граф асинхронных стадий (DAG).
+
+    Каждая стадия — корутина, которая получает результаты своих зависимостей
+    позиционными аргументами в порядке их объявления. Стадии без общих
+    зависимостей выполняются параллельно; время выполнения каждой стадии
+    (без ожидания зависимостей) сохраняется в `timings`.
+
+    У стадии может быть `deadline` — секунды от запуска графа. Стадия, не
+    успевшая к нему, отменяется, её результатом становится `fallback`
+    (значение или функция от тех же аргументов), а имя попадает в `timed_out`.
+    """
+
+    def __init__(self):
+        self._stages: Dict[str, Tuple[StageFn, Tuple[str, ...], Optional[float], Any]] = {}
+        self.timings: Dict[str, float] = {}
+        self.timed_out: List[str] = []
+        self._started = 0.0
+
+    def add(
+        self,
+        name: str,
+        fn: StageFn,
+        deps: Sequence[str] = (),
+        deadline: Optional[float] = None,
+        fallback: Any = None
+    ) -> None:
+        if name in self._stages:
+            raise ValueError(f"Stage already defined: {name}")
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Unknown dependency {dep!r} for stage {name!r}")
+        self._stages[name] = (fn, tuple(deps), deadline, fallback)
+
+    async def _run_stage(self, name: str, tasks: Dict[str, asyncio.Task]) -> Any:
+        fn, deps, deadline, fallback = self._stages[name]
+        args = [await tasks[dep] for dep in deps]
+        started = time.perf_counter()
+        try:
+            if deadline is None:
+                return await fn(*args)
+            remaining = deadline - (started - self._started)
+            try:
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                return await asyncio.wait_for(fn(*args), remaining)
+            except asyncio.TimeoutError:
+                self.timed_out.append(name)
+                return fallback(*args) if callable(fallback) else fallback
+        finally:
+            self.timings[name] = time.perf_counter() - started
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Запускает все стадии и возвращает {имя стадии: результат}.
+        Зависимости объявляются до зависимых стадий, поэтому порядок
+        добавления — корректный топологический порядок.
+        """
+        tasks: Dict[str, asyncio.Task] = {}
+        self._started = time.perf_counter()
+        for name in self._stages:
+            tasks[name] = asyncio.ensure_future(self._run_stage(name, tasks))
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            raise
+        return {name: task.result() for name, task in tasks.items()}
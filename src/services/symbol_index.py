@@ -0,0 +1,269 @@
+# src/services/symbol_index.py
+
+import os
+import json
+import mmap
+import time
+import struct
+import asyncio
+import hashlib
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+from src.config.settings import (
+    SYMBOL_INDEX_PATH, SYMBOL_INDEX_REFRESH, SYMBOL_INDEX_RANK_PAGES
+)
+
+logger = logging.getLogger(__name__)
+
+# Формат файла:
+#   заголовок  <4sIIdI : magic, число слотов, число тикеров, время сборки,
+#              число адресных слотов
+#   слоты      <QII × n_slots : хэш тикера, смещение и длина записи (0 — пустой слот)
+#   адреса     <QII × n_addr_slots : хэш "сеть:адрес", смещение и длина id монеты
+#   записи     UTF-8 JSON-список кандидатов, уже отсортированный по рангу, и id монет
+_MAGIC = b"SYM2"
+_HEADER = struct.Struct("<4sIIdI")
+_SLOT = struct.Struct("<QII")
+
+# Как часто читатель проверяет, не подменён ли файл фоновым обновлением
+_RELOAD_CHECK_INTERVAL = 30.0
+
+
+def symbol_hash(symbol: str) -> int:
+    digest = hashlib.blake2b(symbol.lower().encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _table_size(n: int) -> int:
+    # Степень двойки, заполненная не более чем наполовину
+    size = 1
+    while size < max(1, n) * 2:
+        size *= 2
+    return size
+
+
+def _place(slots: List[tuple], h: int, offset: int, length: int) -> None:
+    mask = len(slots) - 1
+    i = h & mask
+    # Линейное пробирование
+    while slots[i][2]:
+        i = (i + 1) & mask
+    slots[i] = (h, offset, length)
+
+
+def _rank_key(candidate: Mapping[str, Any]):
+    """
+    Сначала монеты с рангом по капитализации (меньше — лучше),
+    затем с большим числом сетей, затем по id для стабильности.
+    """
+    rank = candidate.get("rank")
+    return (rank is None, rank or 0, -len(candidate.get("platforms") or {}), candidate["id"])
+
+
+def build_index(coins: Iterable[Mapping[str, Any]], ranks: Mapping[str, int], path: str) -> int:
+    """
+    Собирает индекс из ответа /coins/list?include_platform=true и рангов
+    {coin_id: market_cap_rank}: тикер → кандидаты и "сеть:адрес" → id монеты
+    (при совпадении адреса у нескольких монет — лучшая по рангу).
+    Файл пишется рядом и атомарно подменяет старый. Возвращает число тикеров.
+    """
+    by_symbol: Dict[str, List[Dict[str, Any]]] = {}
+    for coin in coins:
+        symbol = (coin.get("symbol") or "").strip().lower()
+        if not symbol or not coin.get("id"):
+            continue
+        by_symbol.setdefault(symbol, []).append({
+            "id": coin["id"],
+            "name": coin.get("name", ""),
+            "rank": ranks.get(coin["id"]),
+            "platforms": {c: a for c, a in (coin.get("platforms") or {}).items() if a},
+        })
+
+    by_address: Dict[str, Dict[str, Any]] = {}
+    for candidates in by_symbol.values():
+        candidates.sort(key=_rank_key)
+        for candidate in candidates:
+            for chain, address in candidate["platforms"].items():
+                key = f"{chain}:{address.lower()}"
+                best = by_address.get(key)
+                if best is None or _rank_key(candidate) < _rank_key(best):
+                    by_address[key] = candidate
+
+    slots = [(0, 0, 0)] * _table_size(len(by_symbol))
+    addr_slots = [(0, 0, 0)] * _table_size(len(by_address))
+    blob = bytearray()
+    base = _HEADER.size + _SLOT.size * (len(slots) + len(addr_slots))
+    for symbol, candidates in by_symbol.items():
+        record = json.dumps(candidates, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        _place(slots, symbol_hash(symbol), base + len(blob), len(record))
+        blob += record
+    for key, candidate in by_address.items():
+        record = candidate["id"].encode("utf-8")
+        _place(addr_slots, symbol_hash(key), base + len(blob), len(record))
+        blob += record
+
+    tmp = f"{path}.tmp"
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, len(slots), len(by_symbol), time.time(), len(addr_slots)))
+        f.write(b"".join(_SLOT.pack(*slot) for slot in slots + addr_slots))
+        f.write(blob)
+    os.replace(tmp, path)
+    return len(by_symbol)
+
+
+class SymbolIndex:
+    """
+    Индекс тикер → кандидаты CoinGecko (id, имя, ранг, платформы) в
+    memory-mapped файле: поиск — один хэш и чтение одной записи, без
+    разбора всего файла; так же ищется id монеты по адресу контракта.
+    Несколько процессов читают один файл; после фоновой пересборки
+    читатели сами переоткрывают его.
+    """
+
+    def __init__(self, path: str = SYMBOL_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mm: Optional[mmap.mmap] = None
+        self._n_slots = 0
+        self._n_addr_slots = 0
+        self._built_at: Optional[float] = None
+        self._stat = None
+        self._checked = 0.0
+        self.load()
+
+    def load(self) -> bool:
+        """
+        (Пере)открывает файл индекса. Возвращает False, если индекса нет или он повреждён.
+        """
+        with self._lock:
+            try:
+                st = os.stat(self.path)
+                with open(self.path, "rb") as f:
+                    mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                magic, n_slots, _, built_at, n_addr_slots = _HEADER.unpack_from(mm, 0)
+                if magic != _MAGIC or n_slots & (n_slots - 1) or n_addr_slots & (n_addr_slots - 1):
+                    mm.close()
+                    return False
+            except (OSError, ValueError, struct.error):
+                return False
+            if self._mm is not None:
+                self._mm.close()
+            self._mm, self._n_slots, self._n_addr_slots, self._built_at = mm, n_slots, n_addr_slots, built_at
+            self._stat = (st.st_ino, st.st_mtime_ns)
+            self._checked = time.monotonic()
+            return True
+
+    def _maybe_reload(self) -> None:
+        now = time.monotonic()
+        if now - self._checked < _RELOAD_CHECK_INTERVAL:
+            return
+        self._checked = now
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return
+        if (st.st_ino, st.st_mtime_ns) != self._stat:
+            self.load()
+
+    @property
+    def available(self) -> bool:
+        return self._mm is not None
+
+    def age(self) -> Optional[float]:
+        """
+        Возраст индекса в секундах (None — индекса нет).
+        """
+        self._maybe_reload()
+        return None if self._built_at is None else time.time() - self._built_at
+
+    def _find(self, mm: mmap.mmap, table: int, n_slots: int, key: str) -> Optional[bytes]:
+        h = symbol_hash(key)
+        mask = n_slots - 1
+        i = h & mask
+        while True:
+            slot_h, offset, length = _SLOT.unpack_from(mm, table + i * _SLOT.size)
+            if not length:
+                return None
+            if slot_h == h:
+                return mm[offset:offset + length]
+            i = (i + 1) & mask
+
+    def lookup(self, symbol: str) -> List[Dict[str, Any]]:
+        """
+        Кандидаты для тикера, лучший первым; пустой список, если тикера нет.
+        """
+        self._maybe_reload()
+        with self._lock:
+            if self._mm is None:
+                return []
+            record = self._find(self._mm, _HEADER.size, self._n_slots, symbol)
+        return [] if record is None else json.loads(record)
+
+    def coin_id(self, chain: str, address: str) -> Optional[str]:
+        """
+        id монеты по адресу контракта в сети `chain`; None — не найден или индекса нет.
+        """
+        self._maybe_reload()
+        with self._lock:
+            if self._mm is None:
+                return None
+            table = _HEADER.size + self._n_slots * _SLOT.size
+            record = self._find(self._mm, table, self._n_addr_slots, f"{chain}:{address.lower()}")
+        return None if record is None else record.decode("utf-8")
+
+    async def refresh(self, fetcher: Any) -> int:
+        """
+        Скачивает полный список монет с платформами и ранги топа по капитализации,
+        пересобирает файл и переоткрывает его.
+        """
+        base = fetcher.gecko_base
+        coins = await fetcher._get_json(f"{base}/coins/list", params={"include_platform": "true"})
+
+        async def page(n: int):
+            try:
+                return await fetcher._get_json(f"{base}/coins/markets", params={
+                    "vs_currency": "usd", "order": "market_cap_desc",
+                    "per_page": "250", "page": str(n),
+                })
+            except Exception:
+                # Без части рангов индекс всё равно полезен
+                return []
+
+        pages = await asyncio.gather(*(page(n) for n in range(1, SYMBOL_INDEX_RANK_PAGES + 1)))
+        ranks = {
+            m["id"]: m["market_cap_rank"]
+            for markets in pages for m in markets
+            if m.get("id") and m.get("market_cap_rank")
+        }
+        count = await asyncio.get_running_loop().run_in_executor(
+            None, build_index, coins, ranks, self.path
+        )
+        self.load()
+        return count
+
+    async def run_refresher(self, fetcher: Any, interval: float = SYMBOL_INDEX_REFRESH) -> None:
+        """
+        Фоновое обновление: собирает индекс, если его нет или он старше `interval`.
+        """
+        while True:
+            age = self.age()
+            if age is None or age >= interval:
+                try:
+                    count = await self.refresh(fetcher)
+                    logger.info("Symbol index rebuilt: %d symbols", count)
+                    age = 0.0
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning("Symbol index refresh failed: %s", e)
+                    age = max(0.0, interval - 600)
+            await asyncio.sleep(max(60.0, interval - age))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._mm is not None:
+                self._mm.close()
+                self._mm = None
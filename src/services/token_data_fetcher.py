@@ -1,210 +1,246 @@
 # services/token_data_fetcher.py
 
-import time
-import shelve
-import requests
-from typing import Dict, Any
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Callable, Iterable, Mapping, Sequence, Tuple
 
-from src.config.settings import (
-    COINGECKO_API_BASE, ETHERSCAN_API_KEY, PROXIES,
-    REQUEST_TIMEOUT, MAX_RETRIES, RETRY_DELAY, CACHE_FILE
-)
+import aiohttp
+
+from src.config.settings import COINGECKO_API_BASE, CACHE_TTL_PLATFORMS, DATA_PROVIDERS
+from src.services.cache import TieredCache
+from src.services.price_history import PriceHistory
+from src.services.symbol_index import SymbolIndex
+from src.services.chain_registry import Chain, ChainRegistry
+from src.services.metrics import instrument
+from src.services.transport import HttpTransport
+from src.services.providers import FeatureProvider, TokenRef, load_providers
+from src.services.bulk_market import BulkMarketData
+from src.services.contract_store import ContractStore
+from src.services.source_scanner import SourceScanner
+
+logger = logging.getLogger(__name__)
 
 
 class TokenDataFetcher:
     """
     Unified scraper: берёт адреса токена у CoinGecko,
-    а затем запрашивает данные по контракту (ABI, верификация)
-    и рыночные метрики (объём, изменение цены, CEX-листинги, дамп-флаги).
+    а затем собирает фичи модели через подключаемых поставщиков
+    (src/services/providers.py): контракт (ABI, верификация), рыночные
+    метрики, CEX-листинги, история цен и дамп-флаги.
+
+    Все поставщики работают поверх общего транспорта (пулы соединений,
+    лимиты, повторы) и общего кэша; независимые запросы выполняются параллельно.
     """
 
-    def __init__(self):
-        self.session = requests.Session()
-        # Прокси, если указаны
-        if PROXIES["ENABLED"]:
-            self.session.proxies.update({k: v for k, v in PROXIES.items() if v})
+    def __init__(
+        self,
+        cache: Optional[TieredCache] = None,
+        chains: Optional[ChainRegistry] = None,
+        providers: Optional[Sequence[FeatureProvider]] = None
+    ):
         self.gecko_base = COINGECKO_API_BASE
-        self.eth_key    = ETHERSCAN_API_KEY
-        self.cache_file = CACHE_FILE
-
-    def get_token_platforms(self, symbol: str) -> Dict[str, str]:
+        self.transport  = HttpTransport()
+        self.chains     = chains or ChainRegistry.load()
+        self.cache      = cache or TieredCache()
+        self.price_history = PriceHistory(self)
+        self.symbol_index = SymbolIndex()
+        self.bulk_market = BulkMarketData(self)
+        self.contract_store = ContractStore()
+        self.source_scanner = SourceScanner(self.cache)
+        self.providers: List[FeatureProvider] = (
+            list(providers) if providers is not None else load_providers(self, DATA_PROVIDERS)
+        )
+
+    @property
+    def proxy(self) -> Optional[str]:
+        return self.transport.proxy
+
+    def _get_session(self, pool: str = "default") -> aiohttp.ClientSession:
+        return self.transport.session(pool)
+
+    async def close(self) -> None:
+        await self.transport.close()
+        self.contract_store.close()
+        self.source_scanner.close()
+
+    async def _get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        provider: str = "coingecko",
+        validate: Optional[Callable[[Any], None]] = None,
+        pool: str = "default"
+    ) -> Any:
+        return await self.transport.get_json(url, params, provider, validate, pool)
+
+    async def _explorer_get(self, chain: Chain, params: Dict[str, Any]) -> Any:
+        return await self.transport.explorer_get(chain, params)
+
+    async def get_token_platforms(self, symbol: str, coin_id: Optional[str] = None) -> Dict[str, str]:
         """
-        По тикеру токена возвращает {chain: contract_address},
-        с локальным кэшем через shelve.
+        По тикеру токена возвращает {chain: contract_address}.
+        Сначала локальный индекс тикеров, без него — CoinGecko /search
+        с локальным кэшем (LRU + SQLite). `coin_id` — конкретная монета
+        из get_token_candidates, если тикер неоднозначен.
         """
         key = symbol.lower()
-        with shelve.open(self.cache_file) as cache:
-            if key in cache:
-                return cache[key]
+        candidates = self.symbol_index.lookup(key)
+        if coin_id is not None:
+            candidates = [c for c in candidates if c["id"] == coin_id]
+            if not candidates:
+                return await self.cache.get_or_fetch(
+                    "platforms", f"id:{coin_id}", lambda: self._fetch_coin_platforms(coin_id), CACHE_TTL_PLATFORMS
+                )
+        if candidates:
+            # Лучшая по рангу монета с контрактами (как в выборе монеты в боте)
+            best = next((c for c in candidates if c["platforms"]), None)
+            if best is None:
+                raise ValueError(f"No contract addresses for {candidates[0]['id']}")
+            return dict(best["platforms"])
 
-        coin_id = self._search_coin_id(key)
-        platforms = self._fetch_coin_platforms(coin_id)
+        async def fetch():
+            coin_id = await self._search_coin_id(key)
+            return await self._fetch_coin_platforms(coin_id)
 
-        with shelve.open(self.cache_file) as cache:
-            cache[key] = platforms
+        return await self.cache.get_or_fetch("platforms", key, fetch, CACHE_TTL_PLATFORMS)
 
-        return platforms
+    def get_token_candidates(self, symbol: str) -> List[Dict[str, Any]]:
+        """
+        Все монеты с таким тикером из локального индекса, лучшая по рангу первой:
+        [{"id", "name", "rank", "platforms"}, ...]. Пусто, если индекс не собран.
+        """
+        return self.symbol_index.lookup(symbol.lower())
 
-    def _search_coin_id(self, symbol_key: str) -> str:
-        url = f"{self.gecko_base}/search"
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                resp = self.session.get(
-                    url,
-                    params={"query": symbol_key},
-                    timeout=REQUEST_TIMEOUT
-                )
-                resp.raise_for_status()
-                coins = resp.json().get("coins", [])
-                matches = [c for c in coins if c.get("symbol", "").lower() == symbol_key]
-                if not matches:
-                    raise ValueError(f"Token not found: {symbol_key}")
-                return matches[0]["id"]
-            except requests.RequestException:
-                if attempt == MAX_RETRIES:
-                    raise
-                time.sleep(RETRY_DELAY)
-
-    def _fetch_coin_platforms(self, coin_id: str) -> Dict[str, str]:
-        url = f"{self.gecko_base}/coins/{coin_id}"
+    async def get_trending_symbols(self) -> List[str]:
+        """
+        Тикеры из CoinGecko /search/trending (топ поисковых запросов за сутки).
+        """
+        data = await self._get_json(f"{self.gecko_base}/search/trending")
+        return [
+            c["item"]["symbol"] for c in data.get("coins", [])
+            if c.get("item", {}).get("symbol")
+        ]
+
+    @instrument("search_coin_id")
+    async def _search_coin_id(self, symbol_key: str) -> str:
+        data = await self._get_json(f"{self.gecko_base}/search", params={"query": symbol_key})
+        coins = data.get("coins", [])
+        matches = [c for c in coins if c.get("symbol", "").lower() == symbol_key]
+        if not matches:
+            raise ValueError(f"Token not found: {symbol_key}")
+        # При неоднозначном тикере берём монету с наибольшей капитализацией
+        ranked = [c for c in matches if c.get("market_cap_rank")]
+        if ranked:
+            return min(ranked, key=lambda c: c["market_cap_rank"])["id"]
+        return matches[0]["id"]
+
+    async def _fetch_coin_platforms(self, coin_id: str) -> Dict[str, str]:
+        # aiohttp не сериализует bool в query-параметры
         params = {
-            "localization": False, "tickers": False, "market_data": False,
-            "community_data": False, "developer_data": False, "sparkline": False
-        }
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                resp = self.session.get(url, params=params, timeout=REQUEST_TIMEOUT)
-                resp.raise_for_status()
-                data = resp.json()
-                platforms = {
-                    chain: addr
-                    for chain, addr in data.get("platforms", {}).items()
-                    if addr
-                }
-                if not platforms:
-                    raise ValueError(f"No contract addresses for {coin_id}")
-                return platforms
-            except requests.RequestException:
-                if attempt == MAX_RETRIES:
-                    raise
-                time.sleep(RETRY_DELAY)
-
-    def _fetch_contract_info(self, address: str) -> Dict[str, Any]:
-        """
-        Анализ контракта через Etherscan: ABI, верификация, функции.
-        """
-        base = "https://api.etherscan.io/api"
-        result = {
-            "is_verified": False,
-            "has_mint": False,
-            "has_blacklist": False,
-            "has_setfee": False,
-            "has_withdraw": False,
-            "has_unlock": False,
-            "has_pause": False,
-            "has_changefee": False,
-            "has_owner": False,
-            "optimization_used": ""
-        }
-
-        # 1) ABI
-        abi_params = {
-            "module": "contract",
-            "action": "getabi",
-            "apikey": self.eth_key,
-            "address": address
+            "localization": "false", "tickers": "false", "market_data": "false",
+            "community_data": "false", "developer_data": "false", "sparkline": "false"
         }
-        resp = self.session.get(base, params=abi_params, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        abi_data = resp.json()
-        if abi_data.get("status") == "1" and "Contract source code not verified" not in abi_data.get("result", ""):
-            result["is_verified"] = True
-            text = abi_data["result"].lower()
-            for flag in ["mint", "blacklist", "setfee", "withdraw", "unlock", "pause", "changefee", "owner"]:
-                result[f"has_{flag}"] = flag in text
-
-        # 2) Source
-        src_params = {
-            "module": "contract",
-            "action": "getsourcecode",
-            "apikey": self.eth_key,
-            "address": address
+        data = await self._get_json(f"{self.gecko_base}/coins/{coin_id}", params=params)
+        platforms = {
+            chain: addr
+            for chain, addr in data.get("platforms", {}).items()
+            if addr
         }
-        resp = self.session.get(base, params=src_params, timeout=REQUEST_TIMEOUT)
-        resp.raise_for_status()
-        src = resp.json().get("result", [])
-        if src and isinstance(src, list):
-            result["optimization_used"] = src[0].get("OptimizationUsed", "")
+        if not platforms:
+            raise ValueError(f"No contract addresses for {coin_id}")
+        return platforms
 
+    async def _collect(
+        self,
+        group: str,
+        address: str,
+        chain: str,
+        refresh: bool = False,
+        failed: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Фичи от всех поставщиков группы, запрошенные одновременно и слитые по порядку.
+        В `failed` добавляются имена поставщиков, вместо данных которых
+        подставлены значения по умолчанию.
+        """
+        ref = TokenRef(self, address, chain, refresh=refresh)
+        parts = await asyncio.gather(
+            *(p.collect(ref) for p in self.providers if p.group == group)
+        )
+        result: Dict[str, Any] = {}
+        for part in parts:
+            result.update(part)
+        if failed is not None:
+            failed.extend(ref.failed)
         return result
 
-    def _fetch_market_info(self, address: str) -> Dict[str, Any]:
+    @instrument("fetch_contract_info")
+    async def _fetch_contract_info(
+        self, address: str, chain: str = "ethereum", failed: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
+        """
+        Анализ контракта через обозреватель блоков сети: ABI, верификация, функции.
+        Результат кэшируется по (сеть, адрес) и по хэшу байткода.
+        """
+        return await self._collect("contract", address, chain, failed=failed)
+
+    @instrument("fetch_market_info")
+    async def _fetch_market_info(
+        self, address: str, chain: str = "ethereum", failed: Optional[List[str]] = None
+    ) -> Dict[str, Any]:
         """
         Данные с Coingecko: объём, изменение цены, CEX-листинги, детект дэмпов.
+        Каждый поставщик кэширует свою часть по (сеть, адрес).
         """
-        info = {
-            "cex_listings": False,
-            "trading_volume_24h": 0.0,
-            "price_change_24h": 0.0,
-            "price_change_7d": 0.0,
-            "large_dumps_detected": False
-        }
-        # 1) Основные данные по контракту
-        try:
-            resp = self.session.get(
-                f"{self.gecko_base}/coins/ethereum/contract/{address}",
-                timeout=REQUEST_TIMEOUT
-            )
-            resp.raise_for_status()
-            token = resp.json()
-        except requests.RequestException:
-            return info
-
-        cid = token.get("id")
-        if not cid:
-            return info
-
-        # 2) CEX-listings
-        try:
-            tickers = self.session.get(
-                f"{self.gecko_base}/coins/{cid}/tickers",
-                timeout=REQUEST_TIMEOUT
-            ).json().get("tickers", [])
-            info["cex_listings"] = any(
-                t.get("market", {}).get("identifier") in
-                {"binance", "kraken", "coinbase", "huobi", "okex"}
-                for t in tickers
-            )
-        except requests.RequestException:
-            pass
-
-        # 3) market_data
-        md = token.get("market_data", {}) or {}
-        info["trading_volume_24h"] = float(md.get("total_volume", {}).get("usd", 0.0) or 0.0)
-        info["price_change_24h"]    = float(md.get("price_change_percentage_24h", 0.0) or 0.0)
-        info["price_change_7d"]     = float(md.get("price_change_percentage_7d", 0.0) or 0.0)
-
-        # 4) detect large dumps
-        try:
-            chart = self.session.get(
-                f"{self.gecko_base}/coins/{cid}/market_chart",
-                params={"vs_currency": "usd", "days": "7"},
-                timeout=REQUEST_TIMEOUT
-            ).json()
-            prices = chart.get("prices", [])
-            for prev, curr in zip(prices, prices[1:]):
-                if prev[1] and ((curr[1] - prev[1]) / prev[1] * 100) < -25:
-                    info["large_dumps_detected"] = True
-                    break
-        except requests.RequestException:
-            pass
-
-        return info
-
-    def get_token_features(self, address: str) -> Dict[str, Any]:
-        """
-        Собирает все фичи для модели по одному адресу контракта.
-        """
-        contract = self._fetch_contract_info(address)
-        market   = self._fetch_market_info(address)
+        return await self._collect("market", address, chain, failed=failed)
+
+    async def refresh_market_info(self, address: str, chain: str = "ethereum") -> Dict[str, Any]:
+        """
+        Перезапрашивает рыночные данные и обновляет кэш, не дожидаясь истечения TTL
+        (для фонового прогрева: запросы пользователей продолжают получать старое значение).
+        """
+        return await self._collect("market", address, chain, refresh=True)
+
+    async def prefetch_market(
+        self,
+        tokens: Iterable[Tuple[str, str]],
+        refresh: bool = False
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Рыночные данные для многих пар (адрес, сеть) пакетными запросами
+        CoinGecko (сотни токенов на запрос) прямо в кэш поставщиков;
+        вызывается перед get_token_features по тем же токенам.
+        """
+        return await self.bulk_market.prefetch(tokens, refresh=refresh)
+
+    async def get_token_features(self, address: str, chain: str = "ethereum") -> Dict[str, Any]:
+        """
+        Собирает все фичи для модели по одному адресу контракта в сети `chain`
+        (id платформы CoinGecko). Обозреватель и CoinGecko опрашиваются одновременно.
+        """
+        contract, market = await asyncio.gather(
+            self._fetch_contract_info(address, chain),
+            self._fetch_market_info(address, chain),
+        )
         return {**contract, **market}
+
+    async def get_token_features_all(self, platforms: Mapping[str, str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Фичи токена во всех его сетях одновременно: {chain: features}.
+        Сети, по которым запрос не удался, в результат не попадают;
+        отмена пробрасывается.
+        """
+        chains = list(platforms)
+        results = await asyncio.gather(
+            *(self.get_token_features(platforms[c], c) for c in chains),
+            return_exceptions=True
+        )
+        features: Dict[str, Dict[str, Any]] = {}
+        for chain, result in zip(chains, results):
+            if isinstance(result, asyncio.CancelledError):
+                raise result
+            if isinstance(result, BaseException):
+                logger.warning("Features for %s on %s failed: %s", platforms[chain], chain, result)
+                continue
+            features[chain] = result
+        return features
@@ -0,0 +1,135 @@
+# src/services/transport.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+from src.config.settings import PROXIES, REQUEST_TIMEOUT, HTTP_POOL_SIZE, HTTP_POOL_PER_HOST
+from src.services.chain_registry import Chain
+from src.services.rate_limiter import (
+    get_scheduler, parse_retry_after, RetryableHTTPError, CircuitOpenError, RETRY_STATUSES
+)
+
+T = TypeVar("T")
+
+# Временные сбои транспорта, которые планировщик повторяет
+TRANSIENT_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError)
+# Все ошибки запроса (аналог requests.RequestException), включая исчерпанные повторы
+HTTP_ERRORS = (aiohttp.ClientError, asyncio.TimeoutError, RetryableHTTPError, CircuitOpenError)
+
+
+class HttpTransport:
+    """
+    Общий HTTP-транспорт для всех поставщиков данных: пулы соединений aiohttp
+    ("default" и по одному на обозреватель каждой сети) и запросы через
+    планировщик провайдера (rate limit, повторы, circuit breaker).
+    """
+
+    def __init__(self):
+        # Прокси, если указаны (aiohttp принимает один URL на запрос)
+        self.proxy = None
+        if PROXIES["ENABLED"]:
+            self.proxy = PROXIES.get("https") or PROXIES.get("http")
+        self._sessions: Dict[str, aiohttp.ClientSession] = {}
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def session(self, pool: str = "default") -> aiohttp.ClientSession:
+        """
+        Ленивая инициализация сессий: создаются внутри работающего event loop
+        и пересоздаются, если loop сменился (например, повторный asyncio.run).
+        """
+        loop = asyncio.get_running_loop()
+        if self._session_loop is not loop:
+            self._sessions = {}
+            self._session_loop = loop
+        session = self._sessions.get(pool)
+        if session is None or session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=HTTP_POOL_SIZE if pool == "default" else HTTP_POOL_PER_HOST,
+                limit_per_host=HTTP_POOL_PER_HOST,
+                ttl_dns_cache=300,
+            )
+            session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT),
+            )
+            self._sessions[pool] = session
+        return session
+
+    async def close(self) -> None:
+        sessions, self._sessions = self._sessions, {}
+        for session in sessions.values():
+            if not session.closed:
+                await session.close()
+
+    @staticmethod
+    def _raise_for_status(resp: aiohttp.ClientResponse) -> None:
+        if resp.status in RETRY_STATUSES:
+            raise RetryableHTTPError(resp.status, parse_retry_after(resp.headers.get("Retry-After")))
+        resp.raise_for_status()
+
+    async def get_json(
+        self,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        provider: str = "coingecko",
+        validate: Optional[Callable[[Any], None]] = None,
+        pool: str = "default"
+    ) -> Any:
+        """
+        GET с разбором JSON. `validate` может отклонить ответ с кодом 200,
+        выбросив RetryableHTTPError.
+        """
+        async def attempt():
+            session = self.session(pool)
+            async with session.get(url, params=params, proxy=self.proxy) as resp:
+                self._raise_for_status(resp)
+                data = await resp.json(content_type=None)
+            if validate is not None:
+                validate(data)
+            return data
+
+        return await get_scheduler(provider, TRANSIENT_ERRORS).run(attempt)
+
+    async def stream(
+        self,
+        url: str,
+        consume: Callable[[aiohttp.ClientResponse], Awaitable[T]],
+        headers: Optional[Dict[str, str]] = None,
+        timeout: Optional[float] = None,
+        provider: str = "news"
+    ) -> T:
+        """
+        GET, тело которого читает `consume` (по частям из resp.content).
+        Ответы 3xx (например, 304 на условный запрос) передаются в `consume`
+        как есть. Если `consume` вернулся, не дочитав тело, соединение
+        закрывается, а не возвращается в пул.
+        """
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+
+        async def attempt():
+            session = self.session()
+            async with session.get(url, headers=headers, proxy=self.proxy, **kwargs) as resp:
+                self._raise_for_status(resp)
+                return await consume(resp)
+
+        return await get_scheduler(provider, TRANSIENT_ERRORS).run(attempt)
+
+    @staticmethod
+    def _check_etherscan(data: Any) -> None:
+        # Etherscan сообщает о превышении лимита телом ответа с HTTP 200
+        if data.get("status") == "0" and "rate limit" in str(data.get("result", "")).lower():
+            raise RetryableHTTPError(429, message=str(data.get("result")))
+
+    async def explorer_get(self, chain: Chain, params: Dict[str, Any]) -> Any:
+        """
+        Запрос к обозревателю блоков сети (Etherscan, BscScan, ...) через его пул и лимит.
+        """
+        params = dict(params, apikey=chain.explorer_key)
+        # Без ключа обозреватель отвечает с минимальным лимитом; None aiohttp не принимает
+        params = {k: v for k, v in params.items() if v is not None}
+        return await self.get_json(
+            chain.explorer_api, params=params,
+            provider=chain.explorer, validate=self._check_etherscan, pool=chain.id
+        )
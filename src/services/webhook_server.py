@@ -0,0 +1,100 @@
+# src/services/webhook_server.py
+
+import re
+import hmac
+import json
+import logging
+from typing import Any, Callable, Dict, Optional
+
+from aiohttp import web
+from telegram import Update
+
+from src.config.settings import (
+    TG_WEBHOOK_LISTEN, TG_WEBHOOK_PORT, TG_WEBHOOK_PATH, TG_WEBHOOK_SECRET
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+# Допустимый Telegram secret_token: 1–256 символов A-Z, a-z, 0-9, _ и -
+_SECRET_FORMAT = re.compile(r"[A-Za-z0-9_-]{1,256}")
+
+
+def check_secret(secret: Optional[str]) -> None:
+    """
+    Без секрета открытый порт принял бы любой POST как обновление Telegram —
+    и анализы за чужой счёт по лимитам CoinGecko и Gemini.
+    """
+    if not secret:
+        raise ValueError("TG_WEBHOOK_SECRET is required in webhook mode")
+    if not _SECRET_FORMAT.fullmatch(secret):
+        raise ValueError("TG_WEBHOOK_SECRET must be 1-256 characters of A-Z, a-z, 0-9, _ and -")
+
+
+class WebhookServer:
+    """
+    HTTP-сервер на aiohttp, принимающий обновления Telegram вместо long polling.
+
+    Обновление только разбирается и кладётся в очередь приложения — ответ
+    Telegram уходит сразу, обработка идёт в цикле Application. Порт открывается
+    с SO_REUSEPORT, поэтому несколько процессов бота могут слушать один порт,
+    а ядро распределяет между ними соединения. GET /healthz — для балансировщика.
+    """
+
+    def __init__(
+        self,
+        application: Any,
+        host: str = TG_WEBHOOK_LISTEN,
+        port: int = TG_WEBHOOK_PORT,
+        path: str = TG_WEBHOOK_PATH,
+        secret: str = TG_WEBHOOK_SECRET,
+        health: Optional[Callable[[], Dict[str, Any]]] = None,
+        reuse_port: bool = True
+    ):
+        check_secret(secret)
+        self.application = application
+        self.host = host
+        self.port = port
+        self.path = "/" + path.lstrip("/")
+        self.secret = secret
+        self.health = health
+        self.reuse_port = reuse_port
+        self._runner: Optional[web.AppRunner] = None
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(self.path, self._handle_update)
+        app.router.add_get("/healthz", self._handle_health)
+        return app
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), self.secret.encode()):
+            return web.Response(status=403)
+        try:
+            data = await request.json()
+            update = Update.de_json(data, self.application.bot)
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning("Malformed webhook update: %s", e)
+            return web.Response(status=400)
+        if update is None:
+            return web.Response(status=400)
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        body = {"status": "ok"}
+        if self.health is not None:
+            body.update(self.health())
+        return web.json_response(body, dumps=lambda v: json.dumps(v, default=str))
+
+    async def start(self) -> None:
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, reuse_port=self.reuse_port)
+        await site.start()
+        logger.info("Webhook server listening on %s:%d%s", self.host, self.port, self.path)
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
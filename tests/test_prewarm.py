@@ -0,0 +1,24 @@
+# tests/test_prewarm.py
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import rate_limiter
+from src.services.prewarm import PrewarmWorker
+
+
+@pytest.fixture
+def rate_share():
+    yield rate_limiter.set_rate_share
+    rate_limiter.set_rate_share(1.0)
+
+
+def test_budget_wait_ends_with_split_rate_limits(rate_share):
+    # 4 webhook-процесса: ёмкость корзин меньше PREWARM_MIN_HEADROOM
+    rate_share(0.25)
+    worker = PrewarmWorker(SimpleNamespace(fetcher=None))
+    providers = ["coingecko", "news", "gemini"]
+    assert all(rate_limiter.get_scheduler(p).bucket.capacity < 2 for p in ["coingecko", "gemini"])
+    asyncio.run(asyncio.wait_for(worker._wait_for_budget(providers), timeout=5))